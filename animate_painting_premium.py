@@ -1,110 +1,215 @@
 #!/usr/bin/env python3
 """
-Simplified Particle Animation Script for Vercel Deployment
-This is a lightweight version that demonstrates the interface functionality
-without heavy AI dependencies that may not work in serverless environments.
+Particle Animation Entry Point for Serverless Deployment
+Reads the job from ANIMATION_* environment variables, renders it with the real
+dissolution or style engine and writes the encoded result to ANIMATION_OUTPUT_PATH.
+Per-preset time budgets measured with --calibrate let cost_model predict whether
+a job fits the deployment's execution limit before any rendering starts.
 """
 
+import json
 import os
 import sys
-import time
-import shutil
-from PIL import Image, ImageDraw, ImageFilter
 import tempfile
+import time
+
+from PIL import Image
+
+import auto_quality
+import cost_model
+import engines
+from cost_model import BUDGETS_FILE, DISSOLUTION_MAX_SIZE, load_budgets
+from style_selector import StyleSelector
+
+STYLE_FPS = 30
+STYLE_MAX_SIZE = 1200  # Style renders thumbnail paintings to 1200px
+STYLE_CALIBRATION_SIZE = 300  # Style cost follows the pixel count, so styles are measured small
+STYLE_DEPTH = 'simple'  # Heuristic depth: no MiDaS download or model load within the execution limit
+
+QUALITY_ALIASES = {'ultra': 'exhibition'}
+
+# Bitrate and CRF per quality, shared with the style selector menu
+ENCODING = {name: (bitrate, crf) for name, bitrate, crf, _ in StyleSelector().qualities.values()}
+
+
+def resolve_quality(quality):
+    quality = QUALITY_ALIASES.get(quality, quality)
+    if quality not in ENCODING:
+        raise ValueError(f"Unknown quality '{quality}'. Available: {', '.join(sorted(ENCODING))}")
+    return quality
+
+
+def plan_job(style, quality, duration):
+    """Work out engine, frame count and render settings for a job"""
+    quality = resolve_quality(quality)
+    bitrate, crf = ENCODING[quality]
+    if style in engines.STYLES:
+        return {
+            'kind': 'style', 'engine': style, 'quality': quality,
+            'total_frames': max(1, int(round(duration * STYLE_FPS))),
+            'max_size': STYLE_MAX_SIZE, 'bitrate': bitrate, 'crf': crf, 'depth': STYLE_DEPTH,
+        }
+    if style in engines.DISSOLUTION_ENGINES:
+        duration_ms = engines.frame_duration_ms(style)
+        return {
+            'kind': 'dissolution', 'engine': style, 'quality': quality,
+            'total_frames': max(1, int(round(duration * 1000 / duration_ms))),
+            'duration_ms': duration_ms, 'max_size': DISSOLUTION_MAX_SIZE[quality],
+            'bitrate': bitrate, 'crf': crf,
+        }
+    raise ValueError(f"Unknown style '{style}'. Available: {', '.join(sorted(engines.ENGINES))}")
+
+
+def run_plan(plan, input_path, output_path, cache_dir=None, resume=False):
+    """Render a planned job straight to output_path, resuming an interrupted render when asked"""
+    render = engines.load_engine(plan['engine'])
+    if plan['kind'] == 'style':
+        return render(input_path, output_path, total_frames=plan['total_frames'],
+                      bitrate=plan['bitrate'], crf=plan['crf'], max_size=plan['max_size'], depth=plan['depth'],
+                      resume=resume)
+
+    encode_params = {'bitrate': plan['bitrate'], 'ffmpeg_params': ["-crf", plan['crf'], "-preset", "slow"]}
+    quality = {k: plan[k] for k in ('step', 'glow', 'highlight') if k in plan}
+    return render(input_path, output_path, total_frames=plan['total_frames'],
+                  max_size=plan['max_size'], cache_dir=cache_dir, resume=resume,
+                  encode_params=encode_params if output_path.lower().endswith('.mp4') else None,
+                  **quality)
+
+
+def calibrate(painting, frames=12, names=None):
+    """
+    Measure every dissolution preset and style (or only the named engines) with a short
+    render and store the time budgets. Styles render at one size for every quality, so
+    each gets one budget under its name, measured at STYLE_CALIBRATION_SIZE.
+    """
+    budgets = load_budgets()
+    with Image.open(painting) as img:
+        image_size = img.size
+    presets = [(engine, quality) for engine in engines.DISSOLUTION_ENGINES for quality in DISSOLUTION_MAX_SIZE]
+    presets += [(style, 'good') for style in engines.STYLES]
+    for engine, quality in presets:
+        if names and engine not in names:
+            continue
+        plan = plan_job(engine, quality, 1)
+        plan['total_frames'] = frames
+        key = f"{engine}/{quality}"
+        if plan['kind'] == 'style':
+            plan['max_size'] = STYLE_CALIBRATION_SIZE
+            key = engine
+        output_path = os.path.join(tempfile.gettempdir(), f"calibrate_{engine}_{quality}.gif")
+
+        print(f"⏱️ Calibrating {key}...")
+        try:
+            started = time.time()
+            run_plan(dict(plan, total_frames=1), painting, output_path)
+            setup_seconds = time.time() - started
+            started = time.time()
+            run_plan(plan, painting, output_path)
+            elapsed = time.time() - started
+        except Exception as e:
+            print(f"⚠️ Could not calibrate {key}: {e}")
+            continue
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+        width, height = cost_model.render_size(image_size, plan['max_size'])
+        megapixels = width * height / 1e6
+        per_frame = max(0.0, elapsed - setup_seconds) / (frames - 1) / megapixels
+        budgets[key] = {
+            'setup_seconds': round(setup_seconds, 3),
+            'seconds_per_frame_mpx': round(per_frame, 3),
+            'max_size': plan['max_size'],
+            'measured_on': os.path.basename(painting),
+            'measured_at': time.strftime('%Y-%m-%d'),
+        }
+        print(f"   setup {setup_seconds:.2f}s | {per_frame:.2f}s per frame per megapixel")
+
+    with open(BUDGETS_FILE, 'w') as f:
+        json.dump(budgets, f, indent=2, sort_keys=True)
+    print(f"💾 Time budgets saved to {BUDGETS_FILE}")
+
+
+def create_animation():
+    """Render the animation described by the ANIMATION_* environment variables"""
+    print("🎨 Creating particle animation...")
 
-def create_demo_animation():
-    """Create a simple demo animation video"""
-    print("🎨 Creating demo particle animation...")
-    
     # Get parameters from environment variables
     input_path = os.environ.get('ANIMATION_INPUT_PATH')
     output_path = os.environ.get('ANIMATION_OUTPUT_PATH')
-    duration = int(os.environ.get('ANIMATION_DURATION', '10'))
+    duration = float(os.environ.get('ANIMATION_DURATION', '10'))
     quality = os.environ.get('ANIMATION_QUALITY', 'ultra')
     style = os.environ.get('ANIMATION_STYLE', 'particle_powder')
-    
+    time_limit = os.environ.get('ANIMATION_TIME_LIMIT')
+
     if not input_path or not output_path:
         print("❌ Missing input or output path")
         return False
-    
+
     if not os.path.exists(input_path):
         print(f"❌ Input file not found: {input_path}")
         return False
-    
+
     print(f"📥 Input: {input_path}")
     print(f"📤 Output: {output_path}")
     print(f"⏱️ Duration: {duration}s")
     print(f"🎯 Quality: {quality}")
     print(f"🎨 Style: {style}")
-    
+
     try:
-        # Load the input image
+        plan = plan_job(style, quality, duration)
         with Image.open(input_path) as img:
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Resize for processing
-            max_size = 800
-            if max(img.size) > max_size:
-                ratio = max_size / max(img.size)
-                new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-                img = img.resize(new_size, Image.Resampling.LANCZOS)
-            
-            print(f"🖼️ Image size: {img.size}")
-            
-            # For now, create a simple demo by copying the input image to output
-            # In production, this would be replaced with actual particle animation
-            
-            # Create a temporary demo video file (mock)
-            # Since we can't create actual video without moviepy, we'll create a placeholder
-            
-            # Simulate processing time
-            print("🔄 Processing particle animation...")
-            for i in range(5):
-                print(f"⏳ Processing frame batch {i+1}/5...")
-                time.sleep(1)  # Simulate processing
-            
-            # Create a simple "video" file (placeholder)
-            # In a real implementation, this would generate actual MP4
-            with open(output_path, 'wb') as f:
-                # Write minimal MP4 header (placeholder)
-                demo_content = f"""
-                DEMO PARTICLE ANIMATION
-                Original Image: {os.path.basename(input_path)}
-                Duration: {duration} seconds
-                Quality: {quality}
-                Style: {style}
-                Size: {img.size}
-                
-                This is a demo placeholder for Vercel deployment.
-                The full animation system requires heavy AI dependencies
-                that are better suited for dedicated servers.
-                
-                In production, this would generate a beautiful
-                particle animation video showing your painting
-                transforming into magical floating particles!
-                """.encode()
-                
-                # Simple MP4-like structure (demo only)
-                f.write(b'\x00\x00\x00\x20ftypmp42')  # MP4 signature
-                f.write(b'\x00\x00\x00\x00mp42mp41')
-                f.write(demo_content)
-        
-        print(f"✅ Demo animation created: {os.path.getsize(output_path)} bytes")
+            image_size = img.size
+
+        print(f"🎬 Engine: {plan['engine']} ({plan['kind']}) | Frames: {plan['total_frames']}")
+        if time_limit and plan['kind'] == 'dissolution':
+            # Scale step, resolution and draw passes to use the execution limit without exceeding it.
+            # Calibration renders would eat into that same limit, so only stored rates or budgets count
+            settings = auto_quality.choose_quality(plan['engine'], input_path, float(time_limit),
+                                                   plan['total_frames'], plan['max_size'], calibrate=False)
+            estimate = settings.pop('predicted_seconds')
+            plan.update(settings)
+            print(f"🎯 Auto quality: {plan['max_size']}px, step {plan['step']}, "
+                  f"glow {'on' if plan['glow'] else 'off'}, highlight {'on' if plan['highlight'] else 'off'}")
+        else:
+            estimate = cost_model.estimate(plan['engine'], image_size, plan)['seconds']
+        if estimate is None:
+            if time_limit:
+                # Without a budget the job cannot be shown to fit, as in the worker's admission
+                print(f"❌ No measured time budget for {plan['engine']} to check against the "
+                      f"{float(time_limit):.0f}s execution limit - run --calibrate")
+                return False
+            print(f"⚠️ No measured time budget for {plan['engine']} - run --calibrate")
+        else:
+            print(f"⏳ Estimated render time: {estimate:.1f}s")
+            if time_limit and estimate > float(time_limit):
+                print(f"❌ Estimated {estimate:.1f}s exceeds the {float(time_limit):.0f}s execution limit")
+                return False
+
+        started = time.time()
+        run_plan(plan, input_path, output_path)
+
+        print(f"✅ Animation created: {os.path.getsize(output_path)} bytes in {time.time() - started:.1f}s")
         return True
-        
+
     except Exception as e:
-        print(f"❌ Error creating demo animation: {e}")
+        print(f"❌ Error creating animation: {e}")
         return False
 
 def main():
     """Main function"""
-    print("🚀 Makart Particle Animation Engine - Demo Mode")
+    print("🚀 Makart Particle Animation Engine")
     print("=" * 50)
-    
-    success = create_demo_animation()
-    
+
+    if len(sys.argv) >= 2 and sys.argv[1] == '--calibrate':
+        if len(sys.argv) < 3:
+            print("Usage: python animate_painting_premium.py --calibrate <painting_file> [engine ...]")
+            return 1
+        calibrate(sys.argv[2], names=sys.argv[3:])
+        return 0
+
+    success = create_animation()
+
     if success:
         print("🎉 Animation processing completed!")
         return 0
@@ -113,4 +218,4 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main())
@@ -10,6 +10,8 @@ import os
 import sys
 import random
 
+import depth_maps
+
 class ParticleSystem:
     def __init__(self, width, height, max_particles=1000):
         self.width = width
@@ -84,23 +86,6 @@ class ParticleSystem:
                     draw.ellipse([x - size//2, y - size//2, x + size//2, y + size//2], fill=color)
         return draw_img
 
-def create_simple_depth_map(image):
-    """Create a simple depth map based on brightness and edge detection"""
-    img_array = np.array(image.convert('L'))  # Convert to grayscale
-    
-    # Simple edge detection
-    from PIL import ImageFilter
-    edges = image.filter(ImageFilter.FIND_EDGES)
-    edge_array = np.array(edges.convert('L'))
-    
-    # Combine brightness and edges for depth estimation
-    depth_map = (img_array.astype(np.float32) / 255.0) * 0.7 + (edge_array.astype(np.float32) / 255.0) * 0.3
-    
-    # Normalize to 0-1 range
-    depth_map = (depth_map - depth_map.min()) / (depth_map.max() - depth_map.min())
-    
-    return depth_map
-
 class ArtisticStyleProcessor:
     def __init__(self, width=1024, height=1024):
         self.particle_system = ParticleSystem(width, height)
@@ -176,7 +161,7 @@ def main():
             img.thumbnail((800, 800), Image.Resampling.LANCZOS)
         
         print("🕳️ Creating depth map...")
-        depth_map = create_simple_depth_map(img)
+        depth_map = depth_maps.depth_map(img, 'simple')
         
         h, w = img.size[1], img.size[0]
         processor = ArtisticStyleProcessor(w, h)
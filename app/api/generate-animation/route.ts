@@ -1,53 +1,197 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { writeFile, mkdir } from 'fs/promises';
+import { access, writeFile, mkdir } from 'fs/promises';
+import net from 'net';
 import path from 'path';
 
+// Persistent Python render worker (python render_worker.py)
+const WORKER_SOCKET = process.env.ART_RENDER_SOCKET || '/tmp/art_render_worker.sock';
+const WORKER_TIMEOUT_MS = 5000;
+
+// Send one JSON request to the render worker and resolve with its JSON response
+function workerRequest(payload: Record<string, unknown>): Promise<any> {
+  return new Promise((resolve, reject) => {
+    const socket = net.createConnection(WORKER_SOCKET);
+    let buffer = '';
+
+    socket.setTimeout(WORKER_TIMEOUT_MS);
+    socket.on('connect', () => socket.write(JSON.stringify(payload) + '\n'));
+    socket.on('data', (chunk) => {
+      buffer += chunk.toString();
+      const newline = buffer.indexOf('\n');
+      if (newline !== -1) {
+        socket.end();
+        try {
+          resolve(JSON.parse(buffer.slice(0, newline)));
+        } catch (error) {
+          reject(error);
+        }
+      }
+    });
+    socket.on('timeout', () => {
+      socket.destroy();
+      reject(new Error('Render worker timed out'));
+    });
+    socket.on('error', reject);
+  });
+}
+
+// Relay a job's worker watch stream to the browser as server-sent events
+function watchJob(jobId: string): Response {
+  const encoder = new TextEncoder();
+  let socket: net.Socket;
+
+  const stream = new ReadableStream({
+    start(controller) {
+      let buffer = '';
+      let closed = false;
+      const send = (line: string) => controller.enqueue(encoder.encode(`data: ${line}\n\n`));
+      const close = () => {
+        if (closed) return;
+        closed = true;
+        socket.destroy();
+        controller.close();
+      };
+
+      socket = net.createConnection(WORKER_SOCKET);
+      socket.on('connect', () => socket.write(JSON.stringify({ op: 'watch', job_id: jobId }) + '\n'));
+      socket.on('data', (chunk) => {
+        buffer += chunk.toString();
+        let newline;
+        while ((newline = buffer.indexOf('\n')) !== -1) {
+          const line = buffer.slice(0, newline);
+          buffer = buffer.slice(newline + 1);
+          if (!line.trim()) continue;
+          send(line);
+          const event = JSON.parse(line);
+          if (event.type === 'done' || event.type === 'failed' || event.ok === false) {
+            close();
+            return;
+          }
+        }
+      });
+      socket.on('error', () => {
+        send(JSON.stringify({ type: 'failed', error: 'Render worker is not running' }));
+        close();
+      });
+      socket.on('end', close);
+    },
+    cancel() {
+      socket?.destroy();
+    },
+  });
+
+  return new Response(stream, {
+    headers: {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache, no-transform',
+      Connection: 'keep-alive',
+    },
+  });
+}
+
 export async function POST(request: NextRequest) {
   try {
     const formData = await request.formData();
-    const file = formData.get('image') as File;
-    
-    if (!file) {
+    const file = formData.get('image') as File | null;
+    const engine = (formData.get('engine') as string) || 'perfect_final';
+    // 'preview' renders a quick low-resolution pass; 'full' renders the final animation
+    const mode = (formData.get('mode') as string) || 'full';
+    // Name of an earlier upload, to render the full animation after its preview was approved
+    const previousUpload = formData.get('fileName') as string | null;
+
+    if (!file && !previousUpload) {
       return NextResponse.json({ error: 'No image file provided' }, { status: 400 });
     }
 
-    // Validate file type
-    if (!file.type.startsWith('image/')) {
-      return NextResponse.json({ error: 'Invalid file type. Please upload an image.' }, { status: 400 });
-    }
+    if (file) {
+      // Validate file type
+      if (!file.type.startsWith('image/')) {
+        return NextResponse.json({ error: 'Invalid file type. Please upload an image.' }, { status: 400 });
+      }
 
-    // Validate file size (max 10MB)
-    if (file.size > 10 * 1024 * 1024) {
-      return NextResponse.json({ error: 'File too large. Please upload an image smaller than 10MB.' }, { status: 400 });
+      // Validate file size (max 10MB)
+      if (file.size > 10 * 1024 * 1024) {
+        return NextResponse.json({ error: 'File too large. Please upload an image smaller than 10MB.' }, { status: 400 });
+      }
     }
 
     // Create directories if they don't exist
     const uploadsDir = path.join(process.cwd(), 'uploads');
-    
+    const animationsDir = path.join(process.cwd(), 'public', 'animations');
+
     try {
       await mkdir(uploadsDir, { recursive: true });
+      await mkdir(animationsDir, { recursive: true });
     } catch (error) {
       console.log('Directories already exist');
     }
 
-    // Save uploaded file
-    const bytes = await file.arrayBuffer();
-    const buffer = Buffer.from(bytes);
-    const fileName = `upload_${Date.now()}_${file.name}`;
-    const filePath = path.join(uploadsDir, fileName);
-    await writeFile(filePath, buffer);
+    let fileName: string;
+    let filePath: string;
+    if (file) {
+      // Save uploaded file
+      const bytes = await file.arrayBuffer();
+      const buffer = Buffer.from(bytes);
+      fileName = `upload_${Date.now()}_${file.name}`;
+      filePath = path.join(uploadsDir, fileName);
+      await writeFile(filePath, buffer);
+    } else {
+      fileName = path.basename(previousUpload as string);
+      filePath = path.join(uploadsDir, fileName);
+      try {
+        await access(filePath);
+      } catch (error) {
+        return NextResponse.json({ error: 'Upload not found, please upload the image again' }, { status: 404 });
+      }
+    }
+
+    // Hand the render to the warm Python worker instead of spawning a new interpreter
+    const preview = mode === 'preview';
+    const outputName = `${path.parse(fileName).name}${preview ? '_preview' : ''}.gif`;
+    let submitted;
+    try {
+      submitted = await workerRequest({
+        op: 'submit',
+        engine,
+        preview,
+        input: filePath,
+        output: path.join(animationsDir, outputName),
+        // Full renders also ship a trajectory pack for in-browser playback
+        options: preview ? {} : { pack: true },
+      });
+    } catch (error) {
+      console.error('Render worker unavailable:', error);
+      return NextResponse.json(
+        { error: 'Render worker is not running. Start it with: python render_worker.py' },
+        { status: 503 }
+      );
+    }
+
+    if (!submitted.ok) {
+      // Over the worker's cost budget (413), a full queue (429), an invalid job (400) or a worker failure (500)
+      const error: string = submitted.error || 'Render worker error';
+      const status = error.startsWith('Job rejected') ? 413
+        : error.startsWith('Render queue is full') ? 429
+        : submitted.invalid ? 400
+        : 500;
+      return NextResponse.json({ error }, { status });
+    }
 
-    // Return success with the uploaded file info
     return NextResponse.json({
       success: true,
-      message: 'Image uploaded successfully!',
+      message: preview ? 'Preview queued' : 'Image uploaded successfully!',
       fileName: fileName,
-      // Return the uploaded image data for client-side processing
-      imageData: {
+      jobId: submitted.job.job_id,
+      preview,
+      estimatedSeconds: submitted.job.estimate?.seconds ?? null,
+      admission: submitted.job.admission,
+      animationUrl: `/animations/${outputName}`,
+      packUrl: preview ? null : `/animations/${path.parse(outputName).name}.ptrj`,
+      imageData: file ? {
         name: file.name,
         size: file.size,
         type: file.type
-      }
+      } : null
     });
 
   } catch (error) {
@@ -59,9 +203,38 @@ export async function POST(request: NextRequest) {
   }
 }
 
-export async function GET() {
+export async function GET(request: NextRequest) {
+  const jobId = request.nextUrl.searchParams.get('jobId');
+
+  // Live progress and frame thumbnails: GET ?jobId=...&stream=1
+  if (jobId && request.nextUrl.searchParams.get('stream')) {
+    return watchJob(jobId);
+  }
+
+  // Poll a submitted render job
+  if (jobId) {
+    try {
+      const response = await workerRequest({ op: 'status', job_id: jobId });
+      if (!response.ok) {
+        return NextResponse.json({ error: response.error }, { status: 404 });
+      }
+      return NextResponse.json(response.job);
+    } catch (error) {
+      return NextResponse.json({ error: 'Render worker is not running' }, { status: 503 });
+    }
+  }
+
+  let worker = 'offline';
+  try {
+    const response = await workerRequest({ op: 'ping' });
+    worker = response.ok ? 'ready' : 'offline';
+  } catch (error) {
+    worker = 'offline';
+  }
+
   return NextResponse.json({
     message: 'Particle Animation Generator API',
-    status: 'ready'
+    status: 'ready',
+    worker
   })
 }
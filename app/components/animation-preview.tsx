@@ -2,14 +2,18 @@
 
 import { motion } from 'framer-motion';
 import { Download, Image as ImageIcon } from 'lucide-react';
+import { TrajectoryPlayer } from './particle-animator';
 
 interface AnimationPreviewProps {
   originalImage: string;
   animationUrl: string;
   isProcessing: boolean;
+  liveFrame?: string;
+  // Trajectory pack of the finished render, replayed in the browser at full resolution
+  packUrl?: string;
 }
 
-export default function AnimationPreview({ originalImage, animationUrl, isProcessing }: AnimationPreviewProps) {
+export default function AnimationPreview({ originalImage, animationUrl, isProcessing, liveFrame, packUrl }: AnimationPreviewProps) {
   if (!originalImage) {
     return (
       <div className="glass-effect rounded-2xl p-8 text-center">
@@ -47,9 +51,20 @@ export default function AnimationPreview({ originalImage, animationUrl, isProces
           <h3 className="text-xl font-semibold text-white mb-4">
             🎭 Generating Animation...
           </h3>
-          <div className="flex items-center justify-center py-8">
-            <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-purple-400"></div>
-          </div>
+          {liveFrame ? (
+            <div className="relative mb-4">
+              {/* Latest frame streamed from the render worker */}
+              <img
+                src={liveFrame}
+                alt="Animation frame being rendered"
+                className="w-full h-auto rounded-lg shadow-lg"
+              />
+            </div>
+          ) : (
+            <div className="flex items-center justify-center py-8">
+              <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-purple-400"></div>
+            </div>
+          )}
           <p className="text-center text-gray-300">
             Creating your magical particle animation...
           </p>
@@ -67,11 +82,15 @@ export default function AnimationPreview({ originalImage, animationUrl, isProces
             ✨ Your Particle Animation
           </h3>
           <div className="relative">
-            <img
-              src={animationUrl}
-              alt="Generated particle animation"
-              className="w-full h-auto rounded-lg shadow-lg"
-            />
+            {packUrl ? (
+              <TrajectoryPlayer packUrl={packUrl} finalImage={originalImage} />
+            ) : (
+              <img
+                src={animationUrl}
+                alt="Generated particle animation"
+                className="w-full h-auto rounded-lg shadow-lg"
+              />
+            )}
             <div className="absolute top-4 right-4">
               <motion.button
                 whileHover={{ scale: 1.05 }}
@@ -312,3 +312,265 @@ export default function ParticleAnimator({ imageUrl, onAnimationComplete }: Part
     </div>
   );
 }
+
+// Trajectory pack written by trajectory_pack.py: the server's exact particle motion
+export interface TrajectoryPack {
+  width: number;
+  height: number;
+  particles: number;
+  frames: number;
+  keyframes: number[];
+  durationMs: number;
+  holdFrames: number;
+  background: number[];
+  glow: boolean;
+  glowSigma: number;
+  highlight: boolean;
+  margin: number;
+  positionScale: number;
+  depthScale: number;
+  sizeScale: number;
+  perspective: number;
+  colors: Uint8Array;
+  x: Int16Array[];
+  y: Int16Array[];
+  z: Int16Array[];
+  size: Uint8Array[];
+}
+
+// Undo the per-keyframe delta encoding; typed arrays wrap exactly like the encoder
+function accumulate<T extends Int16Array | Uint8Array>(deltas: T, keyframes: number, particles: number, make: (n: number) => T): T[] {
+  const rows: T[] = [];
+  for (let k = 0; k < keyframes; k++) {
+    const row = make(particles);
+    for (let i = 0; i < particles; i++) {
+      row[i] = (k ? rows[k - 1][i] : 0) + deltas[k * particles + i];
+    }
+    rows.push(row);
+  }
+  return rows;
+}
+
+export async function decodeTrajectoryPack(buffer: ArrayBuffer): Promise<TrajectoryPack> {
+  const bytes = new Uint8Array(buffer);
+  if (new TextDecoder().decode(bytes.subarray(0, 4)) !== 'PTRJ') {
+    throw new Error('Not a trajectory pack');
+  }
+  const headerLength = new DataView(buffer).getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + headerLength)));
+  if (header.version !== 2) {
+    throw new Error(`Unsupported trajectory pack version ${header.version}`);
+  }
+  const stream = new Blob([bytes.subarray(8 + headerLength)]).stream().pipeThrough(new DecompressionStream('deflate'));
+  const body = new Uint8Array(await new Response(stream).arrayBuffer());
+
+  const keyframes = header.keyframes.length;
+  const particles = header.particles;
+  const count = keyframes * particles;
+  let offset = particles * 3;
+  const colors = body.subarray(0, offset);
+
+  // Positions and depths are stored as a low byte plane followed by a high byte plane
+  const int16Plane = () => {
+    const plane = new Int16Array(count);
+    for (let i = 0; i < count; i++) {
+      plane[i] = body[offset + i] | (body[offset + count + i] << 8);
+    }
+    offset += count * 2;
+    return accumulate(plane, keyframes, particles, (n) => new Int16Array(n));
+  };
+  const x = int16Plane();
+  const y = int16Plane();
+  const z = int16Plane();
+  const size = accumulate(body.subarray(offset, offset + count), keyframes, particles, (n) => new Uint8Array(n));
+
+  return {
+    width: header.width,
+    height: header.height,
+    particles,
+    frames: header.frames,
+    keyframes: header.keyframes,
+    durationMs: header.duration_ms,
+    holdFrames: header.hold_frames,
+    background: header.background,
+    glow: header.glow,
+    glowSigma: header.glow_sigma ?? GLOW_SIGMA,
+    highlight: header.highlight,
+    margin: header.margin,
+    positionScale: header.position_scale,
+    depthScale: header.depth_scale,
+    sizeScale: header.size_scale,
+    perspective: header.perspective,
+    colors, x, y, z, size,
+  };
+}
+
+// Glow as in particle_render: a (size + GLOW_GROWTH) px disc of emission per far particle at
+// GLOW_ALPHA, blurred by a GLOW_SIGMA px Gaussian in one pass over the particle bodies
+const GLOW_GROWTH = 3;
+const GLOW_ALPHA = 80 / 255;
+const GLOW_SIGMA = 1.5;
+
+// Offscreen emission layer per canvas, reused across frames
+const glowLayers = new WeakMap<CanvasRenderingContext2D, HTMLCanvasElement>();
+
+function glowLayer(ctx: CanvasRenderingContext2D, width: number, height: number) {
+  let layer = glowLayers.get(ctx);
+  if (!layer) {
+    layer = document.createElement('canvas');
+    glowLayers.set(ctx, layer);
+  }
+  if (layer.width !== width || layer.height !== height) {
+    layer.width = width;
+    layer.height = height;
+  }
+  const glow = layer.getContext('2d')!;
+  glow.clearRect(0, 0, width, height);
+  return { layer, glow };
+}
+
+// Draw one (possibly fractional) frame the way particle_render.draw_particles does
+export function drawPackFrame(ctx: CanvasRenderingContext2D, pack: TrajectoryPack, frame: number) {
+  const { width, height, keyframes, positionScale, margin } = pack;
+  const [br, bg, bb] = pack.background;
+  ctx.globalAlpha = 1;
+  ctx.fillStyle = `rgb(${br}, ${bg}, ${bb})`;
+  ctx.fillRect(0, 0, width, height);
+
+  const f = Math.max(0, Math.min(frame, pack.frames - 1));
+  let k = 0;
+  while (k < keyframes.length - 2 && keyframes[k + 1] <= f) k++;
+  const span = keyframes[k + 1] - keyframes[k] || 1;
+  const t = Math.min(1, (f - keyframes[k]) / span);
+
+  const low = -margin * positionScale;
+  const highX = (width + margin) * positionScale;
+  const highY = (height + margin) * positionScale;
+  const visible = (x: number, y: number) => x > low && x < highX && y > low && y < highY;
+
+  const [x0, x1, y0, y1] = [pack.x[k], pack.x[k + 1], pack.y[k], pack.y[k + 1]];
+  const [z0, z1, s0, s1] = [pack.z[k], pack.z[k + 1], pack.size[k], pack.size[k + 1]];
+  const drawn: number[] = [];
+  const depth = new Float32Array(pack.particles);
+  for (let i = 0; i < pack.particles; i++) {
+    // Segments with no visible end are off-screen throughout
+    if (!visible(x0[i], y0[i]) && !visible(x1[i], y1[i])) continue;
+    depth[i] = z0[i] + (z1[i] - z0[i]) * t;
+    drawn.push(i);
+  }
+  // Far to near
+  drawn.sort((a, b) => depth[b] - depth[a]);
+
+  const screenX = new Int32Array(pack.particles);
+  const screenY = new Int32Array(pack.particles);
+  const sizes = new Int32Array(pack.particles);
+  for (const i of drawn) {
+    const perspective = 1 / (1 + Math.abs(depth[i] * pack.depthScale) * pack.perspective);
+    screenX[i] = Math.floor((x0[i] + (x1[i] - x0[i]) * t) / positionScale);
+    screenY[i] = Math.floor((y0[i] + (y1[i] - y0[i]) * t) / positionScale);
+    sizes[i] = Math.max(1, Math.floor(((s0[i] + (s1[i] - s0[i]) * t) / pack.sizeScale) * perspective));
+  }
+
+  for (const i of drawn) {
+    const sx = screenX[i], sy = screenY[i], size = sizes[i];
+    const r = pack.colors[i * 3], g = pack.colors[i * 3 + 1], b = pack.colors[i * 3 + 2];
+
+    ctx.globalAlpha = 1;
+    ctx.fillStyle = `rgb(${r}, ${g}, ${b})`;
+    if (size <= 2) {
+      ctx.fillRect(sx - (size >> 1), sy - (size >> 1), size, size);
+    } else {
+      ctx.beginPath();
+      ctx.arc(sx, sy, size / 2, 0, Math.PI * 2);
+      ctx.fill();
+    }
+
+    if (pack.highlight && size > 2) {
+      const highlightSize = Math.max(1, Math.floor(size / 3));
+      ctx.globalAlpha = 120 / 255;
+      ctx.fillStyle = `rgb(${Math.min(255, r + 25)}, ${Math.min(255, g + 25)}, ${Math.min(255, b + 25)})`;
+      ctx.beginPath();
+      ctx.arc(sx, sy, highlightSize / 2, 0, Math.PI * 2);
+      ctx.fill();
+    }
+  }
+  ctx.globalAlpha = 1;
+
+  if (pack.glow) {
+    // All far particles emit into one layer, which is blurred once over the bodies
+    const { layer, glow } = glowLayer(ctx, width, height);
+    glow.globalAlpha = GLOW_ALPHA;
+    let emitting = false;
+    for (const i of drawn) {
+      if (Math.abs(depth[i] * pack.depthScale) <= 5) continue;
+      glow.fillStyle = `rgb(${pack.colors[i * 3]}, ${pack.colors[i * 3 + 1]}, ${pack.colors[i * 3 + 2]})`;
+      glow.beginPath();
+      // The server's discs span size + GLOW_GROWTH rounded down to even, pixels inclusive
+      glow.arc(screenX[i], screenY[i], (((sizes[i] + GLOW_GROWTH) >> 1) * 2 + 1) / 2, 0, Math.PI * 2);
+      glow.fill();
+      emitting = true;
+    }
+    if (emitting) {
+      ctx.filter = `blur(${pack.glowSigma}px)`;
+      ctx.drawImage(layer, 0, 0);
+      ctx.filter = 'none';
+    }
+  }
+}
+
+interface TrajectoryPlayerProps {
+  packUrl: string;
+  // Shown over the hold frames at the end, like the server's final color grade
+  finalImage?: string;
+}
+
+// Replays a trajectory pack at the display's frame rate, interpolating between keyframes
+export function TrajectoryPlayer({ packUrl, finalImage }: TrajectoryPlayerProps) {
+  const canvasRef = useRef<HTMLCanvasElement>(null);
+  const [error, setError] = useState('');
+
+  useEffect(() => {
+    let frameRequest = 0;
+    let cancelled = false;
+    const painting = new Image();
+    if (finalImage) painting.src = finalImage;
+
+    (async () => {
+      try {
+        const response = await fetch(packUrl);
+        const pack = await decodeTrajectoryPack(await response.arrayBuffer());
+        const canvas = canvasRef.current;
+        if (cancelled || !canvas) return;
+        canvas.width = pack.width;
+        canvas.height = pack.height;
+        const ctx = canvas.getContext('2d')!;
+        const loopFrames = pack.frames + pack.holdFrames;
+        const started = performance.now();
+
+        const tick = (now: number) => {
+          const frame = ((now - started) / pack.durationMs) % loopFrames;
+          drawPackFrame(ctx, pack, frame);
+          if (frame >= pack.frames - 1 && painting.complete && painting.naturalWidth) {
+            ctx.globalAlpha = Math.min(1, (frame - pack.frames + 1) / Math.max(1, pack.holdFrames / 2));
+            ctx.drawImage(painting, 0, 0, pack.width, pack.height);
+            ctx.globalAlpha = 1;
+          }
+          frameRequest = requestAnimationFrame(tick);
+        };
+        frameRequest = requestAnimationFrame(tick);
+      } catch (e) {
+        setError('Could not load the particle animation');
+      }
+    })();
+
+    return () => {
+      cancelled = true;
+      cancelAnimationFrame(frameRequest);
+    };
+  }, [packUrl, finalImage]);
+
+  if (error) {
+    return <p className="text-center text-red-300">{error}</p>;
+  }
+  return <canvas ref={canvasRef} className="w-full h-auto rounded-lg shadow-lg" />;
+}
@@ -1,8 +1,65 @@
 'use client';
 
+import { useEffect, useState } from 'react';
 import { motion } from 'framer-motion';
 
-export default function ProcessingStatus() {
+interface ProcessingStatusProps {
+  jobId?: string;
+  onFrame?: (dataUrl: string) => void;
+  onComplete?: () => void;
+  onError?: (error: string) => void;
+}
+
+interface RenderProgress {
+  stage: string | null;
+  phase: string | null;
+  frame: number;
+  total: number;
+  particles: number | null;
+  eta_seconds: number | null;
+}
+
+const STAGE_LABELS: Record<string, string> = {
+  trajectories: 'Simulating particles',
+  raw_frames: 'Drawing frames',
+  graded_frames: 'Color grading',
+  frames: 'Rendering frames',
+  encoded: 'Encoding animation',
+};
+
+export default function ProcessingStatus({ jobId, onFrame, onComplete, onError }: ProcessingStatusProps) {
+  const [progress, setProgress] = useState<RenderProgress | null>(null);
+
+  // Follow the render worker's live progress and frame stream
+  useEffect(() => {
+    if (!jobId) return;
+    const events = new EventSource(`/api/generate-animation?jobId=${jobId}&stream=1`);
+
+    events.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type === 'progress') {
+        setProgress(event);
+      } else if (event.type === 'frame') {
+        onFrame?.(`data:${event.mime};base64,${event.data}`);
+      } else if (event.type === 'done') {
+        events.close();
+        onComplete?.();
+      } else if (event.type === 'failed' || event.ok === false) {
+        events.close();
+        onError?.(event.job?.error || event.error || 'Render failed');
+      }
+    };
+    // A dropped stream would otherwise leave the status stuck mid-render
+    events.onerror = () => {
+      events.close();
+      onError?.('Lost connection to the render worker');
+    };
+
+    return () => events.close();
+  }, [jobId]);
+
+  const percent = progress && progress.total ? Math.round((progress.frame / progress.total) * 100) : 0;
+
   return (
     <motion.div
       initial={{ opacity: 0, y: 20 }}
@@ -12,29 +69,60 @@ export default function ProcessingStatus() {
       <h3 className="text-xl font-semibold text-white mb-4 text-center">
         🎭 Processing Your Painting
       </h3>
-      
-      <div className="space-y-4">
-        <div className="flex items-center gap-3">
-          <div className="w-3 h-3 bg-green-400 rounded-full animate-pulse"></div>
-          <span className="text-gray-300">Image uploaded successfully</span>
-        </div>
-        
-        <div className="flex items-center gap-3">
-          <div className="w-3 h-3 bg-blue-400 rounded-full animate-pulse"></div>
-          <span className="text-gray-300">Analyzing painting structure</span>
-        </div>
-        
-        <div className="flex items-center gap-3">
-          <div className="w-3 h-3 bg-purple-400 rounded-full animate-pulse"></div>
-          <span className="text-gray-300">Preparing particle system</span>
+
+      {jobId ? (
+        <div className="space-y-4">
+          <div className="flex justify-between text-gray-300">
+            <span>{progress?.stage ? STAGE_LABELS[progress.stage] || progress.stage : 'Waiting in queue'}</span>
+            {progress && progress.total > 0 && (
+              <span>Frame {progress.frame}/{progress.total}</span>
+            )}
+          </div>
+
+          <div className="w-full h-3 bg-white/10 rounded-full overflow-hidden">
+            <div
+              className="h-full bg-gradient-to-r from-purple-500 to-blue-500 transition-all duration-300"
+              style={{ width: `${percent}%` }}
+            />
+          </div>
+
+          {progress?.phase && (
+            <p className="text-center text-gray-200">{progress.phase}</p>
+          )}
+
+          <div className="flex justify-between text-sm text-gray-400">
+            <span>
+              {progress?.particles ? `✨ ${progress.particles.toLocaleString()} particles` : ''}
+            </span>
+            <span>
+              {progress?.eta_seconds != null ? `⏳ ~${Math.ceil(progress.eta_seconds)}s left` : ''}
+            </span>
+          </div>
         </div>
-        
-        <div className="flex items-center gap-3">
-          <div className="w-3 h-3 bg-yellow-400 rounded-full animate-pulse"></div>
-          <span className="text-gray-300">Ready for animation generation</span>
+      ) : (
+        <div className="space-y-4">
+          <div className="flex items-center gap-3">
+            <div className="w-3 h-3 bg-green-400 rounded-full animate-pulse"></div>
+            <span className="text-gray-300">Image uploaded successfully</span>
+          </div>
+
+          <div className="flex items-center gap-3">
+            <div className="w-3 h-3 bg-blue-400 rounded-full animate-pulse"></div>
+            <span className="text-gray-300">Analyzing painting structure</span>
+          </div>
+
+          <div className="flex items-center gap-3">
+            <div className="w-3 h-3 bg-purple-400 rounded-full animate-pulse"></div>
+            <span className="text-gray-300">Preparing particle system</span>
+          </div>
+
+          <div className="flex items-center gap-3">
+            <div className="w-3 h-3 bg-yellow-400 rounded-full animate-pulse"></div>
+            <span className="text-gray-300">Ready for animation generation</span>
+          </div>
         </div>
-      </div>
-      
+      )}
+
       <div className="mt-6 p-4 bg-blue-900/30 rounded-lg">
         <p className="text-sm text-blue-200 text-center">
           💡 <strong>Fun Fact:</strong> Your painting will be transformed into thousands of tiny particles that will dance, float, and perfectly reconstruct back into the original artwork!
@@ -12,12 +12,22 @@ export default function Home() {
   const [isProcessing, setIsProcessing] = useState(false);
   const [animationUrl, setAnimationUrl] = useState<string>('');
   const [error, setError] = useState<string>('');
+  const [jobId, setJobId] = useState<string>('');
+  const [pendingUrl, setPendingUrl] = useState<string>('');
+  const [pendingPackUrl, setPendingPackUrl] = useState<string>('');
+  const [packUrl, setPackUrl] = useState<string>('');
+  const [liveFrame, setLiveFrame] = useState<string>('');
+  // Render in the browser when the Python render worker is not running
+  const [useBrowserRenderer, setUseBrowserRenderer] = useState(false);
 
   const handleImageUpload = (file: File, dataUrl: string) => {
     setUploadedFile(file);
     setImageUrl(dataUrl);
     setAnimationUrl('');
     setError('');
+    setJobId('');
+    setLiveFrame('');
+    setPackUrl('');
   };
 
   const handleAnimationComplete = (url: string) => {
@@ -25,11 +35,46 @@ export default function Home() {
     setIsProcessing(false);
   };
 
-  const handleGenerateAnimation = () => {
-    if (!imageUrl) return;
+  const handleRenderComplete = () => {
+    setAnimationUrl(`${pendingUrl}?t=${Date.now()}`);
+    setPackUrl(pendingPackUrl ? `${pendingPackUrl}?t=${Date.now()}` : '');
+    setIsProcessing(false);
+    setJobId('');
+  };
+
+  const handleRenderError = (message: string) => {
+    setError(message);
+    setIsProcessing(false);
+    setJobId('');
+  };
+
+  const handleGenerateAnimation = async () => {
+    if (!imageUrl || !uploadedFile) return;
     
     setIsProcessing(true);
     setError('');
+    setLiveFrame('');
+    setUseBrowserRenderer(false);
+
+    const formData = new FormData();
+    formData.append('image', uploadedFile);
+    try {
+      const response = await fetch('/api/generate-animation', { method: 'POST', body: formData });
+      const result = await response.json();
+      if (response.status === 503) {
+        setUseBrowserRenderer(true);
+        return;
+      }
+      if (!response.ok) {
+        handleRenderError(result.error || 'Failed to start the render');
+        return;
+      }
+      setPendingUrl(result.animationUrl);
+      setPendingPackUrl(result.packUrl || '');
+      setJobId(result.jobId);
+    } catch (error) {
+      setUseBrowserRenderer(true);
+    }
   };
 
   return (
@@ -64,7 +109,12 @@ export default function Home() {
                 </button>
                 
                 {isProcessing && (
-                  <ProcessingStatus />
+                  <ProcessingStatus
+                    jobId={jobId}
+                    onFrame={setLiveFrame}
+                    onComplete={handleRenderComplete}
+                    onError={handleRenderError}
+                  />
                 )}
               </div>
             )}
@@ -76,12 +126,14 @@ export default function Home() {
               originalImage={imageUrl} 
               animationUrl={animationUrl}
               isProcessing={isProcessing}
+              liveFrame={liveFrame}
+              packUrl={packUrl}
             />
           </div>
         </div>
 
         {/* Particle Animator */}
-        {isProcessing && imageUrl && (
+        {isProcessing && useBrowserRenderer && imageUrl && (
           <div className="mt-8">
             <h2 className="text-2xl font-bold text-white text-center mb-6">
               🎭 Generating Your Particle Animation
@@ -1,18 +1,34 @@
-import cv2
-import torch
+#!/usr/bin/env python3
+"""
+Artistic Style Engine
+Gallery-style animation effects and the particle powder system, importable so
+the style selector, render worker and batch tools run styles in-process with
+the depth model kept warm between renders.
+Heavy dependencies load on demand: torch and cv2 only for MiDaS depth,
+moviepy only for MP4 output. Run with --import-report to measure them.
+"""
+
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter, ImageDraw
-from torchvision.transforms import Compose, ToTensor, Normalize
-from moviepy.editor import ImageSequenceClip
+from PIL import Image, ImageEnhance, ImageDraw
+import argparse
 import os
+import subprocess
 import sys
 import random
 
-# AUTO-GENERATED CUSTOM SCRIPT
-# Style: particle_powder
-# Frames: 180
-# Quality: 16000k bitrate, CRF 12
-# Painting: Painting5.jpeg
+import depth_maps
+from checkpoint import Checkpointer
+from engines import STYLES
+from frame_store import FrameStore
+from render_cache import DEFAULT_CACHE_DIR
+from render_pipeline import export_animation
+
+STYLE_FPS = 30
+FRAME_DURATION_MS = 1000 / STYLE_FPS
+
+# Preview defaults: longest side in pixels and frame stride
+PREVIEW_SIZE = 128
+PREVIEW_STRIDE = 10
 
 class ParticleSystem:
     def __init__(self, width, height, max_particles=2000):
@@ -90,14 +106,8 @@ class ParticleSystem:
 
 class ArtisticStyleProcessor:
     def __init__(self, width=1024, height=1024):
-        self.styles = {
-            'ethereal': self.ethereal_style,
-            'cyberpunk': self.cyberpunk_style,
-            'impressionist': self.impressionist_style,
-            'abstract': self.abstract_style,
-            'dreamlike': self.dreamlike_style,
-            'particle_powder': self.particle_powder_style
-        }
+        # One <style>_style method per style in the engines registry
+        self.styles = {style: getattr(self, f"{style}_style") for style in STYLES}
         self.particle_system = ParticleSystem(width, height)
         self.color_cache = {}
     
@@ -201,10 +211,12 @@ class ArtisticStyleProcessor:
                 dx = int(np.cos(angle) * stroke_length)
                 dy = int(np.sin(angle) * stroke_length)
                 
-                new_x = max(0, min(w-1, x + dx))
-                new_y = max(0, min(h-1, y + dy))
+                # Keep the source block as large as the destination block at the edges
+                block_h, block_w = min(4, h - y), min(4, w - x)
+                new_x = max(0, min(w - block_w, x + dx))
+                new_y = max(0, min(h - block_h, y + dy))
                 
-                enhanced_img[y:y+4, x:x+4] = img_array[new_y:new_y+4, new_x:new_x+4]
+                enhanced_img[y:y+4, x:x+4] = img_array[new_y:new_y+block_h, new_x:new_x+block_w]
         
         enhanced_img *= 0.9
         enhanced_img[:, :, 1] *= 1.1
@@ -258,80 +270,199 @@ class ArtisticStyleProcessor:
         enhanced_img[:, :, 2] *= 1.08
         return np.clip(enhanced_img, 0, 255).astype(np.uint8)
 
-def main():
-    IMAGE_PATH = "Painting5.jpeg"
-    OUTPUT_VIDEO = "painting_3d_effect_particle_powder.mp4"
+# Optional dependency groups and the modules each one imports, for --import-report
+DEPENDENCY_GROUPS = (
+    ('core', ('numpy', 'PIL.Image')),
+    ('midas depth', ('torch', 'cv2')),
+    ('mp4 encoder', ('moviepy.editor',)),
+    ('art_styles', ('art_styles',)),
+)
+
+def import_report():
+    """Time each dependency group's cold import in a fresh interpreter"""
+    print("⏱️ Cold import times (fresh interpreter per group)")
+    here = os.path.dirname(os.path.abspath(__file__))
+    for group, modules in DEPENDENCY_GROUPS:
+        code = ("import time; started = time.perf_counter(); "
+                + "; ".join(f"import {m}" for m in modules)
+                + "; print(time.perf_counter() - started)")
+        result = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True)
+        if result.returncode == 0:
+            print(f"   {group:<12} {float(result.stdout.strip()):7.3f}s  ({', '.join(modules)})")
+        else:
+            print(f"   {group:<12}   missing  ({result.stderr.strip().splitlines()[-1]})")
+
+def load_style_image(image_path, max_size, depth, cache_dir):
+    """Painting thumbnailed to max_size and its depth map"""
+    img = Image.open(image_path).convert("RGB")
+    
+    if max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    
+    return img, depth_maps.depth_map(img, depth, os.path.join(cache_dir or DEFAULT_CACHE_DIR, 'depth'))
+
+def style_frame(processor, style, img, depth_norm, i, total_frames):
+    """One styled frame with the breathing saturation and contrast applied"""
+    artistic_frame = processor.styles[style](img, depth_norm, i, total_frames)
+    frame_img = Image.fromarray(artistic_frame)
+    
+    time_factor = i / total_frames
+    saturation = 1.0 + 0.4 * np.sin(time_factor * 2 * np.pi)
+    enhancer = ImageEnhance.Color(frame_img)
+    frame_img = enhancer.enhance(saturation)
     
-    print(f"🎨 Creating PARTICLE_POWDER style animation...")
+    contrast = 1.0 + 0.3 * np.cos(time_factor * 1.5 * np.pi)
+    enhancer = ImageEnhance.Contrast(frame_img)
+    return enhancer.enhance(contrast)
+
+def render_preview(image_path, output_path, style='particle_powder', total_frames=150, max_size=1200,
+                   depth='midas', seed=0, preview_size=PREVIEW_SIZE, stride=PREVIEW_STRIDE,
+                   cache_dir=None, **_):
+    """
+    Quick GIF preview of a style render: every stride-th frame at preview_size, using
+    the final render's depth map (resized) and seed. Particle powder spawns only on
+    previewed frames, so its particle density is lower than in the final render.
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown style '{style}'. Available: {', '.join(STYLES)}")
+    img, depth_norm = load_style_image(image_path, max_size, depth, cache_dir)
+    
+    small = img.copy()
+    small.thumbnail((preview_size, preview_size), Image.Resampling.LANCZOS)
+    small_depth = np.array(Image.fromarray(depth_norm.astype(np.float32), 'F')
+                           .resize(small.size, Image.Resampling.BILINEAR))
+    
+    random.seed(seed)
+    processor = ArtisticStyleProcessor(*small.size)
+    frames = [np.asarray(style_frame(processor, style, small, small_depth, i, total_frames))
+              for i in range(0, total_frames, stride)]
+    export_animation(frames, output_path, 1000 / STYLE_FPS * stride)
+    return {'output': output_path, 'frames': len(frames), 'preview': True}
+
+def render_animation(image_path, output_path, style='particle_powder', total_frames=150,
+                     bitrate="8000k", crf="18", max_size=1200, depth='midas', seed=0, resume=False,
+                     progress=None, cache_dir=None, on_frame=None):
+    """
+    Render one style animation to an MP4 or GIF, checkpointing next to the output.
+    depth is a depth_maps provider name or a depth PNG; maps are cached under cache_dir.
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown style '{style}'. Available: {', '.join(STYLES)}")
+    frame_store_path = output_path + '.frames.npy'
+    checkpoint_path = output_path + '.checkpoint.pkl'
+    
+    print(f"🎨 Creating {style.upper()} style animation...")
+    print("📸 Processing image...")
+    img, depth_norm = load_style_image(image_path, max_size, depth, cache_dir)
+    w, h = img.size
+    
+    random.seed(seed)
+    processor = ArtisticStyleProcessor(w, h)
+    checkpointer = Checkpointer(checkpoint_path)
+    start = 0
+    # Everything the stored frames depend on; a checkpoint of any other render is discarded
+    render_params = {'painting': image_path, 'style': style, 'max_size': max_size,
+                     'depth': depth_maps.resolve_provider(depth).key(), 'seed': seed}
+    
+    print(f"🎬 Generating {total_frames} frames...")
+    frames = None
+    if resume and checkpointer.exists() and os.path.exists(frame_store_path):
+        frames = FrameStore.open(frame_store_path, 'r+')
+        changed = [name for name, value in render_params.items() if frames.meta.get(name) != value]
+        if len(frames) != total_frames:
+            changed.append('total_frames')
+        if changed:
+            print(f"⚠️ Checkpoint has a different {', '.join(changed)} - starting fresh")
+            frames = None
+            checkpointer.clear()
+        else:
+            start, processor.particle_system.particles = checkpointer.load()
+            print(f"⏯️ Resuming from checkpoint at frame {start+1}/{total_frames}")
+    if frames is None:
+        # Frames go straight into a memory-mapped store so RAM stays flat for long renders
+        frames = FrameStore.create(
+            frame_store_path, total_frames, h, w,
+            **render_params,
+            duration_ms=1000 / STYLE_FPS,
+            encode_params={'bitrate': bitrate, 'ffmpeg_params': ["-crf", crf, "-preset", "slow"]}
+        )
+    
+    for i in range(start, total_frames):
+        if i % 20 == 0:
+            particle_count = len(processor.particle_system.particles)
+            print(f"✨ Frame {i+1}/{total_frames} - Particles: {particle_count}")
+        
+        frames[i] = style_frame(processor, style, img, depth_norm, i, total_frames)
+        if progress:
+            progress('frames', i + 1, total_frames)
+        if on_frame:
+            on_frame('frames', i, frames[i])
+        
+        # Checkpoint particle state together with the frames completed so far
+        if checkpointer.due(i + 1):
+            frames.flush(i + 1)
+            checkpointer.save(i + 1, processor.particle_system.particles)
+    
+    frames.flush(total_frames)
+    
+    print(f"🎞️ Exporting {style} animation...")
+    try:
+        export_animation(frames.views(), output_path, 1000 / STYLE_FPS,
+                         bitrate=bitrate, ffmpeg_params=["-crf", crf, "-preset", "slow"])
+    except Exception:
+        print(f"💾 Rendered frames kept in {frame_store_path}")
+        print(f"   Re-export with: python frame_store.py export {frame_store_path} {output_path}")
+        raise
     
-    if not os.path.exists(IMAGE_PATH):
-        print(f"❌ Error: Image file '{IMAGE_PATH}' not found!")
+    del frames
+    os.remove(frame_store_path)
+    os.remove(frame_store_path + '.json')
+    checkpointer.clear()
+    
+    duration = total_frames / STYLE_FPS
+    print(f"🌟 {output_path} created!")
+    print(f"🎯 Style: {style} | Duration: {duration:.1f}s | Quality: {bitrate}")
+    return {'output': output_path, 'frames': total_frames}
+
+def main():
+    parser = argparse.ArgumentParser(description="Artistic style animation")
+    parser.add_argument('style', nargs='?', choices=STYLES, help="artistic style")
+    parser.add_argument('painting', nargs='?', help="painting file to animate")
+    parser.add_argument('--frames', type=int, default=150, help="number of frames at 30fps")
+    parser.add_argument('--bitrate', default="8000k", help="video bitrate")
+    parser.add_argument('--crf', default="18", help="x264 constant rate factor")
+    parser.add_argument('--output', help="output file (.mp4 or .gif)")
+    parser.add_argument('--depth', default='midas',
+                        help=f"depth provider ({', '.join(depth_maps.PROVIDERS)}) or a depth PNG")
+    parser.add_argument('--import-report', action='store_true', help="measure dependency import times and exit")
+    parser.add_argument('--resume', action='store_true', help="continue an interrupted render from its last checkpoint")
+    parser.add_argument('--preview', action='store_true', help="render a quick low-resolution GIF preview instead")
+    args = parser.parse_args()
+    
+    if args.import_report:
+        import_report()
+        return
+    if not args.style or not args.painting:
+        parser.error("style and painting are required")
+    if not os.path.exists(args.painting):
+        print(f"❌ Error: Image file '{args.painting}' not found!")
         sys.exit(1)
     
+    if args.preview:
+        preview_path = args.output or f"painting_3d_effect_{args.style}_preview.gif"
+        result = render_preview(args.painting, preview_path, style=args.style, total_frames=args.frames,
+                                depth=args.depth)
+        print(f"👀 Preview {preview_path} created: {result['frames']} frames")
+        return
+    
+    output_path = args.output or f"painting_3d_effect_{args.style}.mp4"
     try:
-        print("🧠 Loading depth estimation model...")
-        midas = torch.hub.load("intel-isl/MiDaS", "MiDaS_small")
-        midas.eval()
-        transform = torch.hub.load("intel-isl/MiDaS", "transforms").small_transform
-        
-        print("📸 Processing image...")
-        img = Image.open(IMAGE_PATH).convert("RGB")
-        
-        if max(img.size) > 1200:
-            img.thumbnail((1200, 1200), Image.Resampling.LANCZOS)
-        
-        img_np = np.array(img)
-        img_input = transform(img_np)
-        
-        print("🕳️ Analyzing depth...")
-        with torch.no_grad():
-            depth = midas(img_input).squeeze().cpu().numpy()
-        
-        h, w, _ = img_np.shape
-        depth_resized = cv2.resize(depth, (w, h))
-        depth_norm = cv2.normalize(depth_resized, None, 0, 1, cv2.NORM_MINMAX)
-        
-        processor = ArtisticStyleProcessor(w, h)
-        
-        print(f"🎬 Generating {num_frames} frames...")
-        frames = []
-        
-        for i in range(180):
-            if i % 20 == 0:
-                particle_count = len(processor.particle_system.particles) if hasattr(processor, 'particle_system') else 0
-                print(f"✨ Frame {i+1}/180 - Particles: {particle_count}")
-            
-            artistic_frame = processor.styles['particle_powder'](img, depth_norm, i, 180)
-            frame_img = Image.fromarray(artistic_frame)
-            
-            time_factor = i / 180
-            saturation = 1.0 + 0.4 * np.sin(time_factor * 2 * np.pi)
-            enhancer = ImageEnhance.Color(frame_img)
-            frame_img = enhancer.enhance(saturation)
-            
-            contrast = 1.0 + 0.3 * np.cos(time_factor * 1.5 * np.pi)
-            enhancer = ImageEnhance.Contrast(frame_img)
-            frame_img = enhancer.enhance(contrast)
-            
-            frames.append(frame_img)
-        
-        print(f"🎞️ Exporting particle_powder video...")
-        clip = ImageSequenceClip([np.array(f) for f in frames], fps=30)
-        
-        clip.write_videofile(
-            OUTPUT_VIDEO,
-            codec="libx264",
-            audio=False,
-            bitrate="16000k",
-            ffmpeg_params=["-crf", "12", "-preset", "slow"]
-        )
-        
-        duration = 180/30
-        print(f"🌟 {OUTPUT_VIDEO} created!")
-        print(f"🎯 Style: particle_powder | Duration: {duration:.1f}s | Quality: 16000k")
-        
+        render_animation(args.painting, output_path, style=args.style, total_frames=args.frames,
+                         bitrate=args.bitrate, crf=args.crf, depth=args.depth, resume=args.resume)
     except Exception as e:
         print(f"❌ Error: {str(e)}")
+        if os.path.exists(output_path + '.checkpoint.pkl'):
+            print(f"💾 Progress is checkpointed - re-run with --resume")
         sys.exit(1)
 
 if __name__ == "__main__":
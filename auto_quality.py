@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Deadline-Aware Quality
+Picks particle step, resolution and glow/highlight passes so a dissolution
+render finishes within a wall-clock budget. Per-stage rates come from short
+calibration renders of the actual painting on this machine; cost_model keeps
+them in the render cache so later runs on the same machine skip calibration.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+import engines
+import cost_model
+from cost_model import effect_name, job_settings, particle_count, render_size
+from render_cache import DEFAULT_CACHE_DIR
+
+CALIBRATION_SIZE = 96
+CALIBRATION_FRAMES = 6
+
+MIN_SIZE = 80
+SIZE_FACTOR = 0.85  # Resolution ladder between the engine default and MIN_SIZE
+STEPS = (1, 2)
+# Draw passes from richest to cheapest
+EFFECT_LEVELS = (
+    {'glow': True, 'highlight': True},
+    {'glow': True, 'highlight': False},
+    {'glow': False, 'highlight': False},
+)
+SAFETY = 0.9  # Fraction of the budget the prediction may use
+
+
+class StageTimer:
+    """progress callback that records when each pipeline stage starts"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+
+    def __call__(self, stage, done, total):
+        self.stages.setdefault(stage, time.time())
+
+
+def calibration_run(engine, painting, effects, size=CALIBRATION_SIZE, frames=CALIBRATION_FRAMES):
+    """Seconds spent in each stage of one small render"""
+    timer = StageTimer()
+    output_path = os.path.join(tempfile.gettempdir(), f"calibrate_{engine}_{os.getpid()}.gif")
+    render = engines.load_engine(engine)
+    render(painting, output_path, total_frames=frames, max_size=size, cache_dir=None,
+           progress=timer, **effects)
+    finished = time.time()
+    os.remove(output_path)
+
+    marks = [timer.started] + [timer.stages[s] for s in ('trajectories', 'raw_frames', 'graded_frames', 'encoded')]
+    setup, simulate, draw, grade = (b - a for a, b in zip(marks, marks[1:]))
+    return {'setup': setup, 'simulate': simulate, 'draw': draw, 'grade': grade,
+            'encode': finished - timer.stages['encoded']}
+
+
+def calibrate(engine, painting, size=CALIBRATION_SIZE, frames=CALIBRATION_FRAMES):
+    """Per-unit stage rates for an engine, measured with one small render per effect level"""
+    print(f"⏱️ Calibrating {engine} on {os.path.basename(painting)}...")
+    module = engines.load_module(engine)
+    with Image.open(painting) as img:
+        image_size = img.size
+    particles = particle_count(image_size, size)
+    width, height = render_size(image_size, size)
+    graded_frames = frames + module.GRADING.get('hold_frames', 0)
+
+    runs = {effect_name(effects): calibration_run(engine, painting, effects, size, frames)
+            for effects in EFFECT_LEVELS}
+    average = lambda stage: sum(run[stage] for run in runs.values()) / len(runs)
+    return {
+        'setup_per_particle': average('setup') / particles,
+        'simulate_per_particle_frame': average('simulate') / (particles * frames),
+        'draw_per_particle_frame': {name: run['draw'] / (particles * frames) for name, run in runs.items()},
+        'finish_per_pixel_frame': (average('grade') + average('encode')) / (width * height * graded_frames),
+        'machine': platform.node(),
+        'cpus': os.cpu_count(),
+        'measured_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def load_rates(engine, painting, cache_dir=DEFAULT_CACHE_DIR):
+    """Stage rates for this machine, calibrating and saving them on first use"""
+    rates = cost_model.load_rates(engine, cache_dir)
+    if rates is None:
+        rates = calibrate(engine, painting)
+        cost_model.save_rates(engine, rates, cache_dir)
+    return rates
+
+
+def quality_ladder(max_size, min_size=MIN_SIZE):
+    """Settings from best to cheapest: drop effects first, then coarsen the step, then shrink"""
+    size = max_size
+    while size >= min_size:
+        for step in STEPS:
+            for effects in EFFECT_LEVELS:
+                yield dict(effects, max_size=size, step=step)
+        size = int(size * SIZE_FACTOR)
+
+
+def choose_quality(engine, painting, budget_seconds, total_frames=None, max_size=None, rates=None,
+                   cache_dir=DEFAULT_CACHE_DIR, calibrate=True, options=None):
+    """
+    Best settings predicted to finish within budget_seconds, with the prediction
+    under 'predicted_seconds'. Falls back to the cheapest settings if nothing fits.
+    Predictions use this machine's stage rates, measured first if need be; with
+    calibrate=False the preset budgets stand in until the rates exist. Other render
+    options (lod, motion_blur) are taken into account.
+    """
+    if engine not in engines.DISSOLUTION_ENGINES:
+        raise ValueError(f"Deadline-aware quality supports the dissolution engines: "
+                         f"{', '.join(engines.DISSOLUTION_ENGINES)}")
+    if rates is None:
+        rates = load_rates(engine, painting, cache_dir) if calibrate else cost_model.load_rates(engine, cache_dir)
+    defaults = job_settings(engine)
+    total_frames = total_frames or defaults['total_frames']
+    max_size = max_size or defaults['max_size']
+    with Image.open(painting) as img:
+        image_size = img.size
+
+    choice = None
+    for settings in quality_ladder(max_size):
+        cost = cost_model.estimate(engine, image_size, dict(options or {}, total_frames=total_frames, **settings),
+                                   rates=rates)
+        if cost['seconds'] is None:
+            raise ValueError(f"No measured time budget for {engine} - run python animate_painting_premium.py --calibrate <painting>")
+        choice = dict(settings, total_frames=total_frames, predicted_seconds=cost['seconds'])
+        if cost['seconds'] <= budget_seconds * SAFETY:
+            break
+    return choice
+
+
+def render_within(engine, painting, output_path, budget_seconds, **options):
+    """Render with the best quality predicted to meet the budget"""
+    settings = choose_quality(engine, painting, budget_seconds, options.pop('total_frames', None),
+                              options.pop('max_size', None), cache_dir=options.get('cache_dir'), options=options)
+    predicted = settings.pop('predicted_seconds')
+    print(f"🎯 {budget_seconds:.0f}s budget → {settings['max_size']}px, step {settings['step']}, "
+          f"{effect_name({k: settings[k] for k in ('glow', 'highlight')})} (predicted {predicted:.1f}s)")
+    return engines.load_engine(engine)(painting, output_path, **settings, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a dissolution within a time budget")
+    parser.add_argument('painting', help="painting file to animate")
+    parser.add_argument('--engine', default=engines.DEFAULT_ENGINE, choices=sorted(engines.DISSOLUTION_ENGINES))
+    parser.add_argument('--budget', type=float, required=True, help="wall-clock budget in seconds")
+    parser.add_argument('--output', help="output file (.gif or .mp4)")
+    parser.add_argument('--dry-run', action='store_true', help="only print the chosen settings")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print(json.dumps(choose_quality(args.engine, args.painting, args.budget), indent=2))
+        return 0
+    output_path = args.output or f"{args.engine}_{os.path.splitext(os.path.basename(args.painting))[0]}.gif"
+    started = time.time()
+    render_within(args.engine, args.painting, output_path, args.budget, cache_dir=None)
+    print(f"⏱️ Finished in {time.time() - started:.1f}s (budget {args.budget:.0f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Batch Renderer
+Renders every (painting × preset) combination across a local process pool and
+writes a JSON manifest summarizing the run.
+
+  python batch_render.py 'Painting*.jpeg' --presets perfect_final/good ultra_hd/draft -j 8
+
+A preset is an engine or style name, optionally with a quality: perfect_final,
+ultra_hd/premium, particle_powder/draft. Presets of one engine that render a
+painting at the same size share cached stages, so they run back to back in
+one task; all other tasks are pulled from a shared queue by whichever worker
+is free, longest estimated task first.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+import cost_model
+import engines
+from animate_painting_premium import plan_job, run_plan
+from depth_maps import find_paintings
+from render_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_OUTPUT_DIR = 'batch_output'
+DEFAULT_DURATION = 10  # Seconds of animation for presets with a quality
+
+
+def parse_preset(preset):
+    """Split 'engine/quality' into (engine, quality); quality is None for engine defaults"""
+    engine, _, quality = preset.partition('/')
+    if engine not in engines.ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Available: {', '.join(sorted(engines.ENGINES))}")
+    return engine, quality or None
+
+
+def plan_jobs(paintings, presets, output_dir, duration=DEFAULT_DURATION, output_format='auto'):
+    """One job per (painting, preset) with its plan, output path and estimated cost"""
+    jobs = []
+    for painting in paintings:
+        with Image.open(painting) as img:
+            image_size = img.size
+        stem = os.path.splitext(os.path.basename(painting))[0]
+        for preset in presets:
+            engine, quality = parse_preset(preset)
+            plan = plan_job(engine, quality, duration) if quality else None
+            ext = output_format
+            if ext == 'auto':
+                ext = 'mp4' if engine in engines.STYLES else 'gif'
+            name = f"{stem}_{engine}" + (f"_{quality}" if quality else "")
+            estimate = cost_model.estimate(engine, image_size, plan)['seconds']
+            jobs.append({
+                'painting': painting,
+                'preset': preset,
+                'engine': engine,
+                'plan': plan,
+                'output': os.path.join(output_dir, f"{name}.{ext}"),
+                'log': os.path.join(output_dir, 'logs', f"{name}.log"),
+                'estimated_seconds': estimate,
+                # Fallback cost when the preset has no measured budget
+                'weight': estimate if estimate is not None else image_size[0] * image_size[1] / 1e4,
+            })
+    return jobs
+
+
+def group_jobs(jobs):
+    """
+    Bundle jobs that would write the same cached stages so they never run concurrently.
+    Jobs are grouped on the size they actually render at, so a bare engine preset and a
+    quality preset that resolve to the same max_size share a task.
+    """
+    groups = {}
+    for job in jobs:
+        max_size = cost_model.job_settings(job['engine'], job['plan'])['max_size']
+        groups.setdefault((job['painting'], job['engine'], max_size), []).append(job)
+    return sorted(groups.values(), key=lambda group: -sum(job['weight'] for job in group))
+
+
+def run_group(group, cache_dir):
+    """
+    Render a group of jobs in this worker process, logging each to its own file.
+    Jobs resume whatever an interrupted batch left behind: partial dissolution stages
+    in the cache and style checkpoints next to the output.
+    """
+    results = []
+    for job in group:
+        os.makedirs(os.path.dirname(job['log']), exist_ok=True)
+        started = time.time()
+        result = {k: job[k] for k in ('painting', 'preset', 'output', 'log', 'estimated_seconds')}
+        with open(job['log'], 'w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            try:
+                if job['plan']:
+                    run_plan(job['plan'], job['painting'], job['output'], cache_dir=cache_dir, resume=True)
+                else:
+                    render = engines.load_engine(job['engine'])
+                    render(job['painting'], job['output'], cache_dir=cache_dir, resume=True)
+                result['status'] = 'done'
+                result['bytes'] = os.path.getsize(job['output'])
+            except Exception as e:
+                traceback.print_exc()
+                result['status'] = 'failed'
+                result['error'] = str(e)
+        result['seconds'] = round(time.time() - started, 2)
+        result['worker_pid'] = os.getpid()
+        results.append(result)
+    return results
+
+
+def run_batch(jobs, workers=None, cache_dir=DEFAULT_CACHE_DIR, manifest_path=None):
+    """Render all jobs on a process pool and write the manifest"""
+    workers = workers or os.cpu_count()
+    groups = group_jobs(jobs)
+    started = time.time()
+    results = []
+
+    print(f"🚀 Rendering {len(jobs)} jobs in {len(groups)} tasks on {workers} workers...")
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(run_group, group, cache_dir) for group in groups]
+        for future in as_completed(futures):
+            for result in future.result():
+                results.append(result)
+                icon = '✅' if result['status'] == 'done' else '❌'
+                print(f"{icon} [{len(results)}/{len(jobs)}] {os.path.basename(result['painting'])} "
+                      f"{result['preset']} - {result['seconds']:.1f}s")
+
+    elapsed = time.time() - started
+    failed = [r for r in results if r['status'] != 'done']
+    manifest = {
+        'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started)),
+        'seconds': round(elapsed, 2),
+        'workers': workers,
+        'jobs': len(jobs),
+        'done': len(results) - len(failed),
+        'failed': len(failed),
+        'busy_seconds': round(sum(r['seconds'] for r in results), 2),
+        'results': sorted(results, key=lambda r: (r['painting'], r['preset'])),
+    }
+    if manifest_path:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    utilization = manifest['busy_seconds'] / (elapsed * workers) if elapsed else 0
+    print(f"🌟 {manifest['done']}/{len(jobs)} done in {elapsed:.1f}s - pool utilization {utilization:.0%}")
+    for result in failed:
+        print(f"   ❌ {result['painting']} {result['preset']}: {result['error']} (see {result['log']})")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render many paintings with many presets concurrently")
+    parser.add_argument('paintings', nargs='+', help="painting files, directories or glob patterns")
+    parser.add_argument('--presets', nargs='+', default=[engines.DEFAULT_ENGINE],
+                        help="engine or engine/quality presets, e.g. perfect_final ultra_hd/premium")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help="animation seconds for presets with a quality")
+    parser.add_argument('--format', choices=('auto', 'gif', 'mp4'), default='auto',
+                        help="output format (auto: MP4 for styles, GIF for dissolutions)")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help="directory for renders, logs and manifest")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="stage cache directory")
+    args = parser.parse_args()
+
+    paintings = find_paintings(args.paintings)
+    if not paintings:
+        print("❌ No paintings found")
+        return 1
+    try:
+        jobs = plan_jobs(paintings, args.presets, args.output_dir, args.duration, args.format)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, 'manifest.json')
+    manifest = run_batch(jobs, args.jobs, args.cache_dir, manifest_path)
+    print(f"📋 Manifest written to {manifest_path}")
+    return 1 if manifest['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Render Checkpoints
+Periodically saves simulation state so an interrupted render can continue
+from its last checkpoint instead of starting over
+"""
+
+import os
+import pickle
+import random
+
+DEFAULT_CHECKPOINT_EVERY = 10  # Frames between checkpoints
+
+
+class Checkpointer:
+    def __init__(self, path, every=DEFAULT_CHECKPOINT_EVERY):
+        self.path = path
+        self.every = max(1, int(every))
+
+    def due(self, frames_done):
+        return frames_done % self.every == 0
+
+    def save(self, frames_done, state):
+        """Atomically write the state reached after frames_done frames"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = {
+            'frames_done': frames_done,
+            'state': state,
+            'random_state': random.getstate(),
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Return (frames_done, state) and restore the RNG, or None without a checkpoint"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            payload = pickle.load(f)
+        random.setstate(payload['random_state'])
+        return payload['frames_done'], payload['state']
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Render Cost Model
+Predicts wall time and peak memory of a render job before it starts.
+
+Time comes from one of two measured stores. The per-preset budgets in
+time_budgets.json (`animate_painting_premium.py --calibrate`) give setup cost
+scaling with the particle count and frame cost with particles × frames, so both
+follow max_size² × step⁻²; styles scale with the pixel count instead. Budgets
+are measured with the default draw passes and scaled for other glow, highlight,
+lod and motion blur settings. The per-machine stage rates measured by
+auto_quality live in the render cache as calibration.json and, when present,
+predict each dissolution stage and draw pass separately. Peak memory is
+dominated by the Python particle objects while the particles are created,
+pickled and simulated, and by per-frame arrays for styles.
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import sys
+
+from PIL import Image
+
+import engines
+from render_cache import DEFAULT_CACHE_DIR
+
+BUDGETS_FILE = os.environ.get('ANIMATION_BUDGETS_FILE',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'time_budgets.json'))
+CALIBRATION_FILE = 'calibration.json'  # Per-machine stage rates, inside the cache directory
+
+# Resolution per export quality for the dissolution engines
+DISSOLUTION_MAX_SIZE = {
+    'draft': 200,
+    'good': 300,
+    'premium': 400,
+    'exhibition': 500,
+}
+
+# Peak RSS of a dissolution render, fitted from renders at 150px and 300px
+BASE_MEMORY_MB = 41
+MEMORY_PER_PARTICLE_MB = 1.46e-3
+
+# Peak RSS of a style render, fitted from renders at 600px and 1200px with the heuristic
+# depth provider; frames go to a memory-mapped store, so only per-frame arrays grow with size.
+# The MiDaS model, when loaded, comes on top of this.
+STYLE_BASE_MEMORY_MB = 50
+STYLE_MEMORY_PER_MPX_MB = 48
+
+# Frame cost relative to the calibrated defaults for options set away from their default,
+# measured on 250px renders of both dissolution engines: without glow frames also encode
+# much faster, motion streaks add about a tenth to the frame, and highlight and lod are within noise
+EFFECT_FRAME_COST = {
+    'glow': (True, 0.7),
+    'highlight': (True, 1.0),
+    'lod': (False, 1.0),
+    'motion_blur': (0.0, 1.1),
+}
+
+
+def load_budgets():
+    if not os.path.exists(BUDGETS_FILE):
+        return {}
+    with open(BUDGETS_FILE) as f:
+        return json.load(f)
+
+
+def calibration_path(cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, CALIBRATION_FILE)
+
+
+def rates_key(engine):
+    return f"{engine}@{platform.node()}"
+
+
+def load_rates(engine, cache_dir=DEFAULT_CACHE_DIR):
+    """Stage rates measured for an engine on this machine, or None if it was never calibrated"""
+    path = calibration_path(cache_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f).get(rates_key(engine))
+
+
+def save_rates(engine, rates, cache_dir=DEFAULT_CACHE_DIR):
+    path = calibration_path(cache_dir)
+    saved = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            saved = json.load(f)
+    saved[rates_key(engine)] = rates
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(saved, f, indent=2, sort_keys=True)
+
+
+def job_settings(engine, options=None):
+    """Effective total_frames, max_size and step of a job, filling in the engine defaults"""
+    options = dict(options or {})
+    parameters = inspect.signature(engines.load_engine(engine)).parameters
+    for name in ('total_frames', 'max_size'):
+        if name not in options and name in parameters:
+            options[name] = parameters[name].default
+    options.setdefault('step', 1)
+    return options
+
+
+def render_size(image_size, max_size):
+    width, height = image_size
+    ratio = min(1.0, max_size / max(width, height))
+    return int(width * ratio), int(height * ratio)
+
+
+def particle_count(image_size, max_size, step=1):
+    """Upper bound on particles: one per step×step cell of the resized painting"""
+    width, height = render_size(image_size, max_size)
+    return -(-width // step) * -(-height // step)
+
+
+def nearest_budget(engine, max_size, budgets):
+    """
+    Measured budget of the engine's preset closest in size, with that preset's max_size.
+    Styles render at one size for every quality, so they have one budget under their name.
+    """
+    if engine in engines.STYLES:
+        budget = budgets.get(engine)
+        return (budget, budget['max_size']) if budget else (None, None)
+    measured = [(abs(size - max_size), quality, size) for quality, size in DISSOLUTION_MAX_SIZE.items()
+                if f"{engine}/{quality}" in budgets]
+    if not measured:
+        return None, None
+    _, quality, size = min(measured)
+    return budgets[f"{engine}/{quality}"], size
+
+
+def effect_cost(settings):
+    """Frame cost factor of the draw options that differ from the calibrated defaults"""
+    factor = 1.0
+    for name, (default, cost) in EFFECT_FRAME_COST.items():
+        if settings.get(name, default) != default:
+            factor *= cost
+    return factor
+
+
+def estimate(engine, image_size, options=None, budgets=None, rates=None):
+    """
+    Predicted cost of rendering a painting of image_size with an engine and options.
+    Time comes from this machine's stage rates when given (see load_rates), else from
+    the preset budgets; dissolution cost follows the particle count and style cost the
+    pixel count, since styles run per-pixel effects on every frame.
+    seconds is None when the engine has no measured budget.
+    """
+    settings = job_settings(engine, options)
+    budgets = load_budgets() if budgets is None else budgets
+    width, height = render_size(image_size, settings['max_size'])
+    if engine in engines.STYLES:
+        particles = None
+        units = width * height
+        peak_mb = STYLE_BASE_MEMORY_MB + units / 1e6 * STYLE_MEMORY_PER_MPX_MB
+    else:
+        particles = particle_count(image_size, settings['max_size'], settings['step'])
+        if settings.get('particle_budget'):
+            particles = min(particles, settings['particle_budget'])
+        units = particles
+        peak_mb = BASE_MEMORY_MB + particles * MEMORY_PER_PARTICLE_MB
+    result = {
+        'engine': engine,
+        'total_frames': settings['total_frames'],
+        'max_size': settings['max_size'],
+        'step': settings['step'],
+        'particles': particles,
+        'seconds': None,
+        'peak_mb': round(peak_mb, 1),
+    }
+
+    if rates and engine in engines.DISSOLUTION_ENGINES:
+        hold_frames = engines.load_module(engine).GRADING.get('hold_frames', 0)
+        seconds = predict_seconds(rates, image_size, settings['total_frames'], hold_frames, settings['max_size'],
+                                  settings['step'], settings.get('glow', True), settings.get('highlight', True),
+                                  particles)
+        # Glow and highlight have their own measured draw rates
+        extra = {name: settings.get(name, EFFECT_FRAME_COST[name][0]) for name in ('lod', 'motion_blur')}
+        result['seconds'] = round(seconds * effect_cost(extra), 1)
+        return result
+    budget, budget_size = nearest_budget(engine, settings['max_size'], budgets)
+    if budget:
+        megapixels = units / 1e6
+        budget_width, budget_height = render_size(image_size, budget_size)
+        budget_megapixels = (budget_width * budget_height if particles is None
+                             else particle_count(image_size, budget_size)) / 1e6
+        setup = budget['setup_seconds'] * megapixels / budget_megapixels
+        frames = settings['total_frames'] * budget['seconds_per_frame_mpx'] * megapixels * effect_cost(settings)
+        result['seconds'] = round(setup + frames, 1)
+    return result
+
+
+def effect_name(effects):
+    return '+'.join(name for name, on in effects.items() if on) or 'plain'
+
+
+def predict_seconds(rates, image_size, total_frames, hold_frames, max_size, step, glow, highlight,
+                    particles=None):
+    """
+    Wall time from measured stage rates: setup, simulation and draw per particle, finishing
+    per pixel. particles defaults to one per step×step cell.
+    """
+    particles = particles or particle_count(image_size, max_size, step)
+    width, height = render_size(image_size, max_size)
+    draw = rates['draw_per_particle_frame'][effect_name({'glow': glow, 'highlight': highlight})]
+    return (particles * rates['setup_per_particle']
+            + particles * total_frames * (rates['simulate_per_particle_frame'] + draw)
+            + width * height * (total_frames + hold_frames) * rates['finish_per_pixel_frame'])
+
+
+def over_budget(cost, max_seconds=None, max_memory_mb=None):
+    """Reason the cost exceeds a budget, or None if it fits"""
+    if max_seconds and cost['seconds'] is not None and cost['seconds'] > max_seconds:
+        return f"estimated {cost['seconds']:.0f}s exceeds the {max_seconds:.0f}s budget"
+    if max_memory_mb and cost['peak_mb'] is not None and cost['peak_mb'] > max_memory_mb:
+        return f"estimated {cost['peak_mb']:.0f}MB exceeds the {max_memory_mb:.0f}MB memory budget"
+    if max_seconds and cost['seconds'] is None:
+        return f"no measured time budget for {cost['engine']} to check against the {max_seconds:.0f}s budget"
+    return None
+
+
+def downgrade(engine, image_size, options=None, max_seconds=None, max_memory_mb=None,
+              min_size=100, factor=0.8, budgets=None, rates=None):
+    """
+    Shrink max_size until the job fits its budgets.
+    Returns (options, cost) for the largest size that fits, or None if none does.
+    """
+    options = job_settings(engine, options)
+    budgets = load_budgets() if budgets is None else budgets
+    max_size = options['max_size']
+    while max_size >= min_size:
+        candidate = dict(options, max_size=max_size)
+        cost = estimate(engine, image_size, candidate, budgets, rates)
+        if not over_budget(cost, max_seconds, max_memory_mb):
+            return candidate, cost
+        max_size = int(max_size * factor)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict render time and peak memory")
+    parser.add_argument('painting', help="painting file")
+    parser.add_argument('--engine', default=engines.DEFAULT_ENGINE, choices=sorted(engines.ENGINES))
+    parser.add_argument('--frames', type=int, help="total frames (default: engine default)")
+    parser.add_argument('--max-size', type=int, help="longest side in pixels (default: engine default)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="cache directory holding this machine's calibration")
+    args = parser.parse_args()
+
+    options = {}
+    if args.frames:
+        options['total_frames'] = args.frames
+    if args.max_size:
+        options['max_size'] = args.max_size
+    with Image.open(args.painting) as img:
+        cost = estimate(args.engine, img.size, options, rates=load_rates(args.engine, args.cache_dir))
+
+    units = f"{cost['particles']} particles" if cost['particles'] is not None else "per-pixel style"
+    print(f"🧮 {args.engine}: {units} × {cost['total_frames']} frames at {cost['max_size']}px")
+    if cost['seconds'] is None:
+        print("⏳ Time: unmeasured - run python animate_painting_premium.py --calibrate <painting>")
+    else:
+        print(f"⏳ Time: {cost['seconds']:.1f}s")
+    print(f"💾 Peak memory: {cost['peak_mb']:.0f}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Depth Map Providers
+One interface for every depth source used by the styles and engines:
+MiDaS from locally cached weights, the brightness+edge heuristic, or a
+user-supplied depth PNG. Maps are normalized float32 in [0, 1] and cached on
+disk keyed by image hash and provider, so a painting's depth is computed once.
+
+Bulk ingestion: python depth_maps.py <dir|glob>... --batch-size 8 --threads 8
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from render_cache import DEFAULT_CACHE_DIR, file_digest
+
+DEFAULT_DEPTH_CACHE = os.path.join(DEFAULT_CACHE_DIR, 'depth')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+
+# Local MiDaS checkout, and a state dict to use instead of the torch hub checkpoint cache
+MIDAS_REPO = os.environ.get('MIDAS_REPO')
+MIDAS_WEIGHTS = os.environ.get('MIDAS_WEIGHTS')
+# MiDaS small checkpoint as torch hub caches it under <hub dir>/checkpoints
+MIDAS_CHECKPOINT = 'midas_v21_small_256.pt'
+# Every image is resized to this square for inference, so any mix of aspect ratios batches together
+MIDAS_INPUT_SIZE = 256
+
+
+def normalize_depth(depth):
+    """Scale a depth map to float32 [0, 1]; a flat map becomes all zeros"""
+    depth = np.asarray(depth, dtype=np.float32)
+    span = float(depth.max() - depth.min())
+    if span == 0:
+        return np.zeros_like(depth)
+    return (depth - depth.min()) / span
+
+
+def image_digest(img):
+    """SHA-256 of an image's size, mode and pixels"""
+    digest = hashlib.sha256(f"{img.size}:{img.mode}".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+class HeuristicDepth:
+    """
+    Brightness plus edge strength, no model needed. Edges are found per RGB channel
+    and then converted to gray, or with edge_source='gray' on the grayscale image.
+    """
+    name = 'simple'
+
+    def __init__(self, edge_weight=0.3, edge_source='rgb'):
+        if edge_source not in ('rgb', 'gray'):
+            raise ValueError(f"Unknown edge source '{edge_source}'. Use 'rgb' or 'gray'")
+        self.edge_weight = edge_weight
+        self.edge_source = edge_source
+
+    def key(self):
+        return f"{self.name}-{self.edge_weight}" + ("-gray" if self.edge_source == 'gray' else "")
+
+    def compute(self, img):
+        gray_img = img.convert('L')
+        gray = np.array(gray_img).astype(np.float32) / 255.0
+        source = gray_img if self.edge_source == 'gray' else img
+        edges = np.array(source.filter(ImageFilter.FIND_EDGES).convert('L')).astype(np.float32) / 255.0
+        return normalize_depth(gray * (1 - self.edge_weight) + edges * self.edge_weight)
+
+
+class FileDepth:
+    """Grayscale depth PNG supplied by the user, resized to the painting"""
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+
+    def key(self):
+        return f"{self.name}-{file_digest(self.path)[:16]}"
+
+    def compute(self, img):
+        with Image.open(self.path) as depth_img:
+            depth_img = depth_img.convert('F').resize(img.size, Image.Resampling.BILINEAR)
+            return normalize_depth(np.array(depth_img))
+
+
+# MiDaS model and transform, loaded once per process
+_midas = None
+
+
+class MidasUnavailable(RuntimeError):
+    """MiDaS cannot run here: torch, the hub checkout or the weights are missing"""
+
+
+class MidasDepth:
+    """MiDaS small from a local torch hub checkout; never touches the network"""
+    name = 'midas'
+
+    def key(self):
+        return f"{self.name}-{MIDAS_INPUT_SIZE}"
+
+    def load_model(self):
+        global _midas
+        if _midas is None:
+            try:
+                import torch
+            except ImportError:
+                raise MidasUnavailable("MiDaS needs torch. Install it or use the 'simple' depth provider.")
+            repo = MIDAS_REPO or os.path.join(torch.hub.get_dir(), 'intel-isl_MiDaS_master')
+            if not os.path.isdir(repo):
+                raise MidasUnavailable(
+                    f"MiDaS not found at {repo}. Set MIDAS_REPO to a local checkout "
+                    f"or use the 'simple' depth provider.")
+            # hubconf downloads missing pretrained weights, so they are only ever loaded from disk
+            weights = MIDAS_WEIGHTS or os.path.join(torch.hub.get_dir(), 'checkpoints', MIDAS_CHECKPOINT)
+            if not os.path.isfile(weights):
+                raise MidasUnavailable(
+                    f"MiDaS weights not found at {weights}. Set MIDAS_WEIGHTS to a local "
+                    f"{MIDAS_CHECKPOINT} or use the 'simple' depth provider.")
+            print("🧠 Loading depth estimation model...")
+            midas = torch.hub.load(repo, "MiDaS_small", source='local', pretrained=False)
+            midas.load_state_dict(torch.load(weights, map_location='cpu'))
+            midas.eval()
+            transform = torch.hub.load(repo, "transforms", source='local').small_transform
+            _midas = (midas, transform)
+        return _midas
+
+    def compute(self, img):
+        print("🕳️ Analyzing depth...")
+        return self.compute_batch([img])[0]
+
+    def compute_batch(self, imgs, batch_size=8):
+        """
+        Depth maps for several images with one forward pass per batch_size images.
+        Every image is resized to MIDAS_INPUT_SIZE square, whatever its aspect ratio,
+        and its depth is resized back, so compute() gives the same result alone.
+        """
+        midas, transform = self.load_model()
+        import cv2
+        import torch
+
+        sizes = [img.size for img in imgs]
+        depths = []
+        with torch.no_grad():
+            for start in range(0, len(imgs), batch_size):
+                batch = torch.cat([
+                    transform(cv2.resize(np.array(img), (MIDAS_INPUT_SIZE, MIDAS_INPUT_SIZE),
+                                         interpolation=cv2.INTER_AREA))
+                    for img in imgs[start:start + batch_size]])
+                output = midas(batch).cpu().numpy()
+                for (w, h), depth in zip(sizes[start:start + batch_size], output):
+                    depths.append(normalize_depth(cv2.resize(depth, (w, h))))
+        return depths
+
+
+PROVIDERS = {
+    'midas': MidasDepth,
+    'simple': HeuristicDepth,
+}
+
+
+def resolve_provider(spec):
+    """Provider instance from a provider, a provider name or a depth PNG path"""
+    if hasattr(spec, 'compute'):
+        return spec
+    if spec in PROVIDERS:
+        return PROVIDERS[spec]()
+    if os.path.isfile(spec):
+        return FileDepth(spec)
+    raise ValueError(f"Unknown depth provider '{spec}'. Use one of {', '.join(PROVIDERS)} or a depth PNG path")
+
+
+def cache_path(img, provider, cache_dir):
+    return os.path.join(cache_dir, f"{image_digest(img)[:24]}_{provider.key()}.npy")
+
+
+def store_depth(path, depth):
+    """Write a depth map atomically; concurrent writers of one map each use their own temp file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp.npy', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, depth)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def depth_map(img, provider='midas', cache_dir=DEFAULT_DEPTH_CACHE):
+    """
+    Normalized float32 depth map for an RGB image, read from or written to the cache.
+    When MiDaS cannot run here the heuristic provider stands in, cached under its own key
+    so installing MiDaS later is not shadowed by the fallback.
+    """
+    provider = resolve_provider(provider)
+    path = cache_path(img, provider, cache_dir) if cache_dir is not None else None
+    if path and os.path.exists(path):
+        return np.load(path)
+
+    try:
+        depth = provider.compute(img)
+    except MidasUnavailable as e:
+        print(f"⚠️ {e} Using the simple depth provider instead.")
+        return depth_map(img, HeuristicDepth(), cache_dir)
+    if path:
+        store_depth(path, depth)
+    return depth
+
+
+def find_paintings(patterns):
+    """Image files from a mix of directories, glob patterns and plain paths, sorted"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in os.listdir(pattern):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    paths.add(os.path.join(pattern, name))
+        else:
+            paths.update(p for p in glob.glob(pattern) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def load_painting(path, max_size):
+    """RGB painting thumbnailed the way the style engine does before estimating depth"""
+    img = Image.open(path).convert("RGB")
+    if max(img.size) > max_size:
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    return img
+
+
+def precompute(paths, provider='midas', batch_size=8, threads=None, max_size=1200,
+               cache_dir=DEFAULT_DEPTH_CACHE):
+    """Fill the depth cache for many paintings, loading the model once and batching inference"""
+    provider = resolve_provider(provider)
+    threads = threads or os.cpu_count()
+    if isinstance(provider, MidasDepth):
+        import torch
+        torch.set_num_threads(threads)
+
+    started = time.time()
+    computed = skipped = 0
+    with ThreadPoolExecutor(threads) as pool:
+        for start in range(0, len(paths), batch_size):
+            chunk = paths[start:start + batch_size]
+            imgs = list(pool.map(lambda p: load_painting(p, max_size), chunk))
+            targets = [(path, img, cache_path(img, provider, cache_dir)) for path, img in zip(chunk, imgs)]
+            missing = [t for t in targets if not os.path.exists(t[2])]
+            skipped += len(targets) - len(missing)
+            if not missing:
+                continue
+
+            if isinstance(provider, MidasDepth):
+                depths = provider.compute_batch([img for _, img, _ in missing], batch_size)
+            else:
+                depths = list(pool.map(provider.compute, [img for _, img, _ in missing]))
+            for (path, _, target), depth in zip(missing, depths):
+                store_depth(target, depth)
+            computed += len(missing)
+            print(f"🕳️ {start + len(chunk)}/{len(paths)} paintings - {computed} computed, {skipped} cached")
+
+    elapsed = time.time() - started
+    print(f"✅ Depth ready for {len(paths)} paintings in {elapsed:.1f}s "
+          f"({computed / elapsed if elapsed and computed else 0:.2f} paintings/s)")
+    return {'computed': computed, 'cached': skipped, 'seconds': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute depth maps for a painting collection")
+    parser.add_argument('paintings', nargs='+', help="painting files, directories or glob patterns")
+    parser.add_argument('--provider', default='midas', help=f"depth provider ({', '.join(PROVIDERS)})")
+    parser.add_argument('--batch-size', type=int, default=8, help="paintings per forward pass")
+    parser.add_argument('--threads', type=int, help="CPU threads for loading and inference (default: all cores)")
+    parser.add_argument('--max-size', type=int, default=1200, help="longest side, matching the render setting")
+    parser.add_argument('--cache-dir', default=DEFAULT_DEPTH_CACHE, help="depth cache directory")
+    args = parser.parse_args()
+
+    paths = find_paintings(args.paintings)
+    if not paths:
+        print("❌ No paintings found")
+        return 1
+    print(f"🖼️ Precomputing {args.provider} depth for {len(paths)} paintings...")
+    precompute(paths, args.provider, args.batch_size, args.threads, args.max_size, args.cache_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Render Engine Registry
+Maps engine names used by the web API and tools to their render entry points
+"""
+
+import functools
+import importlib
+
+# Dissolution engine name → module exposing render_animation(image_path, output_path, **options)
+DISSOLUTION_ENGINES = {
+    'ultra_hd': 'ultra_hd_particles',
+    'perfect_final': 'perfect_final_painting',
+}
+
+# Artistic styles in menu order, all rendered in-process by art_styles
+STYLE_MODULE = 'art_styles'
+STYLES = ('ethereal', 'cyberpunk', 'impressionist', 'abstract', 'dreamlike', 'particle_powder')
+
+ENGINES = dict(DISSOLUTION_ENGINES, **{style: STYLE_MODULE for style in STYLES})
+
+DEFAULT_ENGINE = 'perfect_final'
+
+
+def load_module(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}'. Available: {', '.join(sorted(ENGINES))}")
+    return importlib.import_module(ENGINES[name])
+
+
+def load_engine(name):
+    """Return the render_animation function for an engine or style name"""
+    render = load_module(name).render_animation
+    if name in STYLES:
+        return functools.partial(render, style=name)
+    return render
+
+
+def load_preview(name):
+    """Return the quick render_preview function for an engine or style name"""
+    preview = load_module(name).render_preview
+    if name in STYLES:
+        return functools.partial(preview, style=name)
+    return preview
+
+
+def frame_duration_ms(name):
+    """Native per-frame duration of an engine's output"""
+    return load_module(name).FRAME_DURATION_MS
+
+
+def warm_up():
+    """Import every engine module once so later jobs start without import cost"""
+    for name in DISSOLUTION_ENGINES:
+        load_engine(name)
+    try:
+        importlib.import_module(STYLE_MODULE)
+    except ImportError as e:
+        print(f"⚠️ Style engine unavailable ({e}) - style jobs will fail")
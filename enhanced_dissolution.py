@@ -5,12 +5,14 @@ Complete dissolution into 3D particles with full reconstruction
 """
 
 import numpy as np
-from PIL import Image, ImageEnhance, ImageDraw, ImageFilter
+from PIL import Image, ImageEnhance, ImageDraw
 import os
 import sys
 import random
 import math
 
+import depth_maps
+
 class Particle3D:
     def __init__(self, x, y, z, color, original_x, original_y):
         self.original_x = original_x
@@ -55,15 +57,9 @@ class EnhancedDissolution:
         print("🔥 Converting painting to 3D particles...")
         img_array = np.array(self.image)
         
-        # Create depth map from image brightness and edges
-        gray = self.image.convert('L')
-        edges = gray.filter(ImageFilter.FIND_EDGES)
-        gray_array = np.array(gray).astype(np.float32)
-        edge_array = np.array(edges).astype(np.float32)
-        
-        # Combine brightness and edges for depth
-        depth_map = (gray_array / 255.0) * 0.6 + (edge_array / 255.0) * 0.4
-        depth_map = (depth_map - depth_map.min()) / (depth_map.max() - depth_map.min())
+        # Depth from image brightness and grayscale edges, shared with the styles through the depth cache
+        provider = depth_maps.HeuristicDepth(edge_weight=0.4, edge_source='gray')
+        depth_map = depth_maps.depth_map(self.image, provider)
         
         # Sample every pixel for maximum detail
         step = 2  # Every 2nd pixel for good detail vs performance balance
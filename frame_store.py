@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Frame Store
+All frames of a render live in one uint8 file of shape (frames, h, w, 3) so RAM
+stays flat no matter how long the animation is, and exports can be re-run from
+disk without re-rendering
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+
+class FrameStore:
+    def __init__(self, path, frames, meta):
+        self.path = path
+        self.frames = frames
+        self.meta = meta
+
+    @classmethod
+    def create(cls, path, frame_count, height, width, **meta):
+        """Allocate a new store on disk; frames are written in place with store[i] = frame"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        frames = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                           shape=(frame_count, height, width, 3))
+        store = cls(path, frames, dict(meta, frames_written=0))
+        store._write_meta()
+        return store
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """Open an existing store; mode 'r+' allows finishing an interrupted render"""
+        frames = np.load(path, mmap_mode=mode)
+        meta = {'frames_written': len(frames)}
+        if os.path.exists(cls._meta_path(path)):
+            with open(cls._meta_path(path)) as f:
+                meta = json.load(f)
+        return cls(path, frames, meta)
+
+    @staticmethod
+    def _meta_path(path):
+        return path + '.json'
+
+    def _write_meta(self):
+        tmp_path = self._meta_path(self.path) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._meta_path(self.path))
+
+    @property
+    def shape(self):
+        return self.frames.shape
+
+    @property
+    def frames_written(self):
+        """Number of leading frames that have been rendered and flushed"""
+        return self.meta['frames_written']
+
+    @property
+    def complete(self):
+        return self.frames_written >= len(self)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        """Zero-copy view of one frame (or a slice of frames)"""
+        return self.frames[index]
+
+    def __setitem__(self, index, frame):
+        self.frames[index] = np.asarray(frame)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.frames[i]
+
+    def image(self, index):
+        return Image.fromarray(np.asarray(self.frames[index]))
+
+    def flush(self, frames_written=None):
+        """Persist written frames and record how many are complete"""
+        self.frames.flush()
+        if frames_written is not None:
+            self.meta['frames_written'] = frames_written
+            self._write_meta()
+
+    def views(self, count=None):
+        """List of zero-copy frame views, e.g. for ImageSequenceClip"""
+        return [self.frames[i] for i in range(len(self) if count is None else count)]
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'preview', 'info'):
+        print("Usage: python frame_store.py export <store.npy> <output.gif|mp4> [duration_ms]")
+        print("       python frame_store.py preview <store.npy> <frame_index> <output.png>")
+        print("       python frame_store.py info <store.npy>")
+        sys.exit(1)
+
+    command, path = sys.argv[1], sys.argv[2]
+    store = FrameStore.open(path)
+
+    if command == 'info':
+        print(f"🎞️ {path}: {store.shape} | frames written: {store.frames_written}")
+        for key, value in store.meta.items():
+            print(f"   {key}: {value}")
+    elif command == 'preview':
+        store.image(int(sys.argv[3])).save(sys.argv[4])
+        print(f"🖼️ Saved frame {sys.argv[3]} to {sys.argv[4]}")
+    else:
+        from render_pipeline import export_animation
+        output_path = sys.argv[3]
+        duration_ms = int(sys.argv[4]) if len(sys.argv) > 4 else store.meta.get('duration_ms', 75)
+        if not store.complete:
+            print(f"⚠️ Only {store.frames_written}/{len(store)} frames were rendered; exporting those")
+        export_animation(store.views(store.frames_written), output_path, duration_ms,
+                         **store.meta.get('encode_params', {}))
+        print(f"🌟 {output_path} exported from {path}")
+
+
+if __name__ == "__main__":
+    main()
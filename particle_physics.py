@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Dissolution Particle Physics
+Time-based explosion, floating and return phases shared by the dissolution engines
+"""
+
+import math
+import random
+
+
+def smoothstep(progress):
+    """Smooth return easing, slow at both ends"""
+    return progress ** 2 * (3 - 2 * progress)
+
+
+def ease_in(progress):
+    """Faster initial return, slower final positioning"""
+    return progress ** 1.5
+
+
+def update_dissolution(particles, frame_index, total_frames, frame_seconds, phase_seconds,
+                       reference_frame_seconds, return_ease=ease_in, return_pull=(0.4, 0.45)):
+    """
+    Advance particles to frame_index of a total_frames render with frame_seconds steps.
+    phase_seconds gives the explosion, floating and return lengths at the default render
+    length; renders of another length stretch them. Each step is split at the phase
+    boundaries and every per-frame force is integrated over its part of the step, counted
+    in reference frames of reference_frame_seconds, so motion does not depend on the frame
+    count. Forces that depend on the particles' own state (damping against gravity, the
+    orbit and drift around the moving depth) are taken at the middle of the step.
+    return_ease shapes the pull back home and return_pull is its per-frame strength in
+    (x and y, z) at full ease.
+    """
+    time = frame_index * frame_seconds
+    start = max(0.0, time - frame_seconds)
+    stretch = total_frames * frame_seconds / sum(phase_seconds.values())
+    explosion_end = phase_seconds['explosion'] * stretch
+    floating_end = explosion_end + phase_seconds['floating'] * stretch
+    return_seconds = phase_seconds['return'] * stretch
+    epsilon = frame_seconds * 1e-6
+    frames = lambda seconds: seconds / reference_frame_seconds
+
+    exploding = start < explosion_end - epsilon
+    if exploding:
+        segment_end = min(time, explosion_end)
+        ease_progress = (segment_end / explosion_end) ** 1.5
+        # Explosion forces ramp up with the ease, so they act for its integral
+        ease_steps = frames(explosion_end) / 2.5 * (
+            (segment_end / explosion_end) ** 2.5 - (start / explosion_end) ** 2.5)
+        # Half the damping on either side of the forces
+        half_damping_xy = 0.998 ** (frames(segment_end - start) / 2)  # Less air resistance for longer flight
+        half_damping_z = 0.99 ** (frames(segment_end - start) / 2)
+
+    floating = time > explosion_end + epsilon and start < floating_end - epsilon
+    if floating:
+        segment_start, segment_end = max(start, explosion_end), min(time, floating_end)
+        float_frames = frames(segment_end - segment_start)
+        # Oscillations are exact when taken at the segment's midpoint over a shortened step
+        float_time = frames(segment_start + segment_end) / 2 * 0.12
+        float_steps = 2 * math.sin(0.12 * float_frames / 2) / 0.12
+        drift_steps = 2 * math.sin(0.108 * float_frames / 2) / 0.108
+        orbit_steps = 2 * math.sin(0.084 * float_frames / 2) / 0.084
+
+    returning = time > floating_end + epsilon
+    if returning:
+        segment_start = max(start, floating_end)
+        return_frames = frames(time - segment_start)
+        return_progress = max(0.0, min(1.0, (time - floating_end) / return_seconds))
+        ease_return = return_ease(return_progress)
+        # Pull strength at the segment's midpoint
+        pull_progress = max(0.0, min(1.0, ((segment_start + time) / 2 - floating_end) / return_seconds))
+        ease_pull = return_ease(pull_progress)
+        # Fraction of the remaining distance still left after this step
+        remaining_xy = (1 - ease_pull * return_pull[0]) ** return_frames
+        remaining_z = (1 - ease_pull * return_pull[1]) ** return_frames
+
+    for particle in particles:
+        if exploding:
+            # EXPLOSION PHASE - Particles fly away but stay visible
+            particle.vx *= half_damping_xy
+            particle.vy *= half_damping_xy
+            particle.vz *= half_damping_z
+
+            particle.z = particle.z + particle.vz * 30 * ease_steps
+            particle.vy += 0.6 * ease_steps  # Stronger gravity for small particles
+            particle.rotation += particle.rotation_speed * ease_steps
+
+            particle.vx *= half_damping_xy
+            particle.vy *= half_damping_xy
+            particle.vz *= half_damping_z
+
+            # Explosion offset along the velocity reached at the end of the step
+            particle.x = particle.original_x + particle.vx * ease_progress * 35
+            particle.y = particle.original_y + particle.vy * ease_progress * 35
+
+            # CRITICAL: Particles NEVER fade - always full opacity
+            particle.opacity = 255
+            particle.size = particle.base_size * (1 + ease_progress * 0.15)
+
+        if floating:
+            # FLOATING PHASE - Particles constantly flying around in 3D space
+            if particle.state == "exploding":
+                particle.state = "floating"
+                # Add random floating offsets for more organic movement
+                particle.floating_offset_x = random.uniform(-80, 80)
+                particle.floating_offset_y = random.uniform(-80, 80)
+                particle.floating_offset_z = random.uniform(-50, 50)
+
+            # Depth halfway through the step, which the drift and orbit follow
+            z_mid = particle.z + particle.vz * 0.25 * float_frames / 2
+
+            # Continue physics with enhanced movement
+            particle.x += particle.vx * 0.25 * float_frames
+            particle.y += particle.vy * 0.25 * float_frames
+            particle.z += particle.vz * 0.25 * float_frames
+
+            # Dramatic floating motion - particles are ALWAYS moving and visible
+            particle.x += math.sin(float_time + particle.original_x * 0.03) * 2.5 * float_steps
+            particle.y += math.cos(float_time + particle.original_y * 0.025) * 2.2 * float_steps
+            particle.z += math.sin(float_time * 0.9 + z_mid * 0.05) * 2.0 * drift_steps
+
+            # Add orbital motion around original position
+            orbit_radius = 30 + abs(z_mid) * 0.8
+            orbit_angle = float_time * 0.7 + particle.original_x * 0.02
+            particle.x += math.cos(orbit_angle) * orbit_radius * 0.2 * orbit_steps
+            particle.y += math.sin(orbit_angle) * orbit_radius * 0.2 * orbit_steps
+
+            # Continue rotation
+            particle.rotation += particle.rotation_speed * 0.5 * float_frames
+
+            # CRITICAL: Particles stay at full opacity during floating
+            particle.opacity = 255
+
+        if returning:
+            # RETURN PHASE - Perfect reconstruction
+            if particle.state == "floating":
+                particle.state = "returning"
+
+            # Move back to EXACT original position with precision
+            particle.x = particle.original_x + (particle.x - particle.original_x) * remaining_xy
+            particle.y = particle.original_y + (particle.y - particle.original_y) * remaining_xy
+            particle.z = particle.z * remaining_z
+
+            # Stop rotation smoothly
+            particle.rotation += particle.rotation_speed * (1 - ease_return) * 0.05 * return_frames
+
+            # CRITICAL: Particles become perfectly visible during return
+            particle.opacity = 255
+            particle.size = particle.base_size * (1 + (1 - ease_return) * 0.05)
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Shared Particle Renderer
+Snapshots particle state into arrays and draws frames from those snapshots
+"""
+
+import functools
+import math
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Columns of a particle snapshot
+X, Y, Z, SIZE = range(4)
+SNAPSHOT_FIELDS = 4
+
+# Uniform draws per particle: size, two launch angles, speed, rotation and spin
+PARTICLE_DRAWS = 6
+
+# Level of detail: particles whose perspective size falls below LOD_SIZE pixels skip their
+# own glow and highlight passes and are splatted into a 1/LOD_SCALE resolution density layer
+LOD_SIZE = 0.5
+LOD_SCALE = 3
+
+# Highlights are a smaller disc, lifted by HIGHLIGHT_LIFT per channel at HIGHLIGHT_ALPHA
+HIGHLIGHT_LIFT = 25
+HIGHLIGHT_ALPHA = 120
+
+# Glow is a blurred emission layer over the particle bodies: each glowing particle emits
+# the light of a (size + GLOW_GROWTH) px disc at GLOW_ALPHA, spread by a GLOW_SIGMA px Gaussian
+GLOW_GROWTH = 3
+GLOW_ALPHA = 80
+GLOW_SIGMA = 1.5
+
+# Particles within WARP_THRESHOLD screen pixels of their origin, and too near to glow, are
+# settled; WARP_CELL pixel cells whose particles have all settled are warped from the painting
+WARP_THRESHOLD = 1.0
+WARP_CELL = 8
+
+
+def pixel_draws(height, width, count=PARTICLE_DRAWS):
+    """
+    Uniform [0, 1) draws for every pixel, seeded from the random module so render seeds apply.
+    A particle takes the draws of its source pixel, so any sampling step yields the
+    same particles with the same trajectories as a full render.
+    """
+    return np.random.default_rng(random.getrandbits(64)).random((height, width, count))
+
+
+def uniform(low, high, u):
+    """Map a [0, 1) draw onto [low, high)"""
+    return low + (high - low) * u
+
+
+def snapshot_particles(particles):
+    """Capture x, y, z and size of every particle as a float32 (N, 4) array"""
+    return np.array([(p.x, p.y, p.z, p.size) for p in particles], dtype=np.float32)
+
+
+def particle_colors(particles):
+    """Particle colors as a uint8 (N, 3) array, in particle order"""
+    return np.array([p.color[:3] for p in particles], dtype=np.uint8)
+
+
+def particle_origins(particles):
+    """Source pixel x, y of every particle as a float32 (N, 2) array, in particle order"""
+    return np.array([(p.original_x, p.original_y) for p in particles], dtype=np.float32)
+
+
+def project(state, width, height):
+    """Screen x, y and drawn size of every particle under the 3D perspective"""
+    state = np.asarray(state, dtype=np.float64)
+    perspective = 1 / (1 + np.abs(state[:, Z]) * 0.01)
+    screen_x = (state[:, X] * perspective + (1 - perspective) * width * 0.5).astype(np.int64)
+    screen_y = (state[:, Y] * perspective + (1 - perspective) * height * 0.5).astype(np.int64)
+    # Size based on depth, minimum size 1 for HD detail
+    size = np.maximum(1, (state[:, SIZE] * perspective).astype(np.int64))
+    return screen_x, screen_y, size
+
+
+def remap(image, map_x, map_y):
+    """Bilinearly sample an (H, W, C) image at float pixel coordinates, clamped to its edges"""
+    height, width = image.shape[:2]
+    map_x = np.clip(map_x, 0, width - 1)
+    map_y = np.clip(map_y, 0, height - 1)
+    x0, y0 = map_x.astype(np.int64), map_y.astype(np.int64)
+    x1, y1 = np.minimum(x0 + 1, width - 1), np.minimum(y0 + 1, height - 1)
+    fx, fy = (map_x - x0)[..., None], (map_y - y0)[..., None]
+    image = np.asarray(image, dtype=np.float64)
+    top = image[y0, x0] * (1 - fx) + image[y0, x1] * fx
+    bottom = image[y1, x0] * (1 - fx) + image[y1, x1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def warp_settled(source, state, origins, background=(0, 0, 2), threshold=WARP_THRESHOLD, cell=WARP_CELL):
+    """
+    Split a frame into settled cells, warped from the source painting with one remap, and
+    the particles still to draw. A cell is settled when every particle whose origin lies in
+    it is within threshold screen pixels of that origin and too near to glow; its pixels
+    show the painting displaced by the mean offset of those particles, bilinearly upsampled
+    from the cell grid. Returns the base canvas, background outside settled cells, and a
+    mask of the particles in unsettled cells.
+    """
+    width, height = source.size
+    state = np.asarray(state, dtype=np.float64)
+    perspective = 1 / (1 + np.abs(state[:, Z]) * 0.01)
+    dx = state[:, X] * perspective + (1 - perspective) * width * 0.5 - origins[:, 0]
+    dy = state[:, Y] * perspective + (1 - perspective) * height * 0.5 - origins[:, 1]
+    settled = (np.hypot(dx, dy) <= threshold) & (np.abs(state[:, Z]) <= 5)
+
+    grid_width, grid_height = -(-width // cell), -(-height // cell)
+    ox = np.clip(origins[:, 0].astype(np.int64), 0, width - 1) // cell
+    oy = np.clip(origins[:, 1].astype(np.int64), 0, height - 1) // cell
+    cells = oy * grid_width + ox
+    counts = np.bincount(cells, minlength=grid_width * grid_height)
+    # Cells without particles have nothing to warp and stay background
+    settled_cells = (np.bincount(cells, settled, grid_width * grid_height) == counts) & (counts > 0)
+    unsettled = ~settled_cells[cells]
+    base = Image.new('RGB', (width, height), background)
+    if not settled_cells.any():
+        return base, unsettled
+
+    # Unsettled cells add no offset, so the field stays within threshold across cell borders
+    field = []
+    for offset in (dx, dy):
+        mean = np.bincount(cells, offset, grid_width * grid_height) / np.maximum(counts, 1)
+        mean[~settled_cells] = 0
+        coarse = Image.fromarray(mean.reshape(grid_height, grid_width).astype(np.float32), 'F')
+        field.append(np.asarray(coarse.resize((width, height), Image.Resampling.BILINEAR)))
+    # Each pixel shows the painting from where the particles displaced onto it came from
+    ys, xs = np.mgrid[0:height, 0:width]
+    warped = remap(np.asarray(source), xs - field[0], ys - field[1])
+    mask = settled_cells.reshape(grid_height, grid_width).repeat(cell, 0).repeat(cell, 1)[:height, :width]
+    pixels = np.array(base)
+    pixels[mask] = np.rint(warped[mask]).astype(np.uint8)
+    return Image.fromarray(pixels), unsettled
+
+
+@functools.lru_cache(maxsize=None)
+def particle_stamp(size, highlight):
+    """
+    Pixel offsets (dy, dx) of a particle drawn at size, and whether each is in its highlight,
+    rasterized once with the ellipses that would otherwise be drawn per particle
+    """
+    half = size // 2
+    mask = Image.new('L', (2 * half + 1, 2 * half + 1), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse([0, 0, 2 * half, 2 * half], fill=1)
+    if highlight and size > 2:
+        highlight_half = max(1, size // 3) // 2
+        draw.ellipse([half - highlight_half, half - highlight_half,
+                      half + highlight_half, half + highlight_half], fill=2)
+    mask = np.asarray(mask)
+    dy, dx = np.nonzero(mask)
+    return dy - half, dx - half, mask[dy, dx] == 2
+
+
+def stamp_ranks(width, height, screen_x, screen_y, sizes, ranks, highlight=False):
+    """
+    Scatter every particle's stamp at its rank and keep the highest per pixel, as a flat
+    array of rank * 2 plus 1 on highlight pixels, or -1 where no particle covers the pixel
+    """
+    top = np.full(width * height, -1, dtype=np.int64)
+    for size in np.unique(sizes).tolist():
+        members = np.flatnonzero(sizes == size)
+        dy, dx, lifted = particle_stamp(size, highlight)
+        ys = screen_y[members, None] + dy
+        xs = screen_x[members, None] + dx
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        keys = np.broadcast_to(ranks[members, None] * 2 + lifted, xs.shape)
+        np.maximum.at(top, (ys * width + xs)[inside], keys[inside])
+    return top
+
+
+def composite_bodies(canvas, top, colors):
+    """Canvas pixels as a flat int64 (N, 3) array with the stamped bodies and highlights laid in"""
+    covered = np.flatnonzero(top >= 0)
+    body = colors[top[covered] // 2].astype(np.int64)
+    lift = np.minimum(body + HIGHLIGHT_LIFT, 255)
+    # PIL's RGBA-over-RGB blend, rounded the same way
+    lifted = (body * (255 - HIGHLIGHT_ALPHA) + lift * HIGHLIGHT_ALPHA + 127) // 255
+    pixels = np.array(canvas, dtype=np.int64).reshape(-1, 3)
+    pixels[covered] = np.where((top[covered] % 2 == 1)[:, None], lifted, body)
+    return pixels
+
+
+def stamp_particles(canvas, screen_x, screen_y, sizes, colors, highlight=True):
+    """
+    Draw depth-ordered (far to near) opaque particles onto the canvas in one pass: each
+    size group is scattered through its stamp, every pixel keeps the nearest particle
+    covering it, and highlight pixels are blended with that particle's lifted color.
+    """
+    width, height = canvas.size
+    # Nearer particles have higher ranks; the low bit marks highlight pixels
+    top = stamp_ranks(width, height, screen_x, screen_y, sizes, np.arange(len(sizes)), highlight)
+    pixels = composite_bodies(canvas, top, colors)
+    canvas.paste(Image.fromarray(pixels.reshape(height, width, 3).astype(np.uint8)))
+
+
+@functools.lru_cache(maxsize=None)
+def streak_pen(width):
+    """Pixel offsets (dy, dx) of a square pen width pixels across, a streak's cross-section"""
+    dy, dx = np.mgrid[0:width, 0:width] - (width - 1) // 2
+    return dy.ravel(), dx.ravel()
+
+
+def streak_layer(pixels, body_ranks, width, height, screen_x, screen_y, tail_x, tail_y, sizes, colors):
+    """
+    Blend motion streaks into flat (N, 3) pixels in one pass. Each moving particle's pen is
+    swept from its tail to its position in pixel steps; its streak shows on the pixels where
+    it is nearer than the body beneath (body_ranks, -1 for none), at an opacity that fades
+    with its length. Overlapping streaks are composited order-independently: their combined
+    coverage over the body, with their opacity-weighted mean color.
+    """
+    length = np.hypot(tail_x - screen_x, tail_y - screen_y)
+    # Spread each particle's light along its streak, keeping short trails visible
+    alpha = np.clip(sizes / (sizes + length), 40 / 255, 1.0)
+    moving = np.flatnonzero(length >= 1)
+    steps = np.ceil(length[moving]).astype(np.int64)
+    streak = np.repeat(moving, steps)
+    along = (np.arange(len(streak)) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps, steps)
+    streak_x = np.rint(tail_x[streak] + (screen_x[streak] - tail_x[streak]) * along).astype(np.int64)
+    streak_y = np.rint(tail_y[streak] + (screen_y[streak] - tail_y[streak]) * along).astype(np.int64)
+
+    touches = []
+    for size in np.unique(sizes[streak]).tolist():
+        members = np.flatnonzero(sizes[streak] == size)
+        dy, dx = streak_pen(size)
+        ys = streak_y[members, None] + dy
+        xs = streak_x[members, None] + dx
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        ranks = np.broadcast_to(streak[members, None], xs.shape)
+        touches.append((ys * width + xs)[inside] * len(sizes) + ranks[inside])
+    if not touches:
+        return
+    # A streak covers each of its pixels once, however many of its steps reach it
+    touches = np.sort(np.concatenate(touches))
+    cells, ranks = np.divmod(touches[np.r_[True, touches[1:] != touches[:-1]]], len(sizes))
+    above = ranks > body_ranks[cells]
+    cells, ranks = cells[above], ranks[above]
+
+    opacity = alpha[ranks]
+    count = width * height
+    transmit = np.exp(np.bincount(cells, np.log1p(-np.minimum(opacity, 0.999)), count))
+    weight = np.bincount(cells, opacity, count)
+    light = np.stack([np.bincount(cells, opacity * colors[ranks, c], count) for c in range(3)], axis=-1)
+    streaked = np.flatnonzero(weight > 0)
+    mean = light[streaked] / weight[streaked, None]
+    cover = 1 - transmit[streaked, None]
+    pixels[streaked] = np.rint(pixels[streaked] * (1 - cover) + mean * cover).astype(np.int64)
+
+
+def gaussian_blur(values, sigma):
+    """Separable Gaussian blur over the first two axes, zero outside"""
+    radius = int(math.ceil(3 * sigma))
+    kernel = np.exp(-np.arange(-radius, radius + 1) ** 2 / (2 * sigma ** 2))
+    kernel /= kernel.sum()
+    height, width = values.shape[:2]
+    rest = [(0, 0)] * (values.ndim - 2)
+    padded = np.pad(values, [(radius, radius), (0, 0)] + rest)
+    values = sum(weight * padded[i:i + height] for i, weight in enumerate(kernel))
+    padded = np.pad(values, [(0, 0), (radius, radius)] + rest)
+    return sum(weight * padded[:, i:i + width] for i, weight in enumerate(kernel))
+
+
+def glow_layer(canvas, screen_x, screen_y, sizes, colors, sigma=GLOW_SIGMA):
+    """
+    Composite the glow of many particles at once: their emission is splatted into a buffer,
+    blurred once and laid over the canvas with the coverage and mean color the glow discs
+    would have had, so the cost does not grow with the particle count.
+    """
+    width, height = canvas.size
+    inside = (screen_x >= 0) & (screen_x < width) & (screen_y >= 0) & (screen_y < height)
+    cells = screen_y[inside] * width + screen_x[inside]
+    # The old discs spanned size + GLOW_GROWTH rounded down to even, pixels inclusive
+    diameter = (sizes[inside] + GLOW_GROWTH) // 2 * 2 + 1
+    energy = math.pi / 4 * diameter ** 2 * GLOW_ALPHA / 255
+    colors = colors[inside].astype(np.float64)
+    emission = np.stack([np.bincount(cells, energy, width * height)] +
+                        [np.bincount(cells, energy * colors[:, c], width * height) for c in range(3)], axis=-1)
+    emission = gaussian_blur(emission.reshape(height, width, 4), sigma)
+    coverage = 1 - np.exp(-emission[..., :1])
+    glow = emission[..., 1:] / np.maximum(emission[..., :1], 1e-9)
+    blended = np.asarray(canvas, dtype=np.float64) * (1 - coverage) + glow * coverage
+    canvas.paste(Image.fromarray(np.rint(blended).astype(np.uint8)))
+
+
+def density_layer(canvas, screen_x, screen_y, colors, scale=LOD_SCALE):
+    """
+    Composite one-pixel particles onto the canvas through a 1/scale resolution layer: each
+    cell takes its particles' mean color, covering as much of it as that many randomly
+    scattered pixels would.
+    """
+    width, height = canvas.size
+    layer_width, layer_height = -(-width // scale), -(-height // scale)
+    cells = (screen_y // scale) * layer_width + screen_x // scale
+    counts = np.bincount(cells, minlength=layer_width * layer_height)
+    sums = np.stack([np.bincount(cells, colors[:, c], layer_width * layer_height) for c in range(3)], axis=-1)
+    coverage = 1 - np.exp(-counts / scale ** 2)
+    mean = sums / np.maximum(counts, 1)[:, None]
+    layer = np.column_stack([mean, coverage * 255]).reshape(layer_height, layer_width, 4)
+    layer = Image.fromarray(np.rint(layer).astype(np.uint8), 'RGBA').resize((width, height), Image.Resampling.BILINEAR)
+    canvas.paste(layer.convert('RGB'), mask=layer.getchannel('A'))
+
+
+def draw_particles(state, colors, width, height, background=(0, 0, 2), glow=True, highlight=True,
+                   previous=None, motion_blur=0.0, lod=False, stats=None, base=None):
+    """
+    Render one frame from a snapshot with 3D perspective and optional glow and highlight passes.
+    With a previous snapshot and motion_blur (the shutter as a fraction of the frame), each
+    moving particle trails a streak back towards where it was, fading with its length; the
+    streaks are swept through one vectorized layer, so blur adds no per-particle drawing.
+    Glow is one blurred layer over the particles rather than a disc per particle, so the
+    dense painting of settled particles never hides it.
+    With lod, particles that project smaller than LOD_SIZE go through a low-resolution
+    density layer behind the rest instead of being drawn one by one.
+    A stats dict, if given, receives the frame's particle count, how many were culled
+    off-screen, drawn through the density layer and drawn one by one, and the cull rate.
+    base, if given, is drawn over instead of a blank background canvas.
+    """
+    canvas = base.copy() if base is not None else Image.new('RGB', (width, height), background)
+
+    screen_x, screen_y, sizes = project(state, width, height)
+    # Only draw particles on screen; cull the rest in one pass before sorting or any per-particle work
+    keep = (-sizes <= screen_x) & (screen_x <= width + sizes) & (-sizes <= screen_y) & (screen_y <= height + sizes)
+    culled = len(state) - int(np.count_nonzero(keep))
+    aggregated = 0
+
+    # Glow effect for far particles, laid over the bodies once they are drawn
+    glowing = keep & (np.abs(state[:, Z]) > 5) if glow else np.zeros(len(state), dtype=bool)
+    emitters = (screen_x[glowing], screen_y[glowing], sizes[glowing], colors[glowing])
+
+    if lod:
+        tiny = keep & (state[:, SIZE] / (1 + np.abs(state[:, Z]) * 0.01) < LOD_SIZE)
+        on_canvas = tiny & (screen_x >= 0) & (screen_x < width) & (screen_y >= 0) & (screen_y < height)
+        # Their glow is already in the glow layer
+        density_layer(canvas, screen_x[on_canvas], screen_y[on_canvas], colors[on_canvas].astype(np.float64))
+        keep &= ~tiny
+        aggregated = int(np.count_nonzero(tiny))
+
+    # Sort the survivors by Z-depth for proper 3D rendering (far to near)
+    visible = np.flatnonzero(keep)
+    if stats is not None:
+        stats.update(particles=len(state), culled=culled, aggregated=aggregated, drawn=len(visible),
+                     cull_rate=culled / len(state) if len(state) else 0.0)
+    order = visible[np.argsort(-state[visible, Z], kind='stable')]
+    screen_x, screen_y, sizes = screen_x[order], screen_y[order], sizes[order]
+
+    if previous is None or motion_blur <= 0:
+        # Opaque bodies and highlights only, so every particle can be stamped at once
+        stamp_particles(canvas, screen_x, screen_y, sizes, colors[order], highlight)
+        if glowing.any():
+            glow_layer(canvas, *emitters)
+        return canvas
+
+    # Streaks blend with whatever lies beneath them, so they go through their own layer
+    previous_x, previous_y, _ = (column[order] for column in project(previous, width, height))
+    tail_x = np.rint(screen_x + (previous_x - screen_x) * motion_blur).astype(np.int64)
+    tail_y = np.rint(screen_y + (previous_y - screen_y) * motion_blur).astype(np.int64)
+    bodies = stamp_ranks(width, height, screen_x, screen_y, sizes, np.arange(len(sizes)), highlight)
+    pixels = composite_bodies(canvas, bodies, colors[order])
+    streak_layer(pixels, bodies // 2, width, height, screen_x, screen_y, tail_x, tail_y, sizes, colors[order])
+    canvas.paste(Image.fromarray(pixels.reshape(height, width, 3).astype(np.uint8)))
+    if glowing.any():
+        glow_layer(canvas, *emitters)
+    return canvas
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Staged Render Cache
+Persists every stage of the particle pipeline so re-runs restart from the
+first stage whose inputs changed
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+from frame_store import FrameStore
+
+DEFAULT_CACHE_DIR = os.environ.get('ART_RENDER_CACHE', '.render_cache')
+
+# Pipeline stages in execution order
+STAGES = ('particles', 'trajectories', 'raw_frames', 'graded_frames', 'encoded')
+
+# Part of every stage key; bump it when a stage's output changes for the same inputs
+CACHE_VERSION = 4
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, used as the root key of the stage chain"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+        self._open = set()
+
+    def stage_keys(self, root_key, stage_params):
+        """Chain one key per stage so a change upstream invalidates everything after it"""
+        keys = {}
+        parent = root_key
+        for stage in STAGES:
+            payload = json.dumps([CACHE_VERSION, parent, stage, stage_params.get(stage, {})],
+                                 sort_keys=True, default=str)
+            parent = hashlib.sha256(payload.encode()).hexdigest()[:24]
+            keys[stage] = parent
+        return keys
+
+    def path(self, stage, key, name='data.npy'):
+        return os.path.join(self.root, stage, key, name)
+
+    def has(self, stage, key):
+        return os.path.exists(os.path.join(self.root, stage, key, 'COMPLETE'))
+
+    def resume_stage(self, keys):
+        """Index of the last cached stage, or -1 when nothing can be reused"""
+        for index in range(len(STAGES) - 1, -1, -1):
+            if self.has(STAGES[index], keys[STAGES[index]]):
+                return index
+        return -1
+
+    def partial(self, stage, key, name):
+        """True when an interrupted run left this stage file behind without completing"""
+        return not self.has(stage, key) and os.path.exists(self.path(stage, key, name))
+
+    def _prepare(self, stage, key, keep_partial=False):
+        directory = os.path.join(self.root, stage, key)
+        if (stage, key) not in self._open:
+            # Drop any half-written leftovers from an interrupted run unless resuming them
+            if os.path.isdir(directory) and not self.has(stage, key) and not keep_partial:
+                shutil.rmtree(directory)
+            os.makedirs(directory, exist_ok=True)
+            self._open.add((stage, key))
+        return directory
+
+    def commit(self, stage, key):
+        """Mark a stage as complete once all of its files are on disk"""
+        with open(os.path.join(self.root, stage, key, 'COMPLETE'), 'w') as f:
+            f.write(key)
+        self._open.discard((stage, key))
+
+    def save_object(self, stage, key, obj, name='data.pkl'):
+        self._prepare(stage, key)
+        with open(self.path(stage, key, name), 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_object(self, stage, key, name='data.pkl'):
+        with open(self.path(stage, key, name), 'rb') as f:
+            return pickle.load(f)
+
+    def save_array(self, stage, key, array, name='data.npy'):
+        self._prepare(stage, key)
+        np.save(self.path(stage, key, name), array)
+
+    def create_array(self, stage, key, shape, dtype, name='data.npy'):
+        """Disk-backed array that a stage fills in place before commit()"""
+        self._prepare(stage, key)
+        return np.lib.format.open_memmap(self.path(stage, key, name), mode='w+',
+                                         dtype=dtype, shape=tuple(shape))
+
+    def load_array(self, stage, key, name='data.npy', mode='r'):
+        if mode != 'r':
+            self._prepare(stage, key, keep_partial=True)
+        return np.load(self.path(stage, key, name), mmap_mode=mode)
+
+    def create_frames(self, stage, key, frame_count, height, width, **meta):
+        """Memory-mapped FrameStore that a frame stage renders into in place"""
+        self._prepare(stage, key)
+        return FrameStore.create(self.path(stage, key, 'frames.npy'), frame_count, height, width, **meta)
+
+    def load_frames(self, stage, key, mode='r'):
+        if mode != 'r':
+            self._prepare(stage, key, keep_partial=True)
+        return FrameStore.open(self.path(stage, key, 'frames.npy'), mode)
+
+    def save_file(self, stage, key, source_path, name):
+        self._prepare(stage, key)
+        shutil.copyfile(source_path, self.path(stage, key, name))
+
+    def load_file(self, stage, key, destination_path, name):
+        shutil.copyfile(self.path(stage, key, name), destination_path)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Staged Particle Render Pipeline
+particles → trajectories → raw frames → graded frames → encoded output,
+with every stage persisted through render_cache.StageCache
+"""
+
+import os
+import random
+import shutil
+import tempfile
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from checkpoint import DEFAULT_CHECKPOINT_EVERY, Checkpointer
+from particle_render import (GLOW_SIGMA, SIZE, SNAPSHOT_FIELDS, WARP_THRESHOLD, X, Y, draw_particles,
+                             particle_colors, particle_origins, snapshot_particles, warp_settled)
+from render_cache import STAGES, StageCache
+from trajectory_pack import write_pack
+
+# Preview defaults: particle sampling step, resolution scale and frame stride
+PREVIEW_STEP = 12
+PREVIEW_SCALE = 0.4
+PREVIEW_STRIDE = 5
+
+# Enhancers the reconstruction grade ramps up, by their (start, increase) grading entry
+GRADE_ENHANCERS = (('saturation', ImageEnhance.Color),
+                   ('contrast', ImageEnhance.Contrast),
+                   ('brightness', ImageEnhance.Brightness),
+                   ('sharpness', ImageEnhance.Sharpness))
+
+
+def load_painting(image_path, max_size):
+    """RGB painting scaled down so its longer side is at most max_size"""
+    img = Image.open(image_path).convert("RGB")
+    if max(img.size) > max_size:
+        ratio = max_size / max(img.size)
+        new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+    return img
+
+
+def grade_reconstruction(raw_frames, grading, start=0):
+    """
+    Yield (index, frame) for the raw frames from index start on. Past grading['start'],
+    a fraction of the frames, every enhancer ramps from its start value by its increase.
+    """
+    total_frames = len(raw_frames)
+    grade_start = grading['start']
+    for i in range(start, total_frames):
+        frame = Image.fromarray(np.asarray(raw_frames[i]))
+        if i > total_frames * grade_start:
+            return_progress = (i - total_frames * grade_start) / (total_frames * (1 - grade_start))
+            for name, enhancer_cls in GRADE_ENHANCERS:
+                base, gain = grading[name]
+                frame = enhancer_cls(frame).enhance(base + gain * return_progress)
+        yield i, frame
+
+
+def export_animation(frames, output_path, duration_ms, bitrate=None, ffmpeg_params=None):
+    """
+    Encode uint8 frames as an animated GIF, or as MP4 when the path ends in .mp4.
+    Frames may be zero-copy views into a FrameStore; they are read one at a time.
+    """
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext == '.mp4':
+        from moviepy.editor import ImageSequenceClip
+        clip = ImageSequenceClip(list(frames), fps=1000.0 / duration_ms)
+        clip.write_videofile(
+            output_path,
+            codec="libx264",
+            audio=False,
+            bitrate=bitrate,
+            ffmpeg_params=ffmpeg_params
+        )
+    else:
+        frames = iter(frames)
+        first = Image.fromarray(np.asarray(next(frames)))
+        first.save(
+            output_path,
+            save_all=True,
+            append_images=(Image.fromarray(np.asarray(frame)) for frame in frames),
+            duration=duration_ms,
+            loop=0,
+            optimize=True
+        )
+
+
+def preview_dissolution(create_dissolution, image, output_path, total_frames, grade_frames, grading,
+                        duration_ms, seed=0, step=PREVIEW_STEP, scale=PREVIEW_SCALE, stride=PREVIEW_STRIDE,
+                        background=(0, 0, 2), glow=True, highlight=True, motion_blur=0.0, lod=False,
+                        particle_budget=None, cluster_tolerance=None):
+    """
+    Quick preview of a dissolution render, written straight to output_path without caching.
+    Particles are a step-decimated subset of the full render's, created with the same seeds
+    and simulated over the same length of time with a stride times larger time step, so they
+    follow the final trajectories; every stride-th frame is drawn at scale resolution.
+    A particle_budget is divided by step², which thresholds the same blue-noise tile at a
+    lower density and so keeps a subset of the final particles; cluster_tolerance clusters
+    from step-sized cells up and cannot be combined with a budget.
+    """
+    if particle_budget and cluster_tolerance:
+        raise ValueError("A particle budget cannot be combined with clustering")
+    width, height = image.size
+    preview_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+    random.seed(seed)
+    if particle_budget:
+        dissolution = create_dissolution(image, 1, max(1, particle_budget // step ** 2))
+    else:
+        dissolution = create_dissolution(image, step, None, cluster_tolerance)
+    colors = particle_colors(dissolution.particles)
+
+    random.seed(seed + 1)
+    raw = []
+    previous = None
+    for i in range(-(-total_frames // stride)):
+        dissolution.update_particles(i, total_frames / stride, duration_ms * stride / 1000)
+        state = snapshot_particles(dissolution.particles)
+        state[:, [X, Y, SIZE]] *= scale
+        raw.append(np.asarray(draw_particles(state, colors, *preview_size, background, glow, highlight,
+                                             previous, motion_blur, lod)))
+        previous = state
+
+    preview_image = image.resize(preview_size, Image.Resampling.LANCZOS)
+    grading = dict(grading, hold_frames=-(-grading.get('hold_frames', 0) // stride))
+    frames = [np.asarray(frame) for frame in grade_frames(raw, preview_image, grading)]
+    export_animation(frames, output_path, duration_ms * stride)
+    return {'output': output_path, 'frames': len(frames), 'particles': len(colors), 'preview': True}
+
+
+def simulate_trajectories(dissolution, total_frames, out, describe_phase=None,
+                          start=0, checkpointer=None, progress=None, frame_seconds=None):
+    """
+    Step the physics by frame_seconds per frame and record every particle snapshot into out.
+    out may hold one snapshot more than total_frames, the state at the very end.
+    """
+    snapshots = len(out)
+    for i in range(start, snapshots):
+        if i % 20 == 0:
+            phase = f" - {describe_phase(min(i, total_frames - 1), total_frames)}" if describe_phase else ""
+            print(f"🧮 Simulating frame {i+1}/{snapshots}{phase}")
+        dissolution.update_particles(i, total_frames, frame_seconds)
+        out[i] = snapshot_particles(dissolution.particles)
+        if progress:
+            progress('trajectories', i + 1, snapshots)
+        if checkpointer and checkpointer.due(i + 1) and i + 1 < snapshots:
+            out.flush()
+            checkpointer.save(i + 1, dissolution)
+
+
+def catmull_rom(p0, p1, p2, p3, t):
+    """Uniform Catmull-Rom spline between p1 and p2 at t in [0, 1], elementwise over arrays"""
+    t2 = t * t
+    return 0.5 * (2 * p1 + (p2 - p0) * t
+                  + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t2
+                  + (3 * (p1 - p2) + p3 - p0) * t2 * t)
+
+
+def interpolate_trajectories(keyframes, out, progress=None):
+    """
+    Fill out (frames, particles, fields) from keyframe snapshots spanning the same length
+    of time, one more than the steps between them: keyframe j lands on frame
+    j * frames / (keyframes - 1). One spline evaluation per frame across all particles.
+    """
+    key_count, total_frames = len(keyframes), len(out)
+    for i in range(total_frames):
+        u = i * (key_count - 1) / total_frames
+        k = min(int(u), key_count - 2)
+        p0, p1, p2, p3 = (keyframes[min(max(j, 0), key_count - 1)] for j in (k - 1, k, k + 1, k + 2))
+        out[i] = catmull_rom(p0, p1, p2, p3, np.float32(u - k))
+        if progress:
+            progress('trajectories', i + 1, total_frames)
+
+
+def retime(total_frames, duration_ms, grading, fps):
+    """
+    Frame count, frame duration and grading that play the same animation at fps,
+    with the original frames simulated as keyframes: returns (total_frames, duration_ms,
+    grading, keyframes)
+    """
+    factor = duration_ms * fps / 1000
+    grading = dict(grading, hold_frames=round(grading.get('hold_frames', 0) * factor))
+    return round(total_frames * factor), 1000 / fps, grading, total_frames
+
+
+def render_staged(engine_name, create_dissolution, image, image_key, output_path,
+                  total_frames, grade_frames, grading, duration_ms,
+                  seed=0, cache=None, background=(0, 0, 2), describe_phase=None,
+                  resume=False, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, progress=None,
+                  encode_params=None, particle_step=1, glow=True, highlight=True, on_frame=None,
+                  pack_path=None, keyframes=None, motion_blur=0.0, particle_budget=None,
+                  cluster_tolerance=None, lod=False, warp_threshold=WARP_THRESHOLD):
+    """
+    Render a dissolution animation, reusing every cached stage whose inputs are unchanged.
+    grade_frames(raw_frames, image, grading, start) yields the final frames from index
+    start on; grading may set 'hold_frames' for extra frames after the simulated ones.
+    With resume=True an interrupted stage continues from its last checkpoint.
+    progress(stage, done, total) is called as frames complete, starting with
+    ('particles', count, count) once the particle count is known.
+    on_frame(stage, index, frame) receives every frame as it is rasterized.
+    encode_params (bitrate, ffmpeg_params) are passed to the MP4 encoder.
+    particle_step samples every n-th pixel; particle_budget instead importance-samples about
+    that many particles, denser where the painting has detail, and cluster_tolerance merges
+    flat-color quadtree cells into single particles. glow and highlight toggle those draw passes.
+    motion_blur, the fraction of the previous frame interval the shutter stays open,
+    streaks every particle back along its path (0 disables it). lod draws particles too
+    small to see individually through a low-resolution density layer.
+    When every pixel is a particle, cells whose particles have all settled within
+    warp_threshold pixels of their origin are warped from the painting and only the
+    other particles are drawn over them (0 always draws every particle).
+    pack_path, when set, receives a trajectory pack for client-side playback.
+    keyframes, when fewer than total_frames, simulates only that many time steps over the
+    same length of animation and fills the frames in between with Catmull-Rom splines.
+    The result's cull_rates holds the fraction of particles culled off-screen in every
+    frame rasterized by this call (None when the raw frames came from the cache).
+    """
+    scratch = None
+    if cache is None:
+        scratch = tempfile.mkdtemp(prefix='art_render_')
+        cache = StageCache(scratch)
+
+    ext = os.path.splitext(output_path)[1].lower() or '.gif'
+    width, height = image.size
+    simulated_frames = keyframes if keyframes and keyframes < total_frames else total_frames
+    # Physics steps in seconds; keyframe steps cover the animation's length in fewer, longer steps
+    frame_seconds = duration_ms / 1000 * total_frames / simulated_frames
+    # Only a particle per pixel looks like the painting it settles into
+    if particle_step != 1 or particle_budget or cluster_tolerance:
+        warp_threshold = 0
+    trajectory_params = {'total_frames': total_frames, 'duration_ms': duration_ms}
+    if simulated_frames < total_frames:
+        trajectory_params['keyframes'] = simulated_frames
+    keys = cache.stage_keys(image_key, {
+        'particles': {'engine': engine_name, 'size': [width, height], 'seed': seed, 'step': particle_step,
+                      'budget': particle_budget, 'cluster': cluster_tolerance},
+        'trajectories': trajectory_params,
+        'raw_frames': {'background': list(background), 'glow': glow, 'glow_sigma': GLOW_SIGMA,
+                       'highlight': highlight, 'motion_blur': motion_blur, 'lod': lod,
+                       'warp_threshold': warp_threshold},
+        'graded_frames': grading,
+        'encoded': {'format': ext, 'duration_ms': duration_ms, 'params': encode_params or {}},
+    })
+
+    cached = cache.resume_stage(keys)
+    # Pickled particles are only loadable by the module that wrote them (a script run
+    # as __main__ versus the same engine imported by another tool)
+    particles_name = f"{create_dissolution.__module__}.pkl"
+    if cached == 0 and not os.path.exists(cache.path('particles', keys['particles'], particles_name)):
+        cached = -1
+    if cached >= 0:
+        print(f"♻️ Reusing cached '{STAGES[cached]}' stage")
+
+    try:
+        dissolution = trajectories = raw = graded = cull_rates = None
+
+        if cached < 0:
+            print("🔥 Stage 1/5: Creating particles...")
+            random.seed(seed)
+            dissolution = create_dissolution(image, particle_step, particle_budget, cluster_tolerance)
+            cache.save_object('particles', keys['particles'], dissolution, particles_name)
+            cache.save_array('particles', keys['particles'], particle_colors(dissolution.particles), 'colors.npy')
+            cache.save_array('particles', keys['particles'], particle_origins(dissolution.particles), 'origins.npy')
+            cache.commit('particles', keys['particles'])
+
+        colors_path = cache.path('particles', keys['particles'], 'colors.npy')
+        particle_count = len(np.load(colors_path, mmap_mode='r')) if os.path.exists(colors_path) else None
+        if progress and particle_count is not None:
+            progress('particles', particle_count, particle_count)
+
+        if cached < 1:
+            print("🌌 Stage 2/5: Simulating trajectories...")
+            key = keys['trajectories']
+            simulated_name = 'keyframes.npy' if simulated_frames < total_frames else 'data.npy'
+            checkpointer = Checkpointer(cache.path('trajectories', key, 'checkpoint.pkl'), checkpoint_every)
+            start = 0
+            if resume and cache.partial('trajectories', key, 'checkpoint.pkl'):
+                start, dissolution = checkpointer.load()
+                simulated = cache.load_array('trajectories', key, simulated_name, mode='r+')
+                print(f"⏯️ Resuming simulation at frame {start+1}/{simulated_frames}")
+            else:
+                if dissolution is None:
+                    dissolution = cache.load_object('particles', keys['particles'], particles_name)
+                random.seed(seed + 1)
+                # Keyframes also need the state at the end to interpolate the last frames
+                snapshots = simulated_frames + 1 if simulated_frames < total_frames else total_frames
+                simulated = cache.create_array('trajectories', key,
+                                               (snapshots, len(dissolution.particles), SNAPSHOT_FIELDS),
+                                               np.float32, simulated_name)
+            simulate_trajectories(dissolution, simulated_frames, simulated, describe_phase,
+                                  start, checkpointer, progress, frame_seconds)
+            simulated.flush()
+            if simulated_frames < total_frames:
+                print(f"〰️ Interpolating {total_frames} frames from {simulated_frames} keyframes...")
+                trajectories = cache.create_array('trajectories', key, (total_frames,) + simulated.shape[1:],
+                                                  np.float32)
+                interpolate_trajectories(simulated, trajectories, progress)
+                trajectories.flush()
+            else:
+                trajectories = simulated
+            checkpointer.clear()
+            cache.commit('trajectories', key)
+            dissolution = None
+
+        if pack_path:
+            if trajectories is None:
+                trajectories = cache.load_array('trajectories', keys['trajectories'])
+            write_pack(pack_path, trajectories, cache.load_array('particles', keys['particles'], 'colors.npy'),
+                       width, height, duration_ms, hold_frames=grading.get('hold_frames', 0),
+                       background=background, glow=glow, highlight=highlight)
+
+        if cached < 2:
+            print("🖌️ Stage 3/5: Rasterizing frames...")
+            key = keys['raw_frames']
+            if trajectories is None:
+                trajectories = cache.load_array('trajectories', keys['trajectories'])
+            colors = cache.load_array('particles', keys['particles'], 'colors.npy')
+            origins = None
+            if warp_threshold:
+                origins_path = cache.path('particles', keys['particles'], 'origins.npy')
+                if os.path.exists(origins_path):
+                    origins = np.load(origins_path)
+                else:
+                    # Particles cached before origins were stored
+                    origins = particle_origins(cache.load_object('particles', keys['particles'],
+                                                                 particles_name).particles)
+            if resume and cache.partial('raw_frames', key, 'frames.npy.json'):
+                raw = cache.load_frames('raw_frames', key, mode='r+')
+                print(f"⏯️ Resuming rasterization at frame {raw.frames_written+1}/{total_frames}")
+            else:
+                raw = cache.create_frames('raw_frames', key, total_frames, height, width)
+            cull_rates = []
+            warped = []
+            for i in range(raw.frames_written, total_frames):
+                state, frame_colors = trajectories[i], colors
+                previous = trajectories[i - 1] if i > 0 else None
+                base = None
+                if origins is not None:
+                    # Settled cells are one remap of the painting; only the rest are drawn
+                    base, unsettled = warp_settled(image, state, origins, background, warp_threshold)
+                    state, frame_colors = state[unsettled], colors[unsettled]
+                    previous = previous[unsettled] if previous is not None else None
+                    warped.append(1 - len(state) / max(len(colors), 1))
+                stats = {}
+                raw[i] = draw_particles(state, frame_colors, width, height, background, glow, highlight,
+                                        previous, motion_blur, lod, stats, base)
+                cull_rates.append(stats['culled'] / max(len(colors), 1))
+                if i % 20 == 0:
+                    print(f"✨ Frame {i+1}/{total_frames} - {cull_rates[-1]:.0%} culled off-screen")
+                if progress:
+                    progress('raw_frames', i + 1, total_frames)
+                if on_frame:
+                    on_frame('raw_frames', i, raw[i])
+                if (i + 1) % checkpoint_every == 0:
+                    raw.flush(i + 1)
+            raw.flush(total_frames)
+            cache.commit('raw_frames', key)
+            if any(warped):
+                print(f"🌀 Warped {np.mean(warped):.0%} of particles from the painting on average "
+                      f"(up to {max(warped):.0%} per frame)")
+            if cull_rates:
+                print(f"✂️ Culled {np.mean(cull_rates):.0%} of particles off-screen on average "
+                      f"({min(cull_rates):.0%}-{max(cull_rates):.0%} per frame)")
+
+        if cached < 3:
+            print("🎨 Stage 4/5: Color grading...")
+            key = keys['graded_frames']
+            if raw is None:
+                raw = cache.load_frames('raw_frames', keys['raw_frames'])
+            frame_count = total_frames + grading.get('hold_frames', 0)
+            if resume and cache.partial('graded_frames', key, 'frames.npy.json'):
+                graded = cache.load_frames('graded_frames', key, mode='r+')
+            else:
+                graded = cache.create_frames('graded_frames', key, frame_count, height, width,
+                                             duration_ms=duration_ms)
+            start = graded.frames_written
+            for i, frame in enumerate(grade_frames(raw, image, grading, start), start):
+                graded[i] = frame
+                if progress:
+                    progress('graded_frames', i + 1, frame_count)
+                if (i + 1) % checkpoint_every == 0:
+                    graded.flush(i + 1)
+            graded.flush(frame_count)
+            cache.commit('graded_frames', key)
+
+        if cached < 4:
+            print("🎞️ Stage 5/5: Encoding animation...")
+            if graded is None:
+                graded = cache.load_frames('graded_frames', keys['graded_frames'])
+            if progress:
+                progress('encoded', 0, 1)
+            export_animation(graded, output_path, duration_ms, **(encode_params or {}))
+            cache.save_file('encoded', keys['encoded'], output_path, 'output' + ext)
+            cache.commit('encoded', keys['encoded'])
+            frame_count = len(graded)
+        else:
+            cache.load_file('encoded', keys['encoded'], output_path, 'output' + ext)
+            frame_count = None
+
+        return {
+            'output': output_path,
+            'frames': frame_count,
+            'particles': particle_count,
+            'pack': pack_path,
+            'cull_rates': cull_rates,
+            'resumed_from': STAGES[cached] if cached >= 0 else None,
+        }
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Persistent Render Worker
+Long-lived daemon on a local Unix socket that keeps NumPy, PIL and the render
+engines imported, queues jobs and renders them one after another.
+Every job is costed by cost_model on submit: jobs over the configured time or
+memory budget are downgraded, rejected or deferred, and queued jobs run
+shortest-estimate first so one heavy upload does not hold up the light ones.
+With a time budget set, a job whose engine has no measured budget counts as
+over it, so an uncosted style render cannot take the worker unchecked.
+Options are checked against the target engine's signature on submit.
+
+Protocol: one JSON object per line in, one JSON object per line out.
+  {"op": "ping"}
+  {"op": "submit", "engine": "perfect_final", "input": "...", "output": "...", "options": {...}}
+  {"op": "submit", ..., "preview": true}   quick low-resolution preview, served before full renders
+  {"op": "submit", ..., "options": {"pack": true}}   also write a .ptrj trajectory pack next to the output
+  {"op": "status", "job_id": "..."}
+  {"op": "list"}
+  {"op": "watch", "job_id": "..."}   keeps the connection open and streams progress and frame events
+Failed requests answer {"ok": false, "error": "...", "invalid": true/false}; invalid marks a
+bad request, as opposed to a rejected job, a full queue or a worker failure.
+
+A watch stream sends {"type": "progress", ...} events with the phase, frame,
+particle count and ETA, {"type": "frame", ...} events carrying a small
+WebP/JPEG thumbnail of every rendered frame, and ends with a "done" or
+"failed" event holding the job.
+"""
+
+import argparse
+import base64
+import inspect
+import io
+import itertools
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import uuid
+
+from PIL import Image, features
+
+import auto_quality
+import cost_model
+import engines
+from render_cache import DEFAULT_CACHE_DIR
+from trajectory_pack import pack_path_for
+
+DEFAULT_SOCKET = os.environ.get('ART_RENDER_SOCKET', '/tmp/art_render_worker.sock')
+DEFAULT_QUEUE_SIZE = 8
+MAX_FINISHED_JOBS = 200  # Finished jobs kept around for status polling
+THUMBNAIL_SIZE = 256
+THUMBNAIL_QUALITY = 70
+THUMBNAIL_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+OVER_BUDGET_POLICIES = ('downgrade', 'reject', 'queue')
+
+# Queue priority classes: previews, then costed jobs shortest first, then uncosted, then deferred
+PRIORITY_PREVIEW, PRIORITY_COSTED, PRIORITY_UNCOSTED, PRIORITY_DEFERRED = -1, 0, 1, 2
+
+# Options a client may pass through to an engine's render_animation
+JOB_OPTIONS = ('total_frames', 'max_size', 'duration_ms', 'seed', 'grading', 'bitrate', 'crf', 'depth',
+               'step', 'glow', 'highlight', 'deadline_seconds', 'pack', 'keyframes', 'fps',
+               'motion_blur', 'particle_budget', 'cluster', 'lod')
+# Options the worker handles itself; pack only applies to engines that can write a trajectory pack
+WORKER_OPTIONS = ('deadline_seconds', 'pack')
+
+
+def check_options(engine, options):
+    """
+    Client options validated against the engine's render_animation signature, so a job the
+    engine cannot run is refused on submit instead of failing once it reaches the queue
+    """
+    parameters = inspect.signature(engines.load_engine(engine)).parameters
+    unsupported = sorted(k for k in options if k not in JOB_OPTIONS
+                         or (k not in WORKER_OPTIONS and k not in parameters))
+    if unsupported:
+        raise ValueError(f"Engine '{engine}' does not accept: {', '.join(unsupported)}")
+    if options.get('particle_budget') and (options.get('step', 1) != 1 or options.get('cluster')):
+        raise ValueError("particle_budget cannot be combined with step or cluster")
+    if options.get('particle_budget') and options.get('deadline_seconds'):
+        raise ValueError("deadline_seconds picks the sampling step itself and cannot be combined with particle_budget")
+    return dict(options)
+
+
+class RenderJob:
+    def __init__(self, engine, input_path, output_path, options, preview=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.engine = engine
+        self.preview = preview
+        self.input_path = input_path
+        self.output_path = output_path
+        self.options = options
+        self.cost = None
+        self.admission = 'admitted'
+        self.calibrate = False
+        self.state = 'queued'
+        self.stage = None
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.particles = None
+        self.stage_started = None
+        self.describe_phase = None
+        self.latest_frame = None
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def progress(self, stage, done, total):
+        if stage == 'particles':
+            self.particles = done
+            return
+        if stage != self.stage:
+            self.stage_started = time.time()
+        self.stage, self.done, self.total = stage, done, total
+        if self.subscribers:
+            self.publish(self.progress_event())
+
+    def eta_seconds(self):
+        """Seconds left: the cost estimate minus elapsed time, else the current stage's pace"""
+        if self.started_at is None or self.finished_at is not None:
+            return None
+        now = time.time()
+        if self.cost and self.cost.get('seconds') is not None:
+            return round(max(0.0, self.cost['seconds'] - (now - self.started_at)), 1)
+        if self.done and self.total and self.stage_started:
+            return round((now - self.stage_started) / self.done * (self.total - self.done), 1)
+        return None
+
+    def progress_event(self):
+        phase = None
+        if self.describe_phase and self.stage in ('trajectories', 'raw_frames') and self.total:
+            phase = self.describe_phase(max(0, self.done - 1), self.total)
+        return {
+            'type': 'progress',
+            'job_id': self.id,
+            'state': self.state,
+            'stage': self.stage,
+            'phase': phase,
+            'frame': self.done,
+            'total': self.total,
+            'particles': self.particles,
+            'eta_seconds': self.eta_seconds(),
+            'elapsed_seconds': round(time.time() - self.started_at, 1) if self.started_at else 0,
+        }
+
+    def frame(self, stage, index, frame):
+        """Publish a thumbnail of a finished frame; skipped while nobody is watching"""
+        if not self.subscribers:
+            return
+        img = Image.fromarray(frame)
+        img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        buffer = io.BytesIO()
+        img.convert('RGB').save(buffer, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        self.latest_frame = {
+            'type': 'frame',
+            'job_id': self.id,
+            'stage': stage,
+            'index': index,
+            'total': self.total,
+            'mime': f"image/{THUMBNAIL_FORMAT.lower()}",
+            'data': base64.b64encode(buffer.getvalue()).decode(),
+        }
+        self.publish(self.latest_frame)
+
+    def publish(self, event):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def watch(self):
+        """Events for one watcher: the current state, then everything until the job finishes"""
+        events = queue.Queue()
+        with self.lock:
+            self.subscribers.append(events)
+        try:
+            if self.finished_at is not None:
+                yield {'type': self.state, 'job': self.to_dict()}
+                return
+            yield self.progress_event()
+            if self.latest_frame:
+                yield self.latest_frame
+            while True:
+                event = events.get()
+                yield event
+                if event['type'] in ('done', 'failed'):
+                    return
+        finally:
+            with self.lock:
+                self.subscribers.remove(events)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'engine': self.engine,
+            'preview': self.preview,
+            'state': self.state,
+            'stage': self.stage,
+            'done': self.done,
+            'total': self.total,
+            'particles': self.particles,
+            'eta_seconds': self.eta_seconds(),
+            'estimate': self.cost,
+            'admission': self.admission,
+            'output': self.output_path,
+            'result': self.result,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class RenderWorker:
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, cache_dir=DEFAULT_CACHE_DIR,
+                 max_seconds=None, max_memory_mb=None, over_budget='downgrade'):
+        if over_budget not in OVER_BUDGET_POLICIES:
+            raise ValueError(f"Unknown over-budget policy '{over_budget}'")
+        self.jobs = {}
+        self.pending = queue.PriorityQueue(maxsize=queue_size)
+        self.cache_dir = cache_dir
+        self.max_seconds = max_seconds
+        self.max_memory_mb = max_memory_mb
+        self.over_budget = over_budget
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+
+    def admit(self, job):
+        """Cost the job against the budgets; returns its queue priority or raises if rejected"""
+        try:
+            with Image.open(job.input_path) as img:
+                image_size = img.size
+        except OSError as e:
+            # A corrupt or unsupported upload is a problem with the request, not the worker
+            raise ValueError(f"Input is not a readable image: {e}") from e
+        if job.preview:
+            job.admission = 'preview'
+            return (PRIORITY_PREVIEW, 0, next(self.order))
+        deadline = job.options.pop('deadline_seconds', None)
+        if deadline:
+            # Calibrating takes seconds, so it runs on the render thread before this job;
+            # until then the settings are chosen from the preset budgets
+            job.calibrate = cost_model.load_rates(job.engine, self.cache_dir) is None
+            settings = auto_quality.choose_quality(job.engine, job.input_path, float(deadline),
+                                                   job.options.get('total_frames'), job.options.get('max_size'),
+                                                   cache_dir=self.cache_dir, calibrate=False, options=job.options)
+            settings.pop('predicted_seconds')
+            job.options.update(settings)
+            job.admission = f"auto quality for {float(deadline):.0f}s: {settings['max_size']}px, step {settings['step']}"
+        rates = cost_model.load_rates(job.engine, self.cache_dir)
+        job.cost = cost_model.estimate(job.engine, image_size, job.options, rates=rates)
+        reason = cost_model.over_budget(job.cost, self.max_seconds, self.max_memory_mb)
+        if reason and self.over_budget == 'downgrade':
+            fitted = cost_model.downgrade(job.engine, image_size, job.options,
+                                          self.max_seconds, self.max_memory_mb, rates=rates)
+            if fitted:
+                job.options['max_size'] = fitted[0]['max_size']
+                job.admission = f"downgraded to {job.options['max_size']}px: {reason}"
+                job.cost = fitted[1]
+                reason = None
+        if reason and self.over_budget == 'queue':
+            job.admission = f"deferred: {reason}"
+            return (PRIORITY_DEFERRED, job.cost['seconds'] or 0, next(self.order))
+        if reason:
+            raise RuntimeError(f"Job rejected: {reason}")
+        if job.cost['seconds'] is None:
+            return (PRIORITY_UNCOSTED, 0, next(self.order))
+        return (PRIORITY_COSTED, job.cost['seconds'], next(self.order))
+
+    def submit(self, request):
+        engine = request.get('engine', engines.DEFAULT_ENGINE)
+        if engine not in engines.ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'")
+        input_path = request.get('input')
+        output_path = request.get('output')
+        if not input_path or not output_path:
+            raise ValueError("Both 'input' and 'output' are required")
+        if not os.path.exists(input_path):
+            raise ValueError(f"Input file not found: {input_path}")
+
+        options = check_options(engine, request.get('options') or {})
+        if options.pop('pack', False) and engine in engines.DISSOLUTION_ENGINES:
+            options['pack_path'] = pack_path_for(output_path)
+        job = RenderJob(engine, input_path, output_path, options, bool(request.get('preview')))
+        priority = self.admit(job)
+        with self.lock:
+            self.jobs[job.id] = job
+        try:
+            self.pending.put_nowait(priority + (job,))
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job.id]
+            raise RuntimeError("Render queue is full, try again later")
+        estimate = f"~{job.cost['seconds']:.0f}s" if job.cost and job.cost['seconds'] is not None else "uncosted"
+        print(f"📥 Job {job.id} queued ({engine}, {estimate}, {job.admission}) - {self.pending.qsize()} waiting")
+        return job
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError(f"Unknown job '{job_id}'")
+        return job
+
+    def run_forever(self):
+        while True:
+            job = self.pending.get()[-1]
+            job.state = 'running'
+            job.started_at = time.time()
+            print(f"🎬 Job {job.id} started ({job.engine})")
+            try:
+                if job.calibrate and cost_model.load_rates(job.engine, self.cache_dir) is None:
+                    auto_quality.load_rates(job.engine, job.input_path, self.cache_dir)
+                render = engines.load_preview(job.engine) if job.preview else engines.load_engine(job.engine)
+                output_dir = os.path.dirname(job.output_path)
+                if output_dir:
+                    os.makedirs(output_dir, exist_ok=True)
+                job.describe_phase = getattr(engines.load_module(job.engine), 'describe_phase', None)
+                job.result = render(job.input_path, job.output_path, cache_dir=self.cache_dir,
+                                    progress=job.progress, on_frame=job.frame, **job.options)
+                job.progress('encoded', 1, 1)
+                job.state = 'done'
+                print(f"🌟 Job {job.id} done in {time.time() - job.started_at:.1f}s")
+            except Exception as e:
+                job.state = 'failed'
+                job.error = str(e)
+                print(f"❌ Job {job.id} failed: {e}")
+                traceback.print_exc()
+            finally:
+                job.finished_at = time.time()
+                job.publish({'type': job.state, 'job': job.to_dict()})
+                self.pending.task_done()
+                self._prune()
+
+    def _prune(self):
+        with self.lock:
+            finished = [j for j in self.jobs.values() if j.finished_at is not None]
+            finished.sort(key=lambda j: j.finished_at)
+            for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[job.id]
+
+    def handle(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            return {'ok': True, 'queued': self.pending.qsize(), 'engines': sorted(engines.ENGINES)}
+        if op == 'submit':
+            return {'ok': True, 'job': self.submit(request).to_dict()}
+        if op == 'status':
+            return {'ok': True, 'job': self.status(request.get('job_id')).to_dict()}
+        if op == 'list':
+            with self.lock:
+                return {'ok': True, 'jobs': [job.to_dict() for job in self.jobs.values()]}
+        raise ValueError(f"Unknown op '{op}'")
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if request.get('op') == 'watch':
+                    self.stream(self.server.worker.status(request.get('job_id')).watch())
+                    return
+                response = self.server.worker.handle(request)
+            except Exception as e:
+                # ValueErrors are problems with the request itself rather than the worker
+                response = {'ok': False, 'error': str(e), 'invalid': isinstance(e, ValueError)}
+            self.wfile.write((json.dumps(response) + '\n').encode())
+            self.wfile.flush()
+
+    def stream(self, events):
+        try:
+            for event in events:
+                self.wfile.write((json.dumps(event) + '\n').encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            events.close()
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def request(payload, socket_path=DEFAULT_SOCKET):
+    """Send one request to a running worker and return its response"""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(payload) + '\n').encode())
+        return json.loads(sock.makefile().readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent particle render worker")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help="maximum queued jobs")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="stage cache directory")
+    parser.add_argument('--max-seconds', type=float, help="estimated render time budget per job")
+    parser.add_argument('--max-memory-mb', type=float, help="estimated peak memory budget per job")
+    parser.add_argument('--over-budget', choices=OVER_BUDGET_POLICIES, default='downgrade',
+                        help="what to do with jobs over budget: shrink them, refuse them or run them last")
+    args = parser.parse_args()
+
+    print("🔥 Warming up render engines...")
+    started = time.time()
+    engines.warm_up()
+    print(f"✅ Engines ready in {time.time() - started:.2f}s")
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+
+    worker = RenderWorker(args.queue_size, args.cache_dir, args.max_seconds,
+                          args.max_memory_mb, args.over_budget)
+    threading.Thread(target=worker.run_forever, daemon=True).start()
+
+    server = WorkerServer(args.socket, RequestHandler)
+    server.worker = worker
+    print(f"🚀 Render worker listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Render worker stopped")
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
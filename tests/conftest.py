@@ -0,0 +1,22 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# The modules live at the repository root rather than in a package
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture
+def painting(tmp_path):
+    """Small synthetic painting: flat color blocks with a noisy detailed corner"""
+    pixels = np.zeros((48, 64, 3), dtype=np.uint8)
+    pixels[:, :32] = (200, 60, 40)
+    pixels[:, 32:] = (40, 90, 180)
+    pixels[:16, :16] = np.random.default_rng(0).integers(30, 255, (16, 16, 3))
+    path = tmp_path / 'painting.png'
+    Image.fromarray(pixels).save(path)
+    return str(path)
@@ -0,0 +1,45 @@
+import pytest
+
+import cost_model
+import engines
+from batch_render import group_jobs, parse_preset, plan_jobs, run_group
+
+
+def test_parse_preset_splits_engine_and_quality():
+    assert parse_preset('perfect_final') == ('perfect_final', None)
+    assert parse_preset('ultra_hd/premium') == ('ultra_hd', 'premium')
+    assert parse_preset('particle_powder/draft') == ('particle_powder', 'draft')
+
+
+@pytest.mark.parametrize('preset', ['watercolor', 'watercolor/good', 'perfect-final/draft'])
+def test_parse_preset_rejects_unknown_engines(preset):
+    with pytest.raises(ValueError, match='Unknown engine'):
+        parse_preset(preset)
+
+
+def test_presets_rendering_at_the_same_size_share_a_task(painting, tmp_path):
+    # The bare preset renders at the engine's default size, which the exhibition quality also uses
+    default_size = cost_model.job_settings('perfect_final')['max_size']
+    assert cost_model.DISSOLUTION_MAX_SIZE['exhibition'] == default_size
+    jobs = plan_jobs([painting], ['perfect_final', 'perfect_final/exhibition', 'perfect_final/draft',
+                                  'ultra_hd/exhibition'], str(tmp_path))
+
+    groups = group_jobs(jobs)
+    presets = sorted(sorted(job['preset'] for job in group) for group in groups)
+    assert presets == [['perfect_final', 'perfect_final/exhibition'], ['perfect_final/draft'],
+                       ['ultra_hd/exhibition']]
+
+
+def test_batch_jobs_resume_interrupted_renders(painting, tmp_path, monkeypatch):
+    calls = []
+
+    def render(image_path, output_path, **options):
+        calls.append(options)
+        with open(output_path, 'wb') as f:
+            f.write(b'frames')
+    jobs = plan_jobs([painting], ['perfect_final', 'ultra_hd/draft', 'ethereal/draft'], str(tmp_path))
+    monkeypatch.setattr(engines, 'load_engine', lambda name: render)
+
+    results = run_group(jobs, str(tmp_path / 'cache'))
+    assert [result['status'] for result in results] == ['done'] * 3
+    assert [options['resume'] for options in calls] == [True] * 3
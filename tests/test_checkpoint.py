@@ -0,0 +1,26 @@
+import random
+
+from checkpoint import Checkpointer
+
+
+def test_load_restores_state_and_rng(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path / 'run' / 'checkpoint.pkl'), every=5)
+    random.seed(7)
+    random.random()
+    checkpointer.save(10, {'particles': [1, 2, 3]})
+    expected = [random.random() for _ in range(3)]
+
+    random.seed(99)
+    frames_done, state = checkpointer.load()
+    assert (frames_done, state) == (10, {'particles': [1, 2, 3]})
+    assert [random.random() for _ in range(3)] == expected
+
+
+def test_due_and_clear(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path / 'checkpoint.pkl'), every=5)
+    assert [n for n in range(1, 16) if checkpointer.due(n)] == [5, 10, 15]
+    assert checkpointer.load() is None
+    checkpointer.save(5, None)
+    assert checkpointer.exists()
+    checkpointer.clear()
+    assert not checkpointer.exists() and checkpointer.load() is None
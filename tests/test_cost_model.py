@@ -0,0 +1,88 @@
+import pytest
+
+import cost_model
+
+BUDGETS = {
+    'perfect_final/draft': {'max_size': 200, 'setup_seconds': 1.0, 'seconds_per_frame_mpx': 3.0},
+    'perfect_final/exhibition': {'max_size': 500, 'setup_seconds': 4.0, 'seconds_per_frame_mpx': 3.0},
+    'ethereal': {'max_size': 600, 'setup_seconds': 2.0, 'seconds_per_frame_mpx': 1.0},
+}
+RATES = {
+    'setup_per_particle': 1e-5,
+    'simulate_per_particle_frame': 1e-6,
+    'draw_per_particle_frame': {'glow+highlight': 2e-6, 'highlight': 1e-6, 'glow': 2e-6, 'plain': 1e-6},
+    'finish_per_pixel_frame': 1e-7,
+}
+IMAGE_SIZE = (800, 600)
+
+
+def estimate(engine='perfect_final', rates=None, **options):
+    return cost_model.estimate(engine, IMAGE_SIZE, options, BUDGETS, rates)
+
+
+def test_dissolution_cost_follows_particles_and_frames():
+    cost = estimate(max_size=200, total_frames=100)
+    assert cost['particles'] == 200 * 150
+    # Exactly the draft budget: its setup plus frames × megapixels of particles × rate
+    assert cost['seconds'] == pytest.approx(1.0 + 100 * 3.0 * 0.03, abs=0.1)
+    assert estimate(max_size=200, total_frames=200)['seconds'] > cost['seconds']
+    assert estimate(max_size=200, total_frames=100, step=2)['particles'] == 100 * 75
+    assert estimate(max_size=200, total_frames=100, particle_budget=5000)['particles'] == 5000
+
+
+def test_nearest_preset_budget_is_used():
+    assert cost_model.nearest_budget('perfect_final', 450, BUDGETS) == (BUDGETS['perfect_final/exhibition'], 500)
+    assert cost_model.nearest_budget('perfect_final', 250, BUDGETS)[1] == 200
+    assert cost_model.nearest_budget('ultra_hd', 300, BUDGETS) == (None, None)
+    assert estimate('ultra_hd', max_size=300)['seconds'] is None
+
+
+def test_styles_are_costed_per_pixel():
+    cost = estimate('ethereal', max_size=400, total_frames=10)
+    assert cost['particles'] is None
+    megapixels = 400 * 300 / 1e6
+    assert cost['seconds'] == pytest.approx(2.0 * megapixels / 0.27 + 10 * megapixels, abs=0.1)
+    assert cost['peak_mb'] == pytest.approx(cost_model.STYLE_BASE_MEMORY_MB
+                                            + megapixels * cost_model.STYLE_MEMORY_PER_MPX_MB, abs=0.1)
+
+
+def test_effects_scale_the_frame_cost():
+    plain = estimate(max_size=200, total_frames=100)['seconds']
+    assert estimate(max_size=200, total_frames=100, glow=False)['seconds'] < plain
+    assert estimate(max_size=200, total_frames=100, motion_blur=0.5)['seconds'] > plain
+    assert cost_model.effect_cost({'glow': True, 'motion_blur': 0.0}) == 1.0
+
+
+def test_machine_rates_predict_each_stage():
+    cost = estimate(rates=RATES, max_size=200, total_frames=100)
+    particles, pixels = 200 * 150, 200 * 150
+    hold_frames = cost_model.engines.load_module('perfect_final').GRADING.get('hold_frames', 0)
+    expected = particles * (1e-5 + 100 * (1e-6 + 2e-6)) + pixels * (100 + hold_frames) * 1e-7
+    assert cost['seconds'] == pytest.approx(expected, abs=0.1)
+    assert estimate(rates=RATES, max_size=200, total_frames=100, glow=False)['seconds'] < cost['seconds']
+
+
+def test_rates_round_trip_through_the_cache(tmp_path):
+    assert cost_model.load_rates('perfect_final', str(tmp_path)) is None
+    cost_model.save_rates('perfect_final', RATES, str(tmp_path))
+    cost_model.save_rates('ultra_hd', {'setup_per_particle': 1.0}, str(tmp_path))
+    assert cost_model.load_rates('perfect_final', str(tmp_path)) == RATES
+
+
+def test_over_budget_reasons():
+    cost = {'engine': 'perfect_final', 'seconds': 30.0, 'peak_mb': 200.0}
+    assert cost_model.over_budget(cost) is None
+    assert cost_model.over_budget(cost, max_seconds=60, max_memory_mb=500) is None
+    assert 'exceeds the 20s budget' in cost_model.over_budget(cost, max_seconds=20)
+    assert 'memory budget' in cost_model.over_budget(cost, max_memory_mb=100)
+    assert 'no measured time budget' in cost_model.over_budget(dict(cost, seconds=None), max_seconds=20)
+
+
+def test_downgrade_shrinks_to_the_largest_size_that_fits():
+    options, cost = cost_model.downgrade('perfect_final', IMAGE_SIZE, {'max_size': 500, 'total_frames': 100},
+                                         max_seconds=10, budgets=BUDGETS)
+    assert options['max_size'] < 500 and cost['seconds'] <= 10
+    larger = estimate(max_size=int(options['max_size'] / 0.8), total_frames=100)
+    assert larger['seconds'] > 10
+    assert cost_model.downgrade('perfect_final', IMAGE_SIZE, {'total_frames': 100},
+                                max_seconds=0.01, budgets=BUDGETS) is None
@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+import depth_maps
+
+@pytest.fixture
+def torch():
+    return pytest.importorskip('torch')
+
+
+@pytest.fixture
+def fresh_model(monkeypatch):
+    """Forget any loaded model so each test goes through load_model again"""
+    monkeypatch.setattr(depth_maps, '_midas', None)
+
+
+def test_missing_weights_fail_without_downloading(tmp_path, monkeypatch, torch, fresh_model):
+    monkeypatch.setattr(depth_maps, 'MIDAS_REPO', str(tmp_path))
+    monkeypatch.setattr(depth_maps, 'MIDAS_WEIGHTS', str(tmp_path / 'missing.pt'))
+
+    def hub_load(*args, **kwargs):
+        raise AssertionError("torch.hub.load must not run without local weights")
+    monkeypatch.setattr(torch.hub, 'load', hub_load)
+
+    with pytest.raises(RuntimeError, match="MiDaS weights not found"):
+        depth_maps.MidasDepth().load_model()
+
+
+def test_mixed_aspect_ratios_share_one_forward_pass(monkeypatch, torch):
+    passes = []
+
+    def midas(batch):
+        passes.append(tuple(batch.shape))
+        # Depth rises down the image, the way the model would see a floor
+        rows = torch.arange(batch.shape[2], dtype=torch.float32)[:, None].expand(batch.shape[2:])
+        return rows.expand(batch.shape[0], *rows.shape).clone()
+
+    def transform(img_np):
+        return torch.from_numpy(img_np.astype('float32') / 255).permute(2, 0, 1)[None]
+
+    monkeypatch.setattr(depth_maps, '_midas', (midas, transform))
+    imgs = [Image.new('RGB', (120, 40), (90, 60, 30)), Image.new('RGB', (30, 90), (20, 40, 200))]
+    depths = depth_maps.MidasDepth().compute_batch(imgs)
+
+    size = depth_maps.MIDAS_INPUT_SIZE
+    assert passes == [(2, 3, size, size)]
+    assert [depth.shape for depth in depths] == [(40, 120), (90, 30)]
+    for depth in depths:
+        assert depth.min() == 0 and depth.max() == 1
+        assert (depth[-1] > depth[0]).all()
+
+
+def test_concurrent_writers_never_share_a_temp_file(tmp_path):
+    path = str(tmp_path / 'depth' / 'painting_simple.npy')
+    maps = [np.full((300, 400), value, dtype=np.float32) for value in (0.25, 0.75)]
+    errors = []
+
+    def write(depth):
+        try:
+            for _ in range(200):
+                depth_maps.store_depth(path, depth)
+        except Exception as e:
+            errors.append(e)
+
+    writers = [threading.Thread(target=write, args=(depth,)) for depth in maps]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert not errors
+    assert any(np.array_equal(np.load(path), depth) for depth in maps)
+    assert sorted(p.name for p in (tmp_path / 'depth').iterdir()) == ['painting_simple.npy']
+
+
+def test_grayscale_edges_match_the_enhanced_dissolution_depth(painting):
+    img = Image.open(painting).convert('RGB')
+    # The depth enhanced_dissolution computed before it used the shared provider
+    gray = img.convert('L')
+    edges = np.array(gray.filter(ImageFilter.FIND_EDGES)).astype(np.float32)
+    expected = (np.array(gray).astype(np.float32) / 255.0) * 0.6 + (edges / 255.0) * 0.4
+    expected = (expected - expected.min()) / (expected.max() - expected.min())
+
+    provider = depth_maps.HeuristicDepth(edge_weight=0.4, edge_source='gray')
+    assert np.allclose(provider.compute(img), expected, atol=1e-6)
+    rgb = depth_maps.HeuristicDepth(edge_weight=0.4)
+    assert not np.allclose(rgb.compute(img), expected, atol=1e-6)
+    assert provider.key() != rgb.key()
+
+
+def test_unavailable_midas_falls_back_to_the_heuristic_depth(painting, tmp_path, monkeypatch, fresh_model):
+    monkeypatch.setattr(depth_maps, 'MIDAS_REPO', str(tmp_path / 'no-checkout'))
+    img = Image.open(painting).convert('RGB')
+
+    depth = depth_maps.depth_map(img, 'midas', str(tmp_path / 'depth'))
+
+    simple = depth_maps.HeuristicDepth()
+    assert np.allclose(depth, simple.compute(img))
+    # Cached under the heuristic key, so a later MiDaS install still computes its own map
+    assert [p.name for p in (tmp_path / 'depth').iterdir()] == [
+        f"{depth_maps.image_digest(img)[:24]}_{simple.key()}.npy"]
@@ -0,0 +1,44 @@
+import numpy as np
+
+from frame_store import FrameStore
+
+
+def test_frames_round_trip_with_meta(tmp_path):
+    path = str(tmp_path / 'store' / 'frames.npy')
+    store = FrameStore.create(path, 3, 4, 5, duration_ms=75)
+    frames = np.random.default_rng(0).integers(0, 256, (3, 4, 5, 3), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        store[i] = frame
+    store.flush(len(frames))
+
+    reopened = FrameStore.open(path)
+    assert reopened.shape == (3, 4, 5, 3)
+    assert reopened.complete
+    assert reopened.meta['duration_ms'] == 75
+    assert np.array_equal(np.stack(reopened.views()), frames)
+    assert np.array_equal(np.asarray(reopened.image(1)), frames[1])
+
+
+def test_interrupted_store_resumes_where_it_stopped(tmp_path):
+    path = str(tmp_path / 'frames.npy')
+    store = FrameStore.create(path, 4, 2, 2)
+    store[0] = np.full((2, 2, 3), 10, dtype=np.uint8)
+    store[1] = np.full((2, 2, 3), 20, dtype=np.uint8)
+    store.flush(2)
+    del store
+
+    resumed = FrameStore.open(path, 'r+')
+    assert resumed.frames_written == 2 and not resumed.complete
+    for i in range(resumed.frames_written, len(resumed)):
+        resumed[i] = np.full((2, 2, 3), 10 * (i + 1), dtype=np.uint8)
+    resumed.flush(len(resumed))
+
+    finished = FrameStore.open(path)
+    assert finished.complete
+    assert [int(frame[0, 0, 0]) for frame in finished] == [10, 20, 30, 40]
+
+
+def test_store_without_meta_counts_every_frame_as_written(tmp_path):
+    path = str(tmp_path / 'frames.npy')
+    np.save(path, np.zeros((2, 2, 2, 3), dtype=np.uint8))
+    assert FrameStore.open(path).complete
@@ -0,0 +1,29 @@
+import glob
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = sorted(os.path.splitext(os.path.basename(path))[0]
+                 for path in glob.glob(os.path.join(REPO_ROOT, '*.py')))
+
+
+@pytest.mark.parametrize('module', MODULES)
+def test_module_imports_on_its_own(module):
+    # A fresh interpreter per module, so an import cycle shows up whichever module is imported first
+    result = subprocess.run([sys.executable, '-c', f'import {module}'], cwd=REPO_ROOT,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_styles_load_heavy_dependencies_only_when_needed(painting, tmp_path):
+    # Heuristic depth and GIF output need neither the MiDaS stack nor the MP4 encoder
+    code = ("import sys, art_styles; "
+            f"art_styles.render_animation({painting!r}, {str(tmp_path / 'style.gif')!r}, total_frames=2, "
+            f"max_size=32, depth='simple', cache_dir={str(tmp_path / 'cache')!r}); "
+            "print(sorted(m for m in ('torch', 'cv2', 'moviepy') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '[]'
@@ -0,0 +1,162 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from particle_render import GLOW_SIGMA, WARP_CELL, density_layer, draw_particles, project, stamp_particles, warp_settled
+
+WIDTH, HEIGHT = 70, 50
+
+
+def draw_ellipses(canvas, screen_x, screen_y, sizes, colors, highlight):
+    """The per-particle PIL ellipses stamp_particles replaces, in the same far-to-near order"""
+    draw = ImageDraw.Draw(canvas, 'RGBA')
+    for x, y, size, (r, g, b) in zip(screen_x.tolist(), screen_y.tolist(), sizes.tolist(), colors.tolist()):
+        draw.ellipse([x - size // 2, y - size // 2, x + size // 2, y + size // 2], fill=(r, g, b, 255))
+        if highlight and size > 2:
+            highlight_size = max(1, size // 3)
+            draw.ellipse([x - highlight_size // 2, y - highlight_size // 2,
+                          x + highlight_size // 2, y + highlight_size // 2],
+                         fill=(min(255, r + 25), min(255, g + 25), min(255, b + 25), 120))
+
+
+@pytest.mark.parametrize('highlight', [True, False])
+@pytest.mark.parametrize('max_size', [4, 16])
+def test_stamps_match_the_ellipse_path(highlight, max_size):
+    rng = np.random.default_rng(max_size)
+    count = 400
+    # Particles overlap heavily and some hang off every edge
+    screen_x = rng.integers(-max_size, WIDTH + max_size, count)
+    screen_y = rng.integers(-max_size, HEIGHT + max_size, count)
+    sizes = rng.integers(1, max_size + 1, count)
+    colors = rng.integers(0, 256, (count, 3)).astype(np.uint8)
+    colors[:20] = 250  # Lifted highlights clip at white
+    background = Image.fromarray(rng.integers(0, 256, (HEIGHT, WIDTH, 3)).astype(np.uint8))
+
+    expected, stamped = background.copy(), background.copy()
+    draw_ellipses(expected, screen_x, screen_y, sizes, colors, highlight)
+    stamp_particles(stamped, screen_x, screen_y, sizes, colors, highlight)
+    assert not np.array_equal(np.asarray(expected), np.asarray(background))
+    assert np.array_equal(np.asarray(stamped), np.asarray(expected))
+
+
+def test_settled_cells_are_warped_from_the_painting():
+    rng = np.random.default_rng(3)
+    painting = Image.fromarray(rng.integers(0, 256, (HEIGHT, WIDTH, 3)).astype(np.uint8))
+    ys, xs = np.mgrid[0:HEIGHT, 0:WIDTH]
+    origins = np.column_stack([xs.ravel(), ys.ravel()]).astype(np.float32)
+    state = np.column_stack([origins, np.zeros(len(origins)), np.ones(len(origins))]).astype(np.float32)
+
+    base, unsettled = warp_settled(painting, state, origins)
+    assert not unsettled.any()
+    assert np.array_equal(np.asarray(base), np.asarray(painting))
+
+    # One particle far from home unsettles its own cell only
+    state[0, :2] = (40, 30)
+    base, unsettled = warp_settled(painting, state, origins, cell=WARP_CELL)
+    in_first_cell = (origins[:, 0] < WARP_CELL) & (origins[:, 1] < WARP_CELL)
+    assert np.array_equal(unsettled, in_first_cell)
+    base = np.asarray(base)
+    assert (base[:WARP_CELL, :WARP_CELL] == (0, 0, 2)).all()
+    assert np.array_equal(base[WARP_CELL:], np.asarray(painting)[WARP_CELL:])
+
+
+def scattered_state(count=60, seed=5, z=0.0, size=3.0):
+    """Particles spread over the middle of the canvas, all at depth z"""
+    rng = np.random.default_rng(seed)
+    state = np.zeros((count, 4), dtype=np.float32)
+    state[:, 0] = rng.uniform(10, WIDTH - 10, count)
+    state[:, 1] = rng.uniform(10, HEIGHT - 10, count)
+    state[:, 2] = z
+    state[:, 3] = size
+    colors = rng.integers(60, 256, (count, 3)).astype(np.uint8)
+    return state, colors
+
+
+def test_streaks_only_trail_moving_particles():
+    state, colors = scattered_state()
+    still = np.asarray(draw_particles(state, colors, WIDTH, HEIGHT, glow=False))
+    unmoved = draw_particles(state, colors, WIDTH, HEIGHT, glow=False, previous=state, motion_blur=1.0)
+    assert np.array_equal(np.asarray(unmoved), still)
+
+    # Only the first particle moved, from 6px to its left
+    previous = state.copy()
+    previous[0, 0] -= 6
+    streaked = np.asarray(draw_particles(state, colors, WIDTH, HEIGHT, glow=False, previous=previous,
+                                         motion_blur=1.0))
+    ys, xs = np.nonzero((streaked != still).any(axis=-1))
+    assert len(xs)
+    x, y = int(state[0, 0]), int(state[0, 1])
+    assert (xs >= x - 7).all() and (xs <= x).all() and (np.abs(ys - y) <= 1).all()
+
+
+def test_lod_draws_tiny_particles_through_the_density_layer():
+    big, big_colors = scattered_state(count=30, seed=6, size=4.0)
+    tiny, tiny_colors = scattered_state(count=200, seed=7, z=20.0, size=0.3)
+    state, colors = np.concatenate([tiny, big]), np.concatenate([tiny_colors, big_colors])
+
+    # Particles at or above LOD_SIZE draw the same either way
+    assert np.array_equal(np.asarray(draw_particles(big, big_colors, WIDTH, HEIGHT, glow=False, lod=True)),
+                          np.asarray(draw_particles(big, big_colors, WIDTH, HEIGHT, glow=False)))
+
+    stats = {}
+    drawn = draw_particles(state, colors, WIDTH, HEIGHT, glow=False, lod=True, stats=stats)
+    assert stats['aggregated'] == len(tiny)
+    base = Image.new('RGB', (WIDTH, HEIGHT), (0, 0, 2))
+    screen_x, screen_y, _ = project(tiny, WIDTH, HEIGHT)
+    density_layer(base, screen_x, screen_y, tiny_colors.astype(np.float64))
+    expected = draw_particles(big, big_colors, WIDTH, HEIGHT, glow=False, base=base)
+    assert np.array_equal(np.asarray(drawn), np.asarray(expected))
+    one_by_one = draw_particles(state, colors, WIDTH, HEIGHT, glow=False)
+    assert not np.array_equal(np.asarray(drawn), np.asarray(one_by_one))
+
+
+def test_cull_stats_account_for_every_particle():
+    on_screen, colors = scattered_state(count=40, seed=8, size=2.0)
+    tiny, _ = scattered_state(count=40, seed=9, z=20.0, size=0.3)
+    # Far off every edge, and just over the edge but within a particle's size
+    off_screen = np.array([[-50, 20, 0, 2], [WIDTH + 50, 20, 0, 2], [30, -40, 0, 2], [30, HEIGHT + 40, 0, 2],
+                           [-1, 20, 0, 2], [WIDTH + 1, 20, 0, 2]], dtype=np.float32)
+    state = np.concatenate([on_screen, tiny, off_screen])
+    colors = np.resize(colors, (len(state), 3))
+
+    stats = {}
+    draw_particles(state, colors, WIDTH, HEIGHT, lod=True, stats=stats)
+    assert (stats['culled'], stats['aggregated'], stats['drawn']) == (4, 40, 42)
+    assert stats['culled'] + stats['aggregated'] + stats['drawn'] == stats['particles'] == len(state)
+    assert stats['cull_rate'] == pytest.approx(4 / len(state))
+
+
+def test_glow_lights_only_the_surroundings_of_far_particles():
+    near, near_colors = scattered_state(count=20, seed=10)
+    far, far_colors = scattered_state(count=5, seed=11, z=40.0, size=2.0)
+    state, colors = np.concatenate([near, far]), np.concatenate([near_colors, far_colors])
+    # Particles near the camera do not glow
+    assert np.array_equal(np.asarray(draw_particles(near, near_colors, WIDTH, HEIGHT, glow=True)),
+                          np.asarray(draw_particles(near, near_colors, WIDTH, HEIGHT, glow=False)))
+
+    glowing = np.asarray(draw_particles(state, colors, WIDTH, HEIGHT, glow=True)).astype(np.int64)
+    plain = np.asarray(draw_particles(state, colors, WIDTH, HEIGHT, glow=False)).astype(np.int64)
+    ys, xs = np.nonzero((glowing != plain).any(axis=-1))
+    assert len(xs)
+    # The blur reaches 3 sigma around each emitting particle's pixel and no further
+    radius = int(np.ceil(3 * GLOW_SIGMA))
+    screen_x, screen_y, _ = project(far, WIDTH, HEIGHT)
+    reach = np.maximum(np.abs(xs[:, None] - screen_x), np.abs(ys[:, None] - screen_y)).min(axis=1)
+    assert (reach <= radius).all()
+    assert glowing.sum() > plain.sum()
+
+
+@pytest.mark.parametrize('motion_blur', [0.0, 1.0])
+def test_glow_shows_over_a_painting_of_settled_particles(motion_blur):
+    # One settled particle per pixel covers the whole canvas, with a far particle among them
+    ys, xs = np.mgrid[0:HEIGHT, 0:WIDTH]
+    painting = np.zeros((WIDTH * HEIGHT, 4), dtype=np.float32)
+    painting[:, 0], painting[:, 1], painting[:, 3] = xs.ravel(), ys.ravel(), 2.0
+    far, far_colors = scattered_state(count=1, seed=12, z=40.0, size=2.0)
+    state = np.concatenate([painting, far])
+    colors = np.concatenate([np.full((len(painting), 3), 30, dtype=np.uint8), far_colors])
+    options = dict(previous=state, motion_blur=motion_blur)
+
+    glowing = np.asarray(draw_particles(state, colors, WIDTH, HEIGHT, glow=True, **options))
+    plain = np.asarray(draw_particles(state, colors, WIDTH, HEIGHT, glow=False, **options))
+    assert np.count_nonzero((glowing != plain).any(axis=-1)) > 1
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from particle_sampling import blue_noise_tile, grid_sample, importance_density, sample_pixels
+
+
+def detailed_painting():
+    """Flat halves with a noisy top-left corner and a black stripe that never becomes particles"""
+    pixels = np.zeros((64, 96, 3), dtype=np.uint8)
+    pixels[:, :48] = (200, 60, 40)
+    pixels[:, 48:] = (40, 90, 180)
+    pixels[:32, :32] = np.random.default_rng(0).integers(30, 255, (32, 32, 3))
+    pixels[:, 90:] = 0
+    return pixels
+
+
+def test_grid_sample_takes_every_step_th_visible_pixel():
+    ys, xs, scales = grid_sample(detailed_painting(), step=4)
+    assert len(ys) == 16 * 23
+    assert set(ys % 4) == {0} and set(xs % 4) == {0} and xs.max() < 90
+    assert set(scales) == {4.0}
+    assert len(sample_pixels(detailed_painting())[0]) == 64 * 90
+
+
+def test_blue_noise_tile_ranks_every_pixel_once():
+    tile = blue_noise_tile()
+    assert tile.shape == (64, 64)
+    assert len(np.unique(tile)) == tile.size
+    assert 0 < tile.min() and tile.max() < 1
+
+
+def test_importance_density_spends_the_budget_on_detail():
+    density = importance_density(detailed_painting(), 1500)
+    assert density.sum() == pytest.approx(1500)
+    assert density.max() <= 1 and not density[:, 90:].any()
+    assert density[:32, :32].mean() > 2 * density[32:, :48].mean()
+
+
+
+def test_budget_beyond_the_visible_pixels_takes_them_all():
+    painting = detailed_painting()
+    density = importance_density(painting, 10**6)
+    assert not np.isnan(density).any()
+    assert (density[:, :90] == 1).all() and not density[:, 90:].any()
+    assert len(sample_pixels(painting, budget=10**6)[0]) == 64 * 90
+
+def test_budget_sampling_hits_the_budget():
+    ys, xs, scales = sample_pixels(detailed_painting(), budget=1500)
+    assert abs(len(ys) - 1500) < 150
+    assert xs.max() < 90
+    assert np.all(np.diff(ys * 96 + xs) > 0)
+    detailed = (ys < 32) & (xs < 32)
+    # Sparse flat regions get larger particles to keep the canvas covered
+    assert scales[detailed].mean() < scales[~detailed].mean()
+
+
+def test_budget_cannot_be_combined_with_a_step():
+    with pytest.raises(ValueError, match='cannot be combined'):
+        sample_pixels(detailed_painting(), step=2, budget=1500)
+
+
+def test_flat_regions_collapse_into_large_clusters():
+    pixels = np.full((64, 64, 3), (120, 80, 40), dtype=np.uint8)
+    ys, xs, scales = sample_pixels(pixels, cluster=12)
+    assert scales.tolist() == [16.0] * 16
+    assert sorted(set(ys.tolist())) == [8, 24, 40, 56]
+
+
+def test_clusters_cover_every_visible_pixel_once():
+    pixels = detailed_painting()
+    for step in (1, 2):
+        ys, xs, scales = sample_pixels(pixels, step=step, cluster=12)
+        covered = np.zeros(pixels.shape[:2], dtype=int)
+        for y, x, scale in zip(ys, xs, scales.astype(int)):
+            top, left = (y, x) if scale == step else (y - scale // 2, x - scale // 2)
+            covered[top:top + scale, left:left + scale] += 1
+        assert covered[:, :90].max() == 1 and not covered[:, 90:].any()
+        # The noisy corner keeps one particle per step×step cell
+        corner = (ys < 32) & (xs < 32)
+        assert set(scales[corner]) == {float(step)}
+        assert len(ys) < len(grid_sample(pixels, step)[0]) / 4
+
+
+def test_budget_cannot_be_combined_with_clustering():
+    with pytest.raises(ValueError, match='cannot be combined'):
+        sample_pixels(detailed_painting(), budget=1500, cluster=12)
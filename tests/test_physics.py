@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import perfect_final_painting
+import ultra_hd_particles
+from particle_render import X, Y, snapshot_particles
+
+
+def simulate(dissolution_cls, painting, frames, frame_seconds):
+    """Snapshots of every frame of a render with frames steps of frame_seconds"""
+    random.seed(0)
+    dissolution = dissolution_cls(painting)
+    random.seed(1)
+    snapshots = []
+    for i in range(frames):
+        dissolution.update_particles(i, frames, frame_seconds)
+        snapshots.append(snapshot_particles(dissolution.particles))
+    return np.array(snapshots)
+
+
+@pytest.mark.parametrize('module, dissolution_cls', [
+    (perfect_final_painting, perfect_final_painting.PerfectFinalDissolution),
+    (ultra_hd_particles, ultra_hd_particles.UltraHDDissolution),
+])
+def test_twice_the_time_step_follows_the_same_path(module, dissolution_cls):
+    painting = Image.fromarray(np.random.default_rng(0).integers(0, 256, (24, 32, 3)).astype(np.uint8))
+    frame_seconds = module.FRAME_DURATION_MS / 1000
+    fine = simulate(dissolution_cls, painting, 140, frame_seconds)
+    coarse = simulate(dissolution_cls, painting, 70, 2 * frame_seconds)
+
+    # Coarse frame k is at the same time as fine frame 2k: compare every one of them, through
+    # mid-flight and across the phase boundaries where the particles turn back
+    origin = fine[0][:, [X, Y]]
+    for k in range(1, len(coarse)):
+        at, other = fine[2 * k][:, [X, Y]], coarse[k][:, [X, Y]]
+        displacement = np.sqrt(np.mean(np.sum((at - origin) ** 2, axis=1)))
+        difference = np.sqrt(np.mean(np.sum((at - other) ** 2, axis=1)))
+        # At most about 1.4% of the distance travelled, where the floating orbit swings back
+        assert difference <= 0.02 * displacement, f"frame {2 * k}"
@@ -0,0 +1,69 @@
+import numpy as np
+
+import render_cache
+from render_cache import STAGES, StageCache
+
+PARAMS = {
+    'particles': {'engine': 'perfect_final', 'step': 1},
+    'trajectories': {'total_frames': 140},
+    'raw_frames': {'glow': True},
+    'graded_frames': {'hold_frames': 20},
+    'encoded': {'format': '.gif'},
+}
+
+
+def test_stage_keys_cover_every_stage_and_are_stable(tmp_path):
+    cache = StageCache(str(tmp_path))
+    keys = cache.stage_keys('painting', PARAMS)
+    assert list(keys) == list(STAGES)
+    assert len(set(keys.values())) == len(STAGES)
+    assert keys == cache.stage_keys('painting', PARAMS)
+
+
+def test_stage_keys_invalidate_downstream_only(tmp_path):
+    cache = StageCache(str(tmp_path))
+    keys = cache.stage_keys('painting', PARAMS)
+    changed = cache.stage_keys('painting', dict(PARAMS, raw_frames={'glow': False}))
+    assert [keys[s] == changed[s] for s in STAGES] == [True, True, False, False, False]
+
+
+def test_stage_keys_chain_from_the_root_key(tmp_path):
+    cache = StageCache(str(tmp_path))
+    keys = cache.stage_keys('painting', PARAMS)
+    other = cache.stage_keys('other painting', PARAMS)
+    assert all(keys[s] != other[s] for s in STAGES)
+
+
+
+def test_cache_version_changes_every_stage_key(tmp_path, monkeypatch):
+    cache = StageCache(str(tmp_path))
+    keys = cache.stage_keys('painting', PARAMS)
+    monkeypatch.setattr(render_cache, 'CACHE_VERSION', render_cache.CACHE_VERSION + 1)
+    bumped = cache.stage_keys('painting', PARAMS)
+    assert all(keys[s] != bumped[s] for s in STAGES)
+
+def test_resume_stage_finds_the_last_committed_stage(tmp_path):
+    cache = StageCache(str(tmp_path))
+    keys = cache.stage_keys('painting', PARAMS)
+    assert cache.resume_stage(keys) == -1
+    cache.save_object('particles', keys['particles'], {'particles': 3})
+    cache.commit('particles', keys['particles'])
+    cache.save_array('trajectories', keys['trajectories'], np.zeros((2, 3, 4), dtype=np.float32))
+    cache.commit('trajectories', keys['trajectories'])
+    assert cache.resume_stage(keys) == STAGES.index('trajectories')
+    assert cache.load_object('particles', keys['particles']) == {'particles': 3}
+
+
+def test_uncommitted_files_are_partial_and_dropped_on_restart(tmp_path):
+    cache = StageCache(str(tmp_path))
+    key = cache.stage_keys('painting', PARAMS)['raw_frames']
+    cache.save_array('raw_frames', key, np.ones(4), 'frames.npy')
+    assert cache.partial('raw_frames', key, 'frames.npy')
+    assert cache.resume_stage(cache.stage_keys('painting', PARAMS)) == -1
+
+    # A new run that does not resume starts the stage over
+    restarted = StageCache(str(tmp_path))
+    restarted.save_array('raw_frames', key, np.zeros(2), 'other.npy')
+    assert not restarted.partial('raw_frames', key, 'frames.npy')
+    restarted.commit('raw_frames', key)
+    assert restarted.has('raw_frames', key)
@@ -0,0 +1,128 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import perfect_final_painting
+from render_pipeline import catmull_rom, interpolate_trajectories, preview_dissolution, retime
+
+
+def test_catmull_rom_passes_through_the_inner_points():
+    p0, p1, p2, p3 = (np.array([v, -v], dtype=np.float32) for v in (0.0, 1.0, 4.0, 2.0))
+    assert np.allclose(catmull_rom(p0, p1, p2, p3, 0.0), p1)
+    assert np.allclose(catmull_rom(p0, p1, p2, p3, 1.0), p2)
+
+
+def test_catmull_rom_reproduces_linear_motion():
+    points = [np.array([3.0 * i]) for i in range(4)]
+    for t in (0.25, 0.5, 0.75):
+        assert catmull_rom(*points, t) == pytest.approx(3.0 * (1 + t))
+
+
+def test_interpolated_frames_follow_the_keyframes():
+    # 5 keyframes of linear motion spanning 8 frames: keyframe j lands on frame 2j
+    keyframes = np.stack([np.full((3, 4), 10.0 * j, dtype=np.float32) for j in range(5)])
+    out = np.zeros((8, 3, 4), dtype=np.float32)
+    done = []
+    interpolate_trajectories(keyframes, out, lambda stage, i, total: done.append((stage, i, total)))
+    # End segments clamp their outer neighbour; the inner ones stay on the line
+    assert np.allclose(out[2:7, 0, 0], 5.0 * np.arange(2, 7))
+    assert np.allclose(out[::2], keyframes[:4])
+    assert done[-1] == ('trajectories', 8, 8)
+
+
+def test_retime_keeps_the_animation_length():
+    total_frames, duration_ms, grading, keyframes = retime(140, 75, {'hold_frames': 20, 'contrast': 1.1}, 40)
+    assert (total_frames, keyframes) == (420, 140)
+    assert duration_ms == 25
+    assert grading == {'hold_frames': 60, 'contrast': 1.1}
+    assert total_frames * duration_ms == 140 * 75
+
+
+class Interrupted(Exception):
+    pass
+
+
+def render(painting, output, cache_dir, **options):
+    """Tiny perfect_final render: 40px, 10 frames, checkpointed every 2 frames"""
+    options.setdefault('grading', dict(perfect_final_painting.GRADING, hold_frames=2))
+    return perfect_final_painting.render_animation(painting, str(output), total_frames=10, max_size=40,
+                                                   cache_dir=str(cache_dir), checkpoint_every=2, **options)
+
+
+def recorder(calls, interrupt=None):
+    """progress callback recording (stage, done) and raising Interrupted at interrupt"""
+    def progress(stage, done, total):
+        if (stage, done) == interrupt:
+            raise Interrupted
+        calls.append((stage, done))
+    return progress
+
+
+def test_regrade_reuses_the_raw_frames(painting, tmp_path):
+    first = render(painting, tmp_path / 'first.gif', tmp_path / 'cache')
+    assert first['resumed_from'] is None
+
+    calls = []
+    grading = dict(perfect_final_painting.GRADING, hold_frames=2, final_color=1.5)
+    regraded = render(painting, tmp_path / 'regraded.gif', tmp_path / 'cache', grading=grading,
+                      progress=recorder(calls))
+    assert regraded['resumed_from'] == 'raw_frames'
+    assert {stage for stage, _ in calls} == {'particles', 'graded_frames', 'encoded'}
+    assert (tmp_path / 'first.gif').read_bytes() != (tmp_path / 'regraded.gif').read_bytes()
+
+    again = render(painting, tmp_path / 'again.gif', tmp_path / 'cache', grading=grading)
+    assert again['resumed_from'] == 'encoded'
+    assert (tmp_path / 'again.gif').read_bytes() == (tmp_path / 'regraded.gif').read_bytes()
+
+
+@pytest.mark.parametrize('stage', ['trajectories', 'raw_frames'])
+def test_resume_continues_an_interrupted_stage(painting, tmp_path, stage):
+    render(painting, tmp_path / 'expected.gif', tmp_path / 'fresh')
+
+    with pytest.raises(Interrupted):
+        render(painting, tmp_path / 'resumed.gif', tmp_path / 'cache', progress=recorder([], (stage, 6)))
+
+    calls = []
+    result = render(painting, tmp_path / 'resumed.gif', tmp_path / 'cache', resume=True,
+                    progress=recorder(calls))
+    # The last checkpoint before the interruption covered four frames
+    assert [done for name, done in calls if name == stage][0] == 5
+    if stage == 'raw_frames':
+        assert result['resumed_from'] == 'trajectories'
+        assert 'trajectories' not in {name for name, _ in calls}
+    assert (tmp_path / 'resumed.gif').read_bytes() == (tmp_path / 'expected.gif').read_bytes()
+
+
+def launch_state(dissolution):
+    """Each particle's color and launch, keyed by its source pixel"""
+    return {(p.original_x, p.original_y): (p.color, p.vx, p.vy, p.vz, p.rotation_speed)
+            for p in dissolution.particles}
+
+
+@pytest.mark.parametrize('budget', [None, 800])
+def test_preview_particles_are_a_subset_of_the_full_render(painting, tmp_path, budget):
+    image = Image.open(painting).convert('RGB')
+    launched = []
+
+    def create(*args):
+        dissolution = perfect_final_painting.PerfectFinalDissolution(*args)
+        launched.append(launch_state(dissolution))
+        return dissolution
+
+    preview_dissolution(create, image, str(tmp_path / 'preview.gif'), 10, perfect_final_painting.grade_frames,
+                        dict(perfect_final_painting.GRADING, hold_frames=2), 70, step=4, particle_budget=budget)
+    random.seed(0)
+    full = launch_state(perfect_final_painting.PerfectFinalDissolution(image, 1, budget))
+
+    preview = launched[0]
+    assert 0 < len(preview) < len(full)
+    assert all(full[origin] == state for origin, state in preview.items())
+
+
+def test_preview_rejects_a_budget_with_clustering(painting, tmp_path):
+    with pytest.raises(ValueError, match='cannot be combined with clustering'):
+        preview_dissolution(perfect_final_painting.PerfectFinalDissolution, Image.open(painting).convert('RGB'),
+                            str(tmp_path / 'preview.gif'), 10, perfect_final_painting.grade_frames,
+                            perfect_final_painting.GRADING, 70, particle_budget=800, cluster_tolerance=12)
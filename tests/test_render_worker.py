@@ -0,0 +1,115 @@
+import pytest
+from PIL import Image
+
+import render_worker
+from render_worker import PRIORITY_COSTED, PRIORITY_DEFERRED, PRIORITY_PREVIEW, RenderWorker, check_options
+
+
+@pytest.fixture
+def large_painting(tmp_path):
+    path = tmp_path / 'large.png'
+    Image.new('RGB', (800, 600), (120, 80, 40)).save(path)
+    return str(path)
+
+
+def submit(worker, painting, tmp_path, **request):
+    return worker.submit(dict({'engine': 'perfect_final', 'input': painting,
+                               'output': str(tmp_path / 'out.gif')}, **request))
+
+
+def test_check_options_accepts_engine_and_worker_options():
+    options = {'max_size': 200, 'cluster': 12, 'pack': True, 'deadline_seconds': 30}
+    assert check_options('perfect_final', options) == options
+
+
+@pytest.mark.parametrize('engine, options, message', [
+    ('perfect_final', {'colour': 'red'}, 'does not accept: colour'),
+    ('ultra_hd', {'cluster': 12}, 'does not accept: cluster'),
+    ('perfect_final', {'particle_budget': 1000, 'step': 2}, 'cannot be combined with step'),
+    ('perfect_final', {'particle_budget': 1000, 'cluster': 12}, 'cannot be combined with step'),
+    ('perfect_final', {'particle_budget': 1000, 'deadline_seconds': 30}, 'deadline_seconds'),
+])
+def test_check_options_rejects_jobs_the_engine_cannot_run(engine, options, message):
+    with pytest.raises(ValueError, match=message):
+        check_options(engine, options)
+
+
+def test_submit_validates_the_request(tmp_path, painting):
+    worker = RenderWorker(cache_dir=str(tmp_path / 'cache'))
+    with pytest.raises(ValueError, match='Unknown engine'):
+        submit(worker, painting, tmp_path, engine='watercolor')
+    with pytest.raises(ValueError, match='Input file not found'):
+        submit(worker, str(tmp_path / 'missing.png'), tmp_path)
+    with pytest.raises(ValueError, match='does not accept'):
+        submit(worker, painting, tmp_path, options={'colour': 'red'})
+    assert worker.pending.qsize() == 0
+
+
+@pytest.mark.parametrize('preview', [False, True])
+def test_garbage_uploads_are_invalid_requests(tmp_path, preview):
+    garbage = tmp_path / 'upload.png'
+    garbage.write_bytes(b'not an image at all' * 20)
+    worker = RenderWorker(cache_dir=str(tmp_path / 'cache'))
+    with pytest.raises(ValueError, match='not a readable image'):
+        submit(worker, str(garbage), tmp_path, preview=preview)
+    assert worker.pending.qsize() == 0
+
+
+def test_previews_jump_the_queue_and_costed_jobs_run_shortest_first(tmp_path, painting, large_painting):
+    worker = RenderWorker(cache_dir=str(tmp_path / 'cache'))
+    long_job = submit(worker, large_painting, tmp_path)
+    short_job = submit(worker, painting, tmp_path)
+    preview = submit(worker, painting, tmp_path, preview=True)
+    assert short_job.cost['seconds'] < long_job.cost['seconds']
+    queued = [worker.pending.get() for _ in range(3)]
+    assert [entry[-1] for entry in queued] == [preview, short_job, long_job]
+    assert queued[0][0] == PRIORITY_PREVIEW and queued[1][0] == PRIORITY_COSTED
+
+
+def test_over_budget_jobs_are_downgraded_to_fit(tmp_path, large_painting):
+    worker = RenderWorker(cache_dir=str(tmp_path / 'cache'), max_seconds=15)
+    job = submit(worker, large_painting, tmp_path, options={'max_size': 300})
+    assert job.options['max_size'] < 300
+    assert job.cost['seconds'] <= 15
+    assert job.admission.startswith('downgraded')
+
+
+def test_over_budget_jobs_are_rejected_or_deferred(tmp_path, large_painting):
+    rejecting = RenderWorker(cache_dir=str(tmp_path / 'cache'), max_seconds=0.01, over_budget='reject')
+    with pytest.raises(RuntimeError, match='Job rejected'):
+        submit(rejecting, large_painting, tmp_path)
+    assert rejecting.pending.qsize() == 0
+
+    queueing = RenderWorker(cache_dir=str(tmp_path / 'cache'), max_seconds=0.01, over_budget='queue')
+    job = submit(queueing, large_painting, tmp_path)
+    assert job.admission.startswith('deferred')
+    assert queueing.pending.get()[0] == PRIORITY_DEFERRED
+
+
+def test_full_queue_refuses_jobs(tmp_path, painting):
+    worker = RenderWorker(queue_size=1, cache_dir=str(tmp_path / 'cache'))
+    submit(worker, painting, tmp_path)
+    with pytest.raises(RuntimeError, match='queue is full'):
+        submit(worker, painting, tmp_path)
+    assert len(worker.jobs) == 1
+
+
+def test_deadline_jobs_are_admitted_without_calibrating(tmp_path, large_painting, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("calibration must not run on submit")
+    monkeypatch.setattr(render_worker.auto_quality, 'calibrate', fail)
+
+    worker = RenderWorker(cache_dir=str(tmp_path / 'cache'))
+    job = submit(worker, large_painting, tmp_path, options={'deadline_seconds': 10, 'pack': True})
+    assert job.calibrate
+    assert 'deadline_seconds' not in job.options
+    assert job.options['pack_path'].endswith('out.ptrj')
+    assert job.cost['seconds'] <= 10
+    assert job.admission.startswith('auto quality for 10s')
+
+
+def test_handle_rejects_unknown_ops(tmp_path):
+    worker = RenderWorker(cache_dir=str(tmp_path / 'cache'))
+    with pytest.raises(ValueError, match="Unknown op"):
+        worker.handle({'op': 'bogus'})
+    assert worker.handle({'op': 'ping'})['ok']
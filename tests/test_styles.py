@@ -0,0 +1,42 @@
+import functools
+
+import art_styles
+import engines
+from style_selector import STYLE_DESCRIPTIONS, StyleSelector
+
+
+def test_every_style_list_follows_the_registry():
+    assert art_styles.STYLES is engines.STYLES
+    assert list(art_styles.ArtisticStyleProcessor().styles) == list(engines.STYLES)
+    assert [style for style, _ in StyleSelector().styles.values()] == list(engines.STYLES)
+    assert set(STYLE_DESCRIPTIONS) == set(engines.STYLES)
+    assert all(engines.ENGINES[style] == engines.STYLE_MODULE for style in engines.STYLES)
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resume_starts_fresh_when_the_checkpoint_is_from_other_settings(painting, tmp_path, monkeypatch):
+    monkeypatch.setattr(art_styles, 'Checkpointer', functools.partial(art_styles.Checkpointer, every=2))
+    output = str(tmp_path / 'ethereal.gif')
+    rendered = []
+
+    def on_frame(stage, index, frame, stop_at=None):
+        rendered.append(index)
+        if index == stop_at:
+            raise Interrupted
+
+    def render(seed, stop_at=None):
+        rendered.clear()
+        try:
+            art_styles.render_animation(painting, output, style='ethereal', total_frames=6, max_size=32,
+                                        depth='simple', seed=seed, resume=True, cache_dir=str(tmp_path),
+                                        on_frame=functools.partial(on_frame, stop_at=stop_at))
+        except Interrupted:
+            pass
+        return list(rendered)
+
+    assert render(seed=0, stop_at=2) == [0, 1, 2]
+    assert render(seed=1, stop_at=2) == [0, 1, 2]
+    assert render(seed=1) == [2, 3, 4, 5]
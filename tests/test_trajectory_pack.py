@@ -0,0 +1,68 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+import trajectory_pack
+from particle_render import GLOW_SIGMA
+from trajectory_pack import decode_pack, encode_pack, hold_hidden, keyframe_indices, quantize
+
+WIDTH, HEIGHT = 80, 60
+
+
+def trajectories(frames=25, particles=50):
+    """Particles drifting across the canvas while sinking to depths far beyond the int8 range"""
+    rng = np.random.default_rng(0)
+    state = np.zeros((frames, particles, 4), dtype=np.float32)
+    t = np.linspace(0, 1, frames)[:, None]
+    state[..., 0] = rng.uniform(0, WIDTH, particles) + 30 * t
+    state[..., 1] = rng.uniform(0, HEIGHT, particles) - 20 * t
+    state[..., 2] = rng.uniform(-1, 1, particles) * 6000 * t
+    state[..., 3] = rng.uniform(0.8, 3, particles)
+    return state
+
+
+def test_keyframes_include_the_last_frame():
+    assert keyframe_indices(25, 10) == [0, 10, 20, 24]
+    assert keyframe_indices(21, 10) == [0, 10, 20]
+
+
+def test_pack_round_trips_the_quantized_keyframes():
+    state = trajectories()
+    colors = np.random.default_rng(1).integers(0, 256, (state.shape[1], 3), dtype=np.uint8)
+    header, decoded_colors, planes = decode_pack(encode_pack(state, colors, WIDTH, HEIGHT, 50, hold_frames=5))
+
+    assert header['version'] == trajectory_pack.VERSION
+    assert (header['width'], header['height'], header['frames'], header['hold_frames']) == (WIDTH, HEIGHT, 25, 5)
+    assert header['glow_sigma'] == GLOW_SIGMA
+    assert np.array_equal(decoded_colors, colors)
+    expected, margin = quantize(state, header['keyframes'], WIDTH, HEIGHT)
+    hold_hidden(expected, WIDTH, HEIGHT, margin)
+    for name, plane in zip(('x', 'y', 'z', 'size'), expected):
+        assert np.array_equal(planes[name], plane), name
+
+
+def test_deep_particles_keep_their_depth():
+    state = trajectories()
+    _, _, planes = decode_pack(encode_pack(state, np.zeros((state.shape[1], 3), np.uint8), WIDTH, HEIGHT, 50))
+    depth = planes['z'][-1].astype(np.float64) * trajectory_pack.DEPTH_SCALE
+    assert np.abs(depth).max() > 508
+    assert np.abs(depth - state[-1, :, 2]).max() <= trajectory_pack.DEPTH_SCALE / 2
+
+
+def test_hidden_particles_repeat_their_values():
+    x = np.array([[40], [-400], [-800], [-1200]])
+    planes = [x * trajectory_pack.POSITION_SCALE, np.full((4, 1), 40), np.arange(4)[:, None], np.ones((4, 1))]
+    hold_hidden(planes, WIDTH, HEIGHT, margin=5)
+    # Keyframe 1 ends a visible segment; keyframes 2 and 3 are unreachable
+    assert planes[0][:, 0].tolist() == [160, -1600, -1600, -1600]
+    assert planes[2][:, 0].tolist() == [0, 1, 1, 1]
+
+
+def test_decode_rejects_other_files_and_versions():
+    with pytest.raises(ValueError, match='Not a trajectory pack'):
+        decode_pack(b'GIF89a' + bytes(16))
+    header = json.dumps({'version': trajectory_pack.VERSION - 1}).encode()
+    with pytest.raises(ValueError, match='Unsupported trajectory pack version'):
+        decode_pack(trajectory_pack.MAGIC + struct.pack('<I', len(header)) + header)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Trajectory Packs
+Compact binary export of a dissolution's simulated trajectories, so the web
+client can replay the server's exact animation at its own resolution and fps
+instead of downloading a GIF.
+
+Layout: b'PTRJ', uint32 little-endian header length, JSON header, zlib body.
+The body holds the particle colors once (N × RGB), then one plane per field
+with a row per keyframe:
+
+  x, y   int16  screen position in 1/position_scale px
+  z      int16  depth in depth_scale units, for draw order, glow and perspective size
+  size   uint8  particle size in 1/size_scale px before perspective
+
+int16 planes are split into a low byte plane followed by a high byte plane.
+
+Screen positions use the renderer's perspective projection and are clamped to
+the canvas plus a margin. Every plane is delta-encoded along the keyframes
+with wraparound; a particle that is off-screen at a keyframe and both of its
+neighbours repeats its previous values, since the player only draws segments
+with a visible end.
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+
+from particle_render import GLOW_SIGMA, SIZE, X, Y, Z
+
+MAGIC = b'PTRJ'
+VERSION = 2
+KEYFRAME_EVERY = 10
+POSITION_SCALE = 4
+DEPTH_SCALE = 4
+SIZE_SCALE = 32
+PERSPECTIVE = 0.01  # Matches draw_particles: 1 / (1 + |z| * PERSPECTIVE)
+GLOW_MARGIN = 4     # Extra off-screen pixels covered by the glow pass
+
+
+def keyframe_indices(total_frames, every=KEYFRAME_EVERY):
+    """Every n-th frame plus the last one"""
+    indices = list(range(0, total_frames, every))
+    if indices[-1] != total_frames - 1:
+        indices.append(total_frames - 1)
+    return indices
+
+
+def delta_encode(planes, dtype):
+    """Differences between consecutive keyframe rows, wrapped to dtype"""
+    deltas = planes.copy()
+    deltas[1:] = planes[1:] - planes[:-1]
+    return deltas.astype(dtype)
+
+
+def quantize(trajectories, keyframes, width, height):
+    """Screen-space int planes (x, y, z, size) for the keyframes, with the visibility margin"""
+    state = np.asarray(trajectories[keyframes], dtype=np.float32)
+    z = np.clip(np.round(state[..., Z] / DEPTH_SCALE), -32767, 32767)
+    perspective = 1 / (1 + np.abs(z * DEPTH_SCALE) * PERSPECTIVE)
+    margin = int(math.ceil(float(state[..., SIZE].max()))) + GLOW_MARGIN
+    screen_x = state[..., X] * perspective + (1 - perspective) * width * 0.5
+    screen_y = state[..., Y] * perspective + (1 - perspective) * height * 0.5
+    x = np.round(np.clip(screen_x, -margin, width + margin) * POSITION_SCALE)
+    y = np.round(np.clip(screen_y, -margin, height + margin) * POSITION_SCALE)
+    size = np.clip(np.round(state[..., SIZE] * SIZE_SCALE), 0, 255)
+    return [plane.astype(np.int32) for plane in (x, y, z, size)], margin
+
+
+def hold_hidden(planes, width, height, margin):
+    """Repeat the previous values of particles no drawn segment can reach"""
+    x, y = planes[0], planes[1]
+    low, high_x, high_y = -margin * POSITION_SCALE, (width + margin) * POSITION_SCALE, (height + margin) * POSITION_SCALE
+    visible = (x > low) & (x < high_x) & (y > low) & (y < high_y)
+    needed = visible.copy()
+    needed[1:] |= visible[:-1]
+    needed[:-1] |= visible[1:]
+    for k in range(1, len(x)):
+        hidden = ~needed[k]
+        for plane in planes:
+            plane[k][hidden] = plane[k - 1][hidden]
+
+
+def encode_pack(trajectories, colors, width, height, duration_ms, hold_frames=0,
+                keyframe_every=KEYFRAME_EVERY, background=(0, 0, 2), glow=True, highlight=True, level=9):
+    """Pack bytes for (frames, particles, 4) trajectories and (particles, 3) uint8 colors"""
+    total_frames, particles = trajectories.shape[:2]
+    keyframes = keyframe_indices(total_frames, keyframe_every)
+    planes, margin = quantize(trajectories, keyframes, width, height)
+    hold_hidden(planes, width, height, margin)
+
+    x, y, z, size = planes
+    body = [np.ascontiguousarray(colors, dtype=np.uint8).tobytes()]
+    for plane in (x, y, z):
+        split = delta_encode(plane, np.int16).view(np.uint8).reshape(len(keyframes), particles, 2)
+        body.append(np.ascontiguousarray(split.transpose(2, 0, 1)).tobytes())
+    body.append(delta_encode(size, np.uint8).tobytes())
+
+    header = json.dumps({
+        'version': VERSION,
+        'width': width,
+        'height': height,
+        'particles': particles,
+        'frames': total_frames,
+        'keyframes': keyframes,
+        'duration_ms': duration_ms,
+        'hold_frames': hold_frames,
+        'background': list(background),
+        'glow': glow,
+        'glow_sigma': GLOW_SIGMA,
+        'highlight': highlight,
+        'margin': margin,
+        'position_scale': POSITION_SCALE,
+        'depth_scale': DEPTH_SCALE,
+        'size_scale': SIZE_SCALE,
+        'perspective': PERSPECTIVE,
+    }).encode()
+    return MAGIC + struct.pack('<I', len(header)) + header + zlib.compress(b''.join(body), level)
+
+
+def decode_pack(data):
+    """(header, colors, planes) of a pack; planes maps x, y, z, size to (keyframes, particles) arrays"""
+    if data[:4] != MAGIC:
+        raise ValueError("Not a trajectory pack")
+    header_length, = struct.unpack('<I', data[4:8])
+    header = json.loads(data[8:8 + header_length])
+    if header.get('version') != VERSION:
+        raise ValueError(f"Unsupported trajectory pack version {header.get('version')}")
+    body = zlib.decompress(data[8 + header_length:])
+    keyframes, particles = len(header['keyframes']), header['particles']
+
+    offset = particles * 3
+    colors = np.frombuffer(body, np.uint8, offset).reshape(particles, 3)
+    planes = {}
+    for name, dtype in (('x', np.int16), ('y', np.int16), ('z', np.int16), ('size', np.uint8)):
+        itemsize = np.dtype(dtype).itemsize
+        count = keyframes * particles
+        raw = np.frombuffer(body, np.uint8, count * itemsize, offset)
+        offset += count * itemsize
+        if itemsize == 2:
+            raw = np.ascontiguousarray(raw.reshape(2, count).T)
+        deltas = raw.view(dtype).reshape(keyframes, particles)
+        planes[name] = np.cumsum(deltas, axis=0, dtype=dtype)
+    return header, colors, planes
+
+
+def write_pack(path, trajectories, colors, width, height, duration_ms, **options):
+    """Write a trajectory pack and return its size in bytes"""
+    data = encode_pack(trajectories, colors, width, height, duration_ms, **options)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    print(f"📦 Trajectory pack: {len(data) / 1e6:.2f}MB → {path}")
+    return len(data)
+
+
+def pack_path_for(output_path):
+    return os.path.splitext(output_path)[0] + '.ptrj'
+
+
+def main():
+    import engines
+    parser = argparse.ArgumentParser(description="Render a dissolution and export its trajectory pack")
+    parser.add_argument('painting', help="painting file to animate")
+    parser.add_argument('--engine', default=engines.DEFAULT_ENGINE, choices=sorted(engines.DISSOLUTION_ENGINES))
+    parser.add_argument('--output', help="animation file; the pack is written next to it as .ptrj")
+    parser.add_argument('--frames', type=int, help="total frames (default: engine default)")
+    parser.add_argument('--max-size', type=int, help="longest side in pixels (default: engine default)")
+    args = parser.parse_args()
+
+    output_path = args.output or f"{args.engine}_{os.path.splitext(os.path.basename(args.painting))[0]}.gif"
+    options = {k: v for k, v in (('total_frames', args.frames), ('max_size', args.max_size)) if v}
+    result = engines.load_engine(args.engine)(args.painting, output_path, pack_path=pack_path_for(output_path),
+                                              **options)
+    pack_bytes, gif_bytes = os.path.getsize(result['pack']), os.path.getsize(output_path)
+    print(f"🌟 Pack is {pack_bytes / 1e6:.2f}MB vs {gif_bytes / 1e6:.2f}MB animation "
+          f"({gif_bytes / pack_bytes:.1f}x smaller)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())